@@ -0,0 +1,131 @@
+"""
+HTTP/2 transport benchmark for unbelipy.
+
+Starts a local stand-in for the API with hypercorn, which speaks HTTP/1.1 and HTTP/2 on the same port,
+and sends bursts of concurrent ``get_user_balance`` requests through an ``UnbeliClient`` using aiohttp
+(HTTP/1.1) and one using ``HTTP2Session``. For each it reports the wall time of a burst, the requests
+per second and how many connections the server accepted. The "cold" time is the first burst of
+``--concurrency`` requests, which includes opening the connections.
+
+Without ``--certfile``/``--keyfile`` the server is cleartext and HTTP/2 is spoken with prior knowledge.
+With a certificate, both clients connect over TLS, which shows the connection setup cost aiohttp
+pays for every connection it opens (pass ``--insecure`` for a self-signed certificate).
+
+Needs the ``http2`` extra and hypercorn::
+
+    pip install unbelipy[http2] hypercorn
+    python benchmarks/http2_transport.py --requests 500 --concurrency 100 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hypercorn.asyncio import serve  # noqa: E402
+from hypercorn.config import Config  # noqa: E402
+
+import unbelipy  # noqa: E402
+from unbelipy.transports import HTTP2Session  # noqa: E402
+
+class StandIn:
+    """ASGI app answering balance requests after ``latency`` seconds, counting client connections."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.connections = set()
+        self.versions = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        self.connections.add(tuple(scope["client"]))
+        self.versions[scope["http_version"]] = self.versions.get(scope["http_version"], 0) + 1
+        await asyncio.sleep(self.latency)
+        parts = scope["path"].strip("/").split("/")
+        body = json.dumps({"user_id": parts[-1], "cash": 10, "bank": 20, "total": 30, "rank": 1}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"x-ratelimit-limit", b"100000"),
+            (b"x-ratelimit-remaining", b"99999"),
+            (b"x-ratelimit-reset", str(int((time.time() + 60) * 1000)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+async def burst(client, requests, concurrency):
+    queue = list(range(requests))
+
+    async def worker():
+        while queue:
+            user_id = queue.pop()
+            await client.get_user_balance(1, user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+async def run(args):
+    app = StandIn(args.latency)
+    config = Config()
+    config.bind = [f"127.0.0.1:{args.port}"]
+    config.loglevel = "WARNING"
+    scheme = "http"
+    if args.certfile:
+        config.certfile, config.keyfile = args.certfile, args.keyfile
+        scheme = "https"
+    shutdown = asyncio.Event()
+    server = asyncio.ensure_future(serve(app, config, shutdown_trigger=shutdown.wait))
+    await asyncio.sleep(0.5)
+    base_url = f"{scheme}://127.0.0.1:{args.port}/api/v1"
+
+    verify = not args.insecure
+    sessions = {}
+    if scheme == "https" and not verify:
+        import aiohttp
+        sessions["aiohttp (HTTP/1.1)"] = lambda: aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False))
+    else:
+        sessions["aiohttp (HTTP/1.1)"] = None
+    # without TLS there's no protocol negotiation, so HTTP/2 is used with prior knowledge
+    sessions["httpx (HTTP/2)"] = lambda: HTTP2Session(http1=scheme == "https", verify=verify)
+
+    try:
+        for name, factory in sessions.items():
+            app.connections.clear()
+            app.versions.clear()
+            # the rate limits are disabled so the transports are compared, not the global limiter
+            client = unbelipy.UnbeliClient("token", prevent_rate_limits=False, session=factory() if factory else None)
+            client._BASE_URL = base_url
+            # the first burst opens the connections, aiohttp needs one per request in flight
+            cold = await burst(client, args.concurrency, args.concurrency)
+            timings = [await burst(client, args.requests, args.concurrency) for _ in range(args.rounds)]
+            await client.close_session()
+            best = min(timings)
+            print(
+                f"{name:<20} cold {cold * 1000:7.1f} ms  warm {best * 1000:8.1f} ms  {args.requests / best:6.0f} req/s  "
+                f"{len(app.connections):4d} connections  {app.versions}"
+            )
+    finally:
+        shutdown.set()
+        await server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per burst")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight at once")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the stand-in takes to answer")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per transport, the best is reported")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--certfile", help="serve over TLS with this certificate")
+    parser.add_argument("--keyfile", help="the certificate's private key")
+    parser.add_argument("--insecure", action="store_true", help="don't verify the certificate")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
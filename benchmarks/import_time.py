@@ -0,0 +1,86 @@
+"""
+Import-time benchmark for unbelipy.
+
+Runs ``python -X importtime`` in fresh interpreters and fails (exit code 1) when importing
+unbelipy and creating a client takes longer than the budget, or when a heavy dependency
+is imported before the first request.
+
+Usage::
+
+    python benchmarks/import_time.py --budget-ms 120 --runs 7
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must not be imported until a request is made
+DEFERRED_MODULES = ("aiohttp", "aiolimiter")
+
+SNIPPET = (
+    "import sys, unbelipy; unbelipy.UnbeliClient('token'); "
+    "print(','.join(m for m in {deferred!r} if m in sys.modules))"
+)
+
+def measure_once():
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SNIPPET.format(deferred=DEFERRED_MODULES)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    # lines look like "import time:      self [us] |    cumulative | imported package",
+    # nested imports are indented and already part of their parent's cumulative time.
+    # everything imported after ``site`` was imported by the snippet
+    total_us = 0
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   "):
+            continue
+        if started:
+            total_us += int(cumulative)
+        elif name.strip() == "site":
+            started = True
+
+    leaked = [module for module in result.stdout.strip().split(",") if module]
+    return total_us / 1000, leaked
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=120.0, help="maximum import time in milliseconds")
+    parser.add_argument("--runs", type=int, default=7, help="number of fresh interpreters to measure")
+    args = parser.parse_args()
+
+    timings = []
+    leaked = []
+    for _ in range(args.runs):
+        elapsed, leaked = measure_once()
+        timings.append(elapsed)
+
+    # the fastest run is the least disturbed by the rest of the machine
+    best = min(timings)
+    print(f"import unbelipy + UnbeliClient(): best {best:.2f} ms, worst {max(timings):.2f} ms over {args.runs} runs")
+
+    failed = False
+    if leaked:
+        print(f"FAIL: imported before the first request: {', '.join(leaked)}")
+        failed = True
+    if best > args.budget_ms:
+        print(f"FAIL: {best:.2f} ms is over the {args.budget_ms:.2f} ms budget")
+        failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
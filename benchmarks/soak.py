@@ -0,0 +1,213 @@
+"""
+Memory soak benchmark for unbelipy.
+
+Starts a local stand-in for the API in a separate process, so its allocations don't count, and drives
+a long mix of requests through one ``UnbeliClient``: balances and edits of users drawn from a large
+population, guilds, leaderboard pages, and a new session every ``--session-every`` requests.
+
+After ``--warmup`` requests, tracemalloc traces the client's allocations. At each checkpoint it reports
+the traced memory, the memory retained and the memory blocks kept alive per request since the first
+checkpoint, the RSS, and the object types whose number grew the most. At the end, the allocation sites
+which grew the most are listed, and the benchmark fails (exit code 1) when the memory retained per
+request is over the budget.
+
+The stand-in answers far faster than the API's global rate limit allows, so the buckets' TTL is shortened
+to keep the number of live buckets, and the sawtooth of their pruning, comparable to a real client's.
+
+Usage::
+
+    python benchmarks/soak.py --requests 1000000 --concurrency 64 --budget 16
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from email.utils import formatdate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import unbelipy  # noqa: E402
+
+GUILDS = 5
+
+def serve(port_queue, latency):
+    """Runs the stand-in API until the process is terminated."""
+    from aiohttp import web
+
+    def limit_headers():
+        now = time.time()
+        return {
+            "X-RateLimit-Limit": "1000000",
+            "X-RateLimit-Remaining": "999999",
+            "X-RateLimit-Reset": str(int((now + 1) * 1000)),
+            "Date": formatdate(now, usegmt=True),
+        }
+
+    def row(user_id, rank=1):
+        return {"user_id": str(user_id), "cash": 100, "bank": 200, "total": 300, "rank": str(rank)}
+
+    async def handle(request):
+        if latency:
+            await asyncio.sleep(latency)
+        parts = [part for part in request.path.split("/") if part][2:]
+        if len(parts) == 2:
+            body = {"id": parts[1], "name": "guild", "icon": None, "owner_id": "1", "member_count": 5, "symbol": "$"}
+        elif len(parts) == 3:
+            size = int(request.query.get("limit", 10))
+            page = int(request.query.get("page", 1))
+            users = [row(user_id, user_id) for user_id in range((page - 1) * size + 1, page * size + 1)]
+            body = {"users": users, "page": page, "total_pages": 100}
+        else:
+            if request.method != "GET":
+                await request.read()
+            body = row(parts[3])
+        return web.Response(text=json.dumps(body), content_type="application/json", headers=limit_headers())
+
+    async def main():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port_queue.put(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+async def one_request(client, number, users):
+    guild_id = number % GUILDS + 1
+    user_id = random.randrange(1, users + 1)
+    kind = number % 10
+    if kind < 6:
+        await client.get_user_balance(guild_id, user_id)
+    elif kind < 8:
+        await client.edit_user_balance(guild_id, user_id, cash=1, reason="soak")
+    elif kind < 9:
+        await client.get_guild(guild_id)
+    else:
+        await client.get_guild_leaderboard(guild_id, limit=10, offset=None, page=number % 100 + 1)
+
+async def drive(client, start, count, concurrency, users, session_every):
+    # sessions are renewed between segments, closing one under requests in flight would fail them
+    segment = session_every or count
+    end = start + count
+    while start < end:
+        numbers = iter(range(start, min(start + segment, end)))
+
+        async def worker():
+            for number in numbers:
+                await one_request(client, number, users)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        start += segment
+        if session_every and start < end:
+            await client.generate_new_session()
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return float("nan")
+
+def type_counts():
+    return Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+async def soak(args, url):
+    client = unbelipy.UnbeliClient("token", prevent_rate_limits=args.prevent_rate_limits)
+    client._BASE_URL = url
+    if args.prevent_rate_limits:
+        # the stand-in doesn't enforce the API's global limit, only the bucket handlers are exercised
+        from aiolimiter import AsyncLimiter
+        client.rate_limits._global_limiter = AsyncLimiter(10 ** 9, 1)
+    client.rate_limits.bucket_ttl = args.bucket_ttl
+
+    await drive(client, 0, args.warmup, args.concurrency, args.users, args.session_every)
+
+    gc.collect()
+    tracemalloc.start(args.frames)
+    per_checkpoint = max(args.requests // args.checkpoints, 1)
+    done = 0
+    baseline = None
+    started = time.perf_counter()
+    print(f"{'requests':>10} {'req/s':>8} {'traced MiB':>10} {'B/request':>10} {'blocks/req':>10} {'RSS MiB':>8}  growing types")
+    while done < args.requests:
+        count = min(per_checkpoint, args.requests - done)
+        await drive(client, args.warmup + done, count, args.concurrency, args.users, args.session_every)
+        done += count
+
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        counts = type_counts()
+        if baseline is None:
+            # the first checkpoint is the reference, so caches filled during it aren't counted as growth
+            baseline = (done, traced, blocks, counts, tracemalloc.take_snapshot())
+            per_request = per_block = 0.0
+            growing = ""
+        else:
+            since = done - baseline[0]
+            per_request = (traced - baseline[1]) / since
+            per_block = (blocks - baseline[2]) / since
+            growth = counts - baseline[3]
+            growing = ", ".join(f"{name} +{count}" for name, count in growth.most_common(3))
+        rate = done / (time.perf_counter() - started)
+        print(
+            f"{done:>10} {rate:>8.0f} {traced / 2 ** 20:>10.2f} {per_request:>10.2f} {per_block:>10.3f} "
+            f"{rss_mib():>8.1f}  {growing}"
+        )
+
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    await client.close_session()
+
+    print(f"\nbuckets: {len(client.rate_limits.buckets)}, largest allocation growth since the first checkpoint:")
+    for stat in snapshot.compare_to(baseline[4], "lineno")[:args.top]:
+        print(f"  {stat}")
+    return per_request
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1_000_000, help="number of traced requests")
+    parser.add_argument("--warmup", type=int, default=20_000, help="number of requests before tracing starts")
+    parser.add_argument("--concurrency", type=int, default=64, help="number of requests in flight")
+    parser.add_argument("--users", type=int, default=10_000_000, help="size of the user population")
+    parser.add_argument("--session-every", type=int, default=10_000, help="requests between new sessions, 0 to never renew")
+    parser.add_argument("--checkpoints", type=int, default=10, help="number of measurements")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in waits before answering")
+    parser.add_argument(
+        "--bucket-ttl", type=float, default=1.0,
+        help="ClientRateLimits.bucket_ttl, short as the stand-in isn't held to the API's global rate limit",
+    )
+    parser.add_argument("--prevent-rate-limits", action="store_true", help="enter the bucket handlers' locks")
+    parser.add_argument("--frames", type=int, default=1, help="frames kept per traced allocation")
+    parser.add_argument("--top", type=int, default=10, help="number of allocation sites listed")
+    parser.add_argument("--budget", type=float, default=16.0, help="maximum bytes retained per request")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(port_queue, args.latency), daemon=True)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{port_queue.get(timeout=30)}/api/v1"
+        per_request = asyncio.run(soak(args, url))
+    finally:
+        server.terminate()
+
+    if per_request > args.budget:
+        print(f"FAIL: {per_request:.2f} bytes retained per request, over the {args.budget:.2f} bytes budget")
+        sys.exit(1)
+    print(f"OK: {per_request:.2f} bytes retained per request")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""A local stand-in for the UnbelievaBoat API, served with aiohttp for the client tests."""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+
+from aiohttp import web
+
+import unbelipy
+
+
+class StandInAPI:
+    """Serves guilds, balances and leaderboards from memory.
+
+    ``gate`` holds every request until it is set, ``latency`` delays every response, or is called with
+    the number of the request to get its delay, and ``status`` makes every request fail with that HTTP status.
+    """
+
+    def __init__(self, guilds=(1,), users=50, limit=20, latency=0.0):
+        self.balances = {
+            guild_id: {user_id: [user_id * 10, user_id] for user_id in range(1, users + 1)}
+            for guild_id in guilds
+        }
+        self.limit = limit
+        self.latency = latency
+        self.status = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.calls = 0
+        self.started = 0
+        self._windows = {}
+
+    def _headers(self, bucket):
+        now = time.time()
+        window = self._windows.get(bucket)
+        if window is None or window[0] <= now:
+            window = self._windows[bucket] = [now + 1.0, self.limit]
+        window[1] -= 1
+        return {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(max(window[1], 0)),
+            'X-RateLimit-Reset': str(int(window[0] * 1000)),
+            'Date': formatdate(usegmt=True)
+        }
+
+    def _row(self, guild_id, user_id, rank):
+        cash, bank = self.balances[guild_id][user_id]
+        return {'user_id': str(user_id), 'cash': cash, 'bank': bank, 'total': cash + bank, 'rank': str(rank)}
+
+    async def handle(self, request):
+        self.started += 1
+        number = self.started
+        await self.gate.wait()
+        latency = self.latency(number) if callable(self.latency) else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+        self.calls += 1
+        if self.status is not None:
+            return web.json_response({'message': 'failed'}, status=self.status)
+
+        parts = [part for part in request.path.split('/') if part][2:]
+        headers = self._headers(request.method + '/' + '/'.join(parts[:2]))
+        if parts[0] == 'applications':
+            return web.json_response({'permissions': 1}, headers=headers)
+        guild_id = int(parts[1])
+        if guild_id not in self.balances:
+            return web.json_response({'message': 'Unknown Guild'}, status=404)
+        if len(parts) == 2:
+            return web.json_response({
+                'id': str(guild_id), 'name': 'guild', 'icon': None, 'owner_id': '1', 'member_count': 5, 'symbol': '$'
+            }, headers=headers)
+
+        if len(parts) == 3:
+            users = sorted(self.balances[guild_id].items(), key=lambda item: (-sum(item[1]), item[0]))
+            rows = [self._row(guild_id, user_id, rank) for rank, (user_id, _) in enumerate(users, 1)]
+            if 'page' in request.query:
+                size = int(request.query.get('limit', 1000))
+                page = int(request.query['page'])
+                body = {
+                    'users': rows[(page - 1) * size:page * size],
+                    'page': page,
+                    'total_pages': max(1, -(-len(rows) // size))
+                }
+                return web.json_response(body, headers=headers)
+            offset = int(request.query.get('offset', 1)) - 1
+            return web.json_response(rows[offset:offset + int(request.query.get('limit', len(rows)))], headers=headers)
+
+        user_id = int(parts[3])
+        balance = self.balances[guild_id].setdefault(user_id, [0, 0])
+        if request.method in ('PATCH', 'PUT'):
+            body = json.loads(await request.text())
+            for i, key in enumerate(('cash', 'bank')):
+                if body.get(key) is not None:
+                    balance[i] = balance[i] + body[key] if request.method == 'PATCH' else body[key]
+        return web.json_response(self._row(guild_id, user_id, 1), headers=headers)
+
+
+@asynccontextmanager
+async def serve(api, **client_options):
+    """Starts ``api`` on a local port and yields a client pointed at it."""
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    client = unbelipy.UnbeliClient('token', **client_options)
+    client._BASE_URL = f'http://127.0.0.1:{port}/api/v1'
+    try:
+        yield client
+    finally:
+        api.gate.set()
+        await client.close_session()
+        await runner.cleanup()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from unbelipy import CircuitOpen, ClientCircuitBreakers, MutationJournal, QueueFull, RequestQueue, RequestShed
+from unbelipy.admission import THROUGHPUT_WINDOW
+from unbelipy.constants import GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
+from tests.helpers import StandInAPI, serve
+
+
+def test_throughput_forgets_completions_before_idle_gap(monkeypatch):
+    queue = RequestQueue(10)
+    now = [1000.0]
+    monkeypatch.setattr('unbelipy.admission.time.monotonic', lambda: now[0])
+    for _ in range(64):
+        queue.admitted += 1
+        queue.release()
+        now[0] += 0.01
+    assert queue.throughput == pytest.approx(100, rel=0.05)
+
+    now[0] += THROUGHPUT_WINDOW + 3600
+    assert queue.throughput == GLOBAL_RATE_LIMIT / GLOBAL_RATE_PERIOD
+
+
+def test_requests_are_not_shed_after_idling(monkeypatch):
+    async def main():
+        queue = RequestQueue(10, overflow='shed', max_wait=1.0)
+        now = [1000.0]
+        monkeypatch.setattr('unbelipy.admission.time.monotonic', lambda: now[0])
+        # two slow completions, then a long idle gap
+        for _ in range(2):
+            await queue.acquire()
+            now[0] += 30
+            queue.release()
+        now[0] += 3600
+        for _ in range(5):
+            await queue.acquire()
+        assert queue.admitted == 5
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('error', [QueueFull, RequestShed, CircuitOpen])
+def test_unsent_mutations_are_abandoned(tmp_path, error):
+    async def main():
+        journal = MutationJournal(tmp_path / 'journal.jsonl')
+        if error is CircuitOpen:
+            breakers = ClientCircuitBreakers(failure_threshold=1, reset_timeout=60.0)
+            breakers.get('PATCH/guilds/1/users/2').record(False)
+            options = {'circuit_breakers': breakers}
+        elif error is RequestShed:
+            options = {'request_queue': RequestQueue(1, overflow='shed', max_wait=0.0)}
+        else:
+            options = {'request_queue': RequestQueue(1, overflow='reject')}
+
+        api = StandInAPI()
+        async with serve(api, journal=journal, projection_staleness=60, **options) as client:
+            await client.get_user_balance(1, 2)
+            queue = client.request_queue
+            if queue is not None:
+                await queue.acquire()  # keeps the only slot busy
+            calls = api.calls
+            with pytest.raises(error):
+                await client.edit_user_balance(1, 2, cash=100)
+            assert api.calls == calls
+            assert journal.pending() == []
+            # the projection isn't invalidated by a mutation which was never sent
+            assert client.projection.get(1, 2) is not None
+        await journal.close()
+
+    asyncio.run(main())
+
+
+def test_shed_queue_rejects_without_waiting_when_full():
+    async def main():
+        queue = RequestQueue(1, overflow='shed', max_wait=60.0)
+        await queue.acquire()
+        # the estimated wait is below max_wait, so only wait=False keeps the request from queueing
+        with pytest.raises(QueueFull) as info:
+            await asyncio.wait_for(queue.acquire(wait=False), 1)
+        assert not isinstance(info.value, RequestShed)
+        assert queue.waiting == 0
+
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+import asyncio
+import json
+
+from unbelipy import AuditLog, RequestQueue
+from tests.helpers import StandInAPI, serve
+
+
+def test_duration_includes_queue_wait(tmp_path):
+    path = tmp_path / 'audit.jsonl'
+
+    async def main():
+        audit_log = AuditLog(path, flush_interval=0.01)
+        async with serve(StandInAPI(), audit_log=audit_log, request_queue=RequestQueue(1)) as client:
+            queue = client.request_queue
+            await queue.acquire()
+            asyncio.get_running_loop().call_later(0.2, queue.release)
+            await client.edit_user_balance(1, 2, cash=5, reason='prize')
+        await audit_log.close()
+
+    asyncio.run(main())
+    with open(path) as file:
+        record, = [json.loads(line) for line in file]
+    assert record['reason'] == 'prize'
+    assert record['balance']['cash'] == 25
+    assert record['duration'] >= 0.2
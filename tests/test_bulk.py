@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from unbelipy import BalanceOperation
+from tests.helpers import StandInAPI, serve
+
+
+def test_operations_on_a_user_keep_their_order():
+    async def main():
+        # earlier requests answer later, so only the batch keeps a user's operations in order
+        api = StandInAPI(users=3, latency=lambda number: max(0.0, 0.1 - number * 0.01))
+        async with serve(api) as client:
+            operations = [
+                BalanceOperation(1, cash=100, mode='set'),
+                BalanceOperation(2, bank=5),
+                BalanceOperation(1, cash=5),
+                BalanceOperation(1, cash=7, bank=0, mode='set'),
+                BalanceOperation(1, cash=1),
+            ]
+            batch = client.apply_balance_operations(1, operations, concurrency=4)
+            results = [result async for result in batch]
+            assert sorted(result.index for result in results) == [0, 1, 2, 3, 4]
+            assert all(result.ok for result in results)
+            assert batch.applied == {0, 1, 2, 3, 4}
+            assert api.balances[1][1] == [8, 0]
+            assert api.balances[1][2] == [20, 7]
+
+    asyncio.run(main())
+
+
+def test_invalid_operation_sends_nothing():
+    async def main():
+        api = StandInAPI(users=3)
+        async with serve(api) as client:
+            with pytest.raises(ValueError):
+                client.apply_balance_operations(1, [BalanceOperation(1, cash=5), BalanceOperation(2)])
+
+            async def operations():
+                yield BalanceOperation(1, cash=5)
+                yield BalanceOperation(2, cash=1, mode='add')
+
+            with pytest.raises(ValueError):
+                async for _ in client.apply_balance_operations(1, operations()):
+                    pass
+            assert api.calls == 0
+
+    asyncio.run(main())
+
+
+def test_failures_cancel_and_abandoned_operations_are_accounted_for():
+    async def main():
+        api = StandInAPI(users=10)
+        async with serve(api) as client:
+            batch = client.apply_balance_operations(2, [BalanceOperation(1, cash=1)])
+            results = [result async for result in batch]
+            assert not results[0].ok and batch.failed == {0}
+
+            batch = client.apply_balance_operations(
+                1, [BalanceOperation(user_id, cash=1) for user_id in range(1, 11)], concurrency=2
+            )
+            async for result in batch:
+                batch.cancel()
+            # the operations in flight when it was cancelled still complete
+            assert 2 <= len(batch.applied) <= 3
+            assert sorted(batch.applied) + batch.not_started == list(range(10))
+
+            api.gate.clear()
+            batch = client.apply_balance_operations(
+                1, [BalanceOperation(user_id, cash=1) for user_id in range(1, 11)], concurrency=3
+            )
+
+            async def run():
+                async for _ in batch:
+                    pass
+
+            task = asyncio.ensure_future(run())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert batch.unknown == {0, 1, 2}
+            assert batch.applied == set() and len(batch.not_started) == 7
+
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from unbelipy import ClientCircuitBreakers, CircuitOpen
+from tests.helpers import StandInAPI, serve
+
+
+def test_failed_session_setup_gives_back_half_open_probe():
+    async def main():
+        breakers = ClientCircuitBreakers(failure_threshold=1, reset_timeout=0.0)
+        async with serve(StandInAPI(), circuit_breakers=breakers) as client:
+            breaker = breakers.get('GET/guilds/1')
+            breaker.record(False)
+            assert breaker.state == breaker.HALF_OPEN
+
+            new_session = client._new_session
+            def broken_session():
+                raise RuntimeError("no session")
+            client._new_session = broken_session
+            with pytest.raises(RuntimeError):
+                await client.get_guild(1)
+
+            client._new_session = new_session
+            guild = await client.get_guild(1)
+            assert guild.id == 1
+            assert breaker.state == breaker.CLOSED
+
+    asyncio.run(main())
+
+
+def test_open_circuit_fails_fast():
+    async def main():
+        breakers = ClientCircuitBreakers(failure_threshold=1, reset_timeout=60.0)
+        api = StandInAPI()
+        async with serve(api, circuit_breakers=breakers) as client:
+            breakers.get('GET/guilds/1').record(False)
+            with pytest.raises(CircuitOpen):
+                await client.get_guild(1)
+            assert api.calls == 0
+
+    asyncio.run(main())
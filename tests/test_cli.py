@@ -0,0 +1,50 @@
+import asyncio
+import csv
+
+from unbelipy.cli import main
+from tests.helpers import StandInAPI, serve
+
+
+def run_cli(api, *argv):
+    async def run():
+        async with serve(api) as client:
+            # the command runs its own event loop, so it's run from a thread while this one serves
+            return await asyncio.get_running_loop().run_in_executor(
+                None, main, ['--token', 'token', '--base-url', client._BASE_URL, *argv]
+            )
+
+    return asyncio.run(run())
+
+
+def test_export_writes_every_page(tmp_path):
+    output = tmp_path / 'export.csv'
+    assert run_cli(StandInAPI(users=25), 'export', '1', '-o', str(output), '--page-size', '10') == 0
+    with open(output, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert [int(row['rank']) for row in rows] == list(range(1, 26))
+    assert rows[0] == {'rank': '1', 'user_id': '25', 'cash': '250', 'bank': '25', 'total': '275'}
+
+
+def test_invalid_import_sends_nothing(tmp_path, capsys):
+    path = tmp_path / 'import.csv'
+    path.write_text('user_id,cash,bank\n1,5,\n2,,\n3,x,1\n')
+    api = StandInAPI(users=3)
+    assert run_cli(api, 'import', '1', str(path)) == 2
+    assert api.calls == 0
+    error = capsys.readouterr().err
+    assert 'line 3' in error and 'line 4' in error
+
+
+def test_import_resumes_after_applied_rows(tmp_path):
+    path, resume = tmp_path / 'import.csv', tmp_path / 'resume.txt'
+    path.write_text('user_id,cash,bank,reason\n1,5,,bonus\n2,,-1,\n3,100,100,\n')
+    resume.write_text('4\n')  # the third data row was applied by an earlier run
+    api = StandInAPI(users=3)
+    assert run_cli(api, 'import', '1', str(path), '--resume', str(resume), '--no-progress') == 0
+    assert api.balances[1] == {1: [15, 1], 2: [20, 1], 3: [30, 3]}
+    assert sorted(resume.read_text().split()) == ['2', '3', '4']
+
+    calls = api.calls
+    assert run_cli(api, 'import', '1', str(path), '--resume', str(resume), '--no-progress') == 0
+    assert api.balances[1] == {1: [15, 1], 2: [20, 1], 3: [30, 3]}
+    assert api.calls == calls
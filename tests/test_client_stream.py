@@ -0,0 +1,19 @@
+import asyncio
+
+from tests.helpers import StandInAPI, serve
+
+
+def test_closing_stream_early_releases_bucket():
+    async def main():
+        async with serve(StandInAPI(users=100)) as client:
+            stream = client.stream_guild_leaderboard(1, raw=True, chunk_size=64)
+            async for row in stream:
+                assert len(client.rate_limits.held()) == 1
+                break
+            await stream.aclose()
+            assert client.rate_limits.held() == {}
+            # the next request on the bucket isn't stuck behind the abandoned stream
+            users = await asyncio.wait_for(client.get_guild_leaderboard(1), 5)
+            assert len(users) == 100
+
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from unbelipy import AdaptiveConcurrencyLimit
+from tests.helpers import StandInAPI, serve
+
+
+def test_requests_waiting_for_their_bucket_hold_no_slot():
+    async def main():
+        api = StandInAPI(latency=0.3)
+        limit = AdaptiveConcurrencyLimit(initial_limit=3, min_limit=3, max_limit=3)
+        async with serve(api, concurrency_limit=limit) as client:
+            same_bucket = [asyncio.ensure_future(client.get_user_balance(1, 2)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            assert api.started == 1
+            assert limit.in_flight == 1
+            assert client.rate_limits.get_bucket('GET/guilds/1/users/2').waiting == 2
+
+            # a request to another bucket isn't held back by the ones queued on the first
+            started = time.monotonic()
+            balance = await client.get_user_balance(1, 3)
+            assert balance.user_id == 3
+            assert time.monotonic() - started < 0.45
+
+            balances = await asyncio.gather(*same_bucket)
+            assert [balance.user_id for balance in balances] == [2, 2, 2]
+            assert limit.in_flight == 0
+
+    asyncio.run(main())
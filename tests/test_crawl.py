@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import threading
+
+from unbelipy import CrawlJob
+from tests.helpers import StandInAPI, serve
+
+
+def read_lines(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_failed_leaderboard_leaves_no_rows(tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'checkpoint.jsonl'
+
+    async def main():
+        async with serve(StandInAPI(guilds=(1, 2), users=10)) as client:
+            stream = client.stream_guild_leaderboard
+
+            async def failing_stream(guild_id, **options):
+                async for row in stream(guild_id, **options):
+                    yield row
+                    if guild_id == 2:
+                        raise ConnectionResetError("connection lost halfway")
+
+            client.stream_guild_leaderboard = failing_stream
+            job = CrawlJob(client, [1, 2], ['leaderboard'], output=output, checkpoint=checkpoint)
+            summary = await job.run()
+            assert (summary.completed, summary.errored) == (1, 1)
+            assert {line['guild_id'] for line in read_lines(output)} == {1}
+            assert client.rate_limits.held() == {}
+
+            client.stream_guild_leaderboard = stream
+            summary = await job.run()
+            assert (summary.completed, summary.skipped) == (1, 1)
+            rows = read_lines(output)
+            assert len(rows) == 20
+            assert sum(1 for row in rows if row['guild_id'] == 2) == 10
+
+    asyncio.run(main())
+
+
+def test_checkpoints_are_synced_off_the_event_loop(tmp_path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        synced.append(threading.current_thread() is threading.main_thread())
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', recording_fsync)
+
+    async def main():
+        async with serve(StandInAPI(guilds=range(1, 41))) as client:
+            job = CrawlJob(
+                client, range(1, 41), ['guild', 'permissions'],
+                output=tmp_path / 'out.jsonl', checkpoint=tmp_path / 'checkpoint.jsonl'
+            )
+            summary = await job.run()
+            assert summary.completed + summary.failed == 80
+
+    asyncio.run(main())
+    assert synced and not any(synced)
+    assert len(synced) < 80
+    assert len(read_lines(tmp_path / 'checkpoint.jsonl')) == 80
+
+
+def test_leaderboard_resumes_at_the_page_it_stopped_at(tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'checkpoint.jsonl'
+
+    async def main():
+        async with serve(StandInAPI(users=10)) as client:
+            stream = client.stream_guild_leaderboard
+            requested = []
+            failing = True
+
+            async def recording_stream(guild_id, **options):
+                requested.append(options['page'])
+                async for row in stream(guild_id, **options):
+                    if failing and options['page'] == 3:
+                        raise ConnectionResetError("connection lost halfway")
+                    yield row
+
+            client.stream_guild_leaderboard = recording_stream
+            job = CrawlJob(client, [1], ['leaderboard'], output=output, checkpoint=checkpoint, page_size=4)
+            summary = await job.run()
+            assert summary.errored == 1
+            assert len(read_lines(output)) == 8
+
+            failing = False
+            summary = await job.run()
+            assert summary.completed == 1
+            assert requested == [1, 2, 3, 3]
+            ranks = [int(line['result']['rank']) for line in read_lines(output)]
+            assert ranks == list(range(1, 11))
+            assert job.estimate().requests == 0
+
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+import asyncio
+
+from unbelipy import HedgingPolicy
+from tests.helpers import StandInAPI, serve
+
+
+def slow_second_request(number):
+    return 0.5 if number == 2 else 0.0
+
+
+def test_winner_headers_count_the_cancelled_request():
+    async def main():
+        api = StandInAPI(latency=slow_second_request)
+        policy = HedgingPolicy(delay=0.05)
+        async with serve(api, hedging=policy) as client:
+            await client.get_user_balance(1, 2)
+            bucket = client.rate_limits.get_bucket('GET/guilds/1/users/2')
+            assert bucket.remaining == 19
+
+            await client.get_user_balance(1, 2)
+            assert policy.hedges_won == 1
+            # the hedge's headers say 18, the cancelled primary was sent as well
+            assert bucket.remaining == 17
+
+    asyncio.run(main())
+
+
+def test_cancelled_primary_latency_is_recorded():
+    async def main():
+        policy = HedgingPolicy(delay=0.05)
+        async with serve(StandInAPI(latency=slow_second_request), hedging=policy) as client:
+            await client.get_user_balance(1, 2)
+            await client.get_user_balance(1, 2)
+            await asyncio.sleep(0.01)  # lets the cancelled primary unwind
+            latencies = sorted(policy._latencies['GET/guilds/:id/users/:id'])
+            # the warm-up, the winning hedge and at least the delay for the cancelled primary
+            assert len(latencies) == 3
+            assert latencies[-1] >= 0.05
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import tracemalloc
+
+from unbelipy.history import BalanceHistory
+from unbelipy.objects import UserBalance
+
+
+def balance(user_id, cash, bank=0, guild_id=1):
+    return UserBalance(total=cash + bank, cash=cash, bank=bank, user_id=user_id, guild_id=guild_id, bucket='guild')
+
+
+def test_series_is_a_step_function():
+    history = BalanceHistory()
+    assert history.record(balance(1, 10), 100)
+    assert not history.record(balance(1, 10), 150)
+    assert history.record(balance(1, 20, 5), 200)
+    # an observation received late never goes back in time
+    assert history.record(balance(1, 30), 190)
+
+    assert [(p.timestamp, p.total) for p in history.series(1, 1)] == [(100, 10), (200, 25), (200, 30)]
+    assert history.at(1, 1, 99) is None
+    assert history.at(1, 1, 150).total == 10
+    assert [(t, p and p.total) for t, p in history.sample(1, 1, 50, 250, 50)] == [
+        (50, None), (100, 10), (150, 10), (200, 30), (250, 30)
+    ]
+    assert history.series(1, 2) == []
+
+
+def test_old_points_are_downsampled_into_buckets():
+    history = BalanceHistory(raw_points=2, tiers=((10, 2), (100, 1)))
+    for second, cash in enumerate([5, 1, 9, 4, 7, 3, 8, 2, 6], start=1):
+        history.record(balance(1, cash), second * 4)
+
+    points = history.series(1, 1)
+    assert [(p.timestamp, p.resolution) for p in points] == [(0, 100), (10, 10), (20, 10), (32, 0), (36, 0)]
+    # buckets keep the last cash and the range of totals, the coarsest one got the points at 4 and 8
+    assert (points[0].min_total, points[0].max_total, points[0].cash) == (1, 5, 1)
+    assert (points[1].min_total, points[1].max_total, points[1].cash) == (4, 9, 4)
+    assert (points[2].min_total, points[2].max_total, points[2].cash) == (3, 8, 8)
+    assert history.points == 5
+
+
+def test_memory_bound_counts_every_user():
+    users = [balance(user_id, 10) for user_id in range(5000)]
+    history = BalanceHistory(max_points=500_000)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history.record_many(users, 100)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert 0.75 < used / history.memory_bytes < 1.25
+
+    bounded = BalanceHistory(max_points=50_000)
+    bounded.record_many(users, 100)
+    assert bounded.evicted == 5000 - len(bounded)
+    assert bounded.memory_bytes <= 50_000 * 24
+    assert bounded.series(1, 0) == [] and len(bounded.series(1, 4999)) == 1
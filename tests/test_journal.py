@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from unbelipy import InternalServerError, MutationJournal
+from tests.helpers import StandInAPI, serve
+
+
+def test_failed_mutation_is_replayed_once(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+
+    async def main():
+        api = StandInAPI(guilds=(1, 2))
+        journal = MutationJournal(path)
+        async with serve(api, journal=journal) as client:
+            api.status = 500
+            with pytest.raises(InternalServerError):
+                await client.edit_user_balance(1, 2, cash=100, reason='payout')
+            # a mutation to a guild which doesn't exist can never succeed, it's dropped on replay
+            api.status = 500
+            with pytest.raises(InternalServerError):
+                await client.set_user_balance(404, 2, cash=1)
+        await journal.close()
+
+        journal = MutationJournal(path)
+        assert [(entry.method, entry.guild_id, entry.cash) for entry in journal.pending()] == [
+            ('PATCH', 1, 100), ('PUT', 404, 1)
+        ]
+        api.status = None
+        async with serve(api, journal=journal) as client:
+            balances = await client.replay_journal()
+            assert [balance.cash for balance in balances] == [120]
+            assert journal.pending() == []
+            assert await client.replay_journal() == []
+        await journal.close()
+        assert MutationJournal(path).pending() == []
+
+    asyncio.run(main())
+
+
+def test_torn_line_skips_only_itself(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+
+    async def main():
+        journal = MutationJournal(path)
+        first = await journal.record('PATCH', 1, 2, cash=5)
+        await journal.close()
+        with open(path, 'ab') as file:
+            file.write(b'{"op": "begin", "key": "tor\n')
+        journal = MutationJournal(path)
+        second = await journal.record('PUT', 1, 3, bank=7)
+        await journal.close()
+
+        keys = [entry.key for entry in MutationJournal(path).pending()]
+        assert keys == [first.key, second.key]
+
+    asyncio.run(main())
+
+
+def test_set_user_balance_replaces_amounts():
+    async def main():
+        async with serve(StandInAPI()) as client:
+            balance = await client.set_user_balance(1, 2, cash=7)
+            assert (balance.cash, balance.bank) == (7, 2)
+
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from unbelipy import NotFound
+from tests.helpers import StandInAPI, serve
+
+
+def test_missing_guild_is_skipped_and_reported():
+    async def main():
+        async with serve(StandInAPI(guilds=(1, 2), users=30)) as client:
+            merge = client.merge_leaderboards([1, 404, 2], limit=40, page_size=10)
+            users = await merge.collect()
+            assert len(users) == 40
+            totals = [user.total for user in users]
+            assert totals == sorted(totals, reverse=True)
+            assert {user.guild_id for user in users} == {1, 2}
+            assert list(merge.failed) == [404]
+            assert isinstance(merge.failed[404], NotFound)
+
+    asyncio.run(main())
+
+
+def test_missing_guild_ends_merge_without_skip_failed():
+    async def main():
+        async with serve(StandInAPI(guilds=(1, 2))) as client:
+            merge = client.merge_leaderboards([1, 404, 2], skip_failed=False)
+            with pytest.raises(NotFound):
+                await merge.collect()
+
+    asyncio.run(main())
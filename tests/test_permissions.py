@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from unbelipy import Forbidden, PermissionCache, Permissions
+from tests.helpers import StandInAPI, serve
+
+
+class RestrictedAPI(StandInAPI):
+    """Answers every request about the guilds in ``errors`` with their HTTP status."""
+
+    def __init__(self, errors, **options):
+        super().__init__(**options)
+        self.errors = errors
+
+    async def handle(self, request):
+        for guild_id, status in self.errors.items():
+            if f'/guilds/{guild_id}/' in request.path + '/':
+                self.calls += 1
+                return web.json_response({'message': 'failed'}, status=status)
+        return await super().handle(request)
+
+
+def test_entries_expire_and_unknown_is_never_missing():
+    cache = PermissionCache(ttl=0.02)
+    assert cache.set(1, 0) is Permissions.NONE
+    cache.set(2, 1)
+    assert cache.is_missing(1) and not cache.is_missing(2)
+    assert not cache.is_missing(3)
+    time.sleep(0.03)
+    assert cache.get(1) is None and not cache.is_missing(1)
+    assert len(cache) == 1
+
+
+def test_preflight_refuses_mutations_locally():
+    async def main():
+        api = RestrictedAPI({2: 403, 3: 404}, guilds=(1, 2, 3), users=3)
+        async with serve(api, permission_ttl=60) as client:
+            results = await client.preflight_permissions([1, 2, 3])
+            assert results == {1: Permissions.ECONOMY, 2: Permissions.NONE, 3: Permissions.NONE}
+
+            calls = api.calls
+            with pytest.raises(Forbidden):
+                await client.edit_user_balance(2, 1, cash=5)
+            assert api.calls == calls
+            await client.edit_user_balance(1, 1, cash=5)
+            assert api.balances[1][1] == [15, 1]
+
+    asyncio.run(main())
+
+
+def test_forbidden_answer_invalidates_the_guild():
+    async def main():
+        api = RestrictedAPI({}, users=3)
+        async with serve(api, permission_ttl=60) as client:
+            assert await client.get_permissions(1) == 1
+            api.errors[1] = 403  # revoked since it was cached
+            with pytest.raises(Forbidden):
+                await client.edit_user_balance(1, 1, cash=5)
+            assert client.permissions.get(1) is None
+
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+import time
+
+from unbelipy.objects import UserBalance
+from unbelipy.projection import BalanceProjection
+
+
+def balance(user_id, cash=10, bank=0, guild_id=1):
+    return UserBalance(
+        total=cash + bank, cash=cash, bank=bank, user_id=user_id, guild_id=guild_id, bucket='guild'
+    )
+
+
+def test_max_entries_evicts_least_recently_updated():
+    projection = BalanceProjection(60, max_entries=3)
+    for user_id in range(5):
+        projection.confirm(balance(user_id))
+    assert len(projection) == 3
+    assert projection.evicted == 2
+    assert projection.get(1, 0) is None
+    assert projection.get(1, 4).balance.user_id == 4
+
+
+def test_eviction_keeps_pending_mutations():
+    projection = BalanceProjection(60, max_entries=2)
+    projection.confirm(balance(0))
+    token = projection.begin('PATCH', 1, 0, 5, None)
+    projection.confirm(balance(1))
+    projection.confirm(balance(2))
+    projection.confirm(balance(3))
+    assert projection.get(1, 0).balance.cash == 15
+    projection.end(1, 0, token)
+    assert projection.get(1, 0).confirmed
+
+
+def test_stale_entries_are_dropped():
+    projection = BalanceProjection(0.01)
+    projection.confirm(balance(0))
+    projection.confirm(balance(1))
+    time.sleep(0.02)
+    assert projection.get(1, 0) is None
+    assert len(projection) == 1
+    assert projection.prune() == 1
+    assert len(projection) == 0
+
+
+def test_failed_mutation_without_balance_leaves_nothing_behind():
+    projection = BalanceProjection(60)
+    token = projection.begin('PUT', 1, 0, 5, 5)
+    projection.invalidate(1, 0)
+    projection.end(1, 0, token)
+    assert len(projection) == 0
+
+
+def test_eviction_at_capacity_is_constant_time():
+    projection = BalanceProjection(60, max_entries=100_000)
+    for user_id in range(100_000):
+        projection.confirm(balance(user_id))
+    started = time.perf_counter()
+    for user_id in range(100_000, 102_000):
+        projection.confirm(balance(user_id))
+    assert time.perf_counter() - started < 1.0
+    assert len(projection) == 100_000
+    assert projection.get(1, 1999) is None and projection.get(1, 2000) is not None
@@ -0,0 +1,46 @@
+import math
+
+from unbelipy.objects import UserBalance
+from unbelipy.rank_index import GuildRankIndex
+
+
+def balance(user_id, cash, bank):
+    return UserBalance(
+        total='Infinity' if 'Infinity' in (cash, bank) else cash + bank,
+        cash=cash, bank=bank, user_id=user_id, guild_id=1, bucket='guild'
+    )
+
+
+def make_index():
+    index = GuildRankIndex(1)
+    index.replace([balance(1, 10, 5), balance(2, 'Infinity', 0), balance(3, 20, 0)])
+    return index
+
+
+def test_get_keeps_infinite_balance():
+    index = make_index()
+    ranked = index.get(2)
+    assert ranked.rank == 1
+    assert math.isinf(ranked.cash) and math.isinf(ranked.total)
+    assert ranked.bank == 0
+    assert index.get(2, 'bank').rank == 2
+
+
+def test_between_and_neighbors_with_infinite_balance():
+    index = make_index()
+    assert [(b.user_id, b.rank) for b in index.top(3)] == [(2, 1), (3, 2), (1, 3)]
+    assert [b.user_id for b in index.neighbors(3)] == [2, 3, 1]
+    assert math.isinf(index.between(1, 1, 'cash')[0].cash)
+
+
+def test_ranked_copies_leave_index_untouched():
+    index = make_index()
+    index.get(3)
+    assert index._balances[3].rank is None
+
+
+def test_update_moves_user_past_infinite_balance():
+    index = make_index()
+    index.update(balance(1, 'Infinity', 1))
+    assert index.rank_of(1) == 1
+    assert index.rank_of(2) == 2
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+
+import unbelipy
+
+from unbelipy import AdaptiveConcurrencyLimit, RequestQueue
+from unbelipy.rate_limits import BucketWatchdog, ClientRateLimits
+from tests.helpers import StandInAPI, serve
+
+BUCKET = 'GET/guilds/1/users/2'
+
+
+def limit(rate_limits, bucket, remaining, reset_at):
+    handler = rate_limits.get_bucket(bucket)
+    handler.remaining = remaining
+    handler.reset_at = reset_at
+    rate_limits._update(handler)
+    return handler
+
+
+def test_moving_resets_keep_heap_bounded():
+    rate_limits = ClientRateLimits(prevent_rate_limits=True)
+    now = time.monotonic()
+    for i in range(10_000):
+        # the estimated reset moves a little with every response while the bucket stays limited
+        limit(rate_limits, f'GET/guilds/1/users/{i % 10}', 0, now + 60 + i / 1000)
+    assert len(rate_limits._resets) <= 2 * 10 + 64
+    assert len(rate_limits.currently_limited()) == 10
+    assert rate_limits.is_limited('GET/guilds/1/users/3')
+
+
+def test_expired_resets_are_purged_without_queries():
+    rate_limits = ClientRateLimits(prevent_rate_limits=True)
+    past = time.monotonic() - 1
+    for i in range(10_000):
+        limit(rate_limits, f'GET/guilds/1/users/{i}', 0, past)
+    assert len(rate_limits._resets) <= 1
+    assert len(rate_limits._limited) <= 1
+
+
+def test_cleared_limits_are_dropped_from_heap():
+    rate_limits = ClientRateLimits(prevent_rate_limits=True)
+    future = time.monotonic() + 60
+    for i in range(1_000):
+        bucket = f'GET/guilds/1/users/{i}'
+        limit(rate_limits, bucket, 0, future)
+        limit(rate_limits, bucket, 5, future)
+    assert rate_limits.currently_limited() == []
+    assert len(rate_limits._resets) <= 64 + 1
+
+
+def make_bucket():
+    rate_limits = ClientRateLimits(prevent_rate_limits=True)
+    handler = rate_limits.get_bucket(BUCKET)
+    handler.prevent_429 = True
+    return rate_limits, handler
+
+
+async def use(handler, entered=None):
+    async with handler:
+        if entered is not None:
+            entered.set()
+            await asyncio.sleep(3600)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_while_waiting_for_the_lock():
+    async def main():
+        rate_limits, handler = make_bucket()
+        entered = asyncio.Event()
+        holder = asyncio.ensure_future(use(handler, entered))
+        await entered.wait()
+
+        waiter = asyncio.ensure_future(use(handler))
+        await settle()
+        assert handler.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert handler.waiting == 0
+
+        nxt = asyncio.ensure_future(use(handler))
+        await settle()
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        await asyncio.wait_for(nxt, 1)
+        assert handler.idle and not handler.cond.locked()
+
+    asyncio.run(main())
+
+
+def test_cancelled_during_the_reset_sleep():
+    async def main():
+        rate_limits, handler = make_bucket()
+        handler.remaining = 0
+        handler.reset_at = time.monotonic() + 3600
+        sleeper = asyncio.ensure_future(use(handler))
+        await settle()
+        assert handler.holder is sleeper
+        nxt = asyncio.ensure_future(use(handler))
+        await settle()
+        assert handler.waiting == 1
+
+        handler.remaining = 1  # the next request doesn't have to wait for the reset
+        sleeper.cancel()
+        await asyncio.gather(sleeper, return_exceptions=True)
+        await asyncio.wait_for(nxt, 1)
+        assert handler.idle and handler.holder is None and not handler.cond.locked()
+
+    asyncio.run(main())
+
+
+def test_cancelled_during_the_request():
+    async def main():
+        api = StandInAPI()
+        queue = RequestQueue(10)
+        limit = AdaptiveConcurrencyLimit(initial_limit=10)
+        async with serve(api, request_queue=queue, concurrency_limit=limit) as client:
+            await client.get_user_balance(1, 2)
+            api.gate.clear()
+            in_flight = asyncio.ensure_future(client.get_user_balance(1, 2))
+            while api.started < 2:
+                await asyncio.sleep(0.01)
+            nxt = asyncio.ensure_future(client.get_user_balance(1, 2))
+            await asyncio.sleep(0.05)
+            assert client.rate_limits.get_bucket(BUCKET).waiting == 1
+
+            in_flight.cancel()
+            await asyncio.gather(in_flight, return_exceptions=True)
+            api.gate.set()
+            balance = await asyncio.wait_for(nxt, 5)
+            assert balance.user_id == 2
+            assert client.rate_limits.held() == {}
+            assert (queue.admitted, queue.in_flight, limit.in_flight) == (0, 0, 0)
+
+    asyncio.run(main())
+
+
+def test_watchdog_reports_stalled_bucket(caplog):
+    async def main():
+        rate_limits, handler = make_bucket()
+        watchdog = BucketWatchdog(rate_limits, threshold=0.05, interval=0.01)
+        entered = asyncio.Event()
+        stuck = asyncio.ensure_future(use(handler, entered))
+        await entered.wait()
+        behind = asyncio.ensure_future(use(handler))
+
+        watchdog.start()
+        await asyncio.sleep(0.2)
+        assert watchdog.running
+        stall, = watchdog.stalls  # reported once however long it lasts
+        assert stall.bucket == BUCKET
+        assert stall.holder is stuck
+        assert stall.waiting == 1
+        assert stall.held_for >= 0.05
+
+        stuck.cancel()
+        await asyncio.gather(stuck, return_exceptions=True)
+        await asyncio.wait_for(behind, 1)
+        assert watchdog.check() == []
+        watchdog.stop()
+        assert not watchdog.running
+
+    with caplog.at_level(logging.WARNING, logger='unbelipy.rate_limits'):
+        asyncio.run(main())
+    assert any(BUCKET in record.getMessage() for record in caplog.records)
+
+
+def test_wait_false_never_waits_on_the_bucket():
+    async def main():
+        api = StandInAPI(limit=2)
+        async with serve(api) as client:
+            api.gate.clear()
+            holder = asyncio.ensure_future(client.get_user_balance(1, 2))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            try:
+                await client.get_user_balance(1, 2, wait=False)
+            except unbelipy.RateLimited as error:
+                assert error.bucket == BUCKET
+            else:
+                raise AssertionError("a bucket in use didn't raise")
+            assert time.monotonic() - started < 0.05
+            api.gate.set()
+            await holder
+
+            # the second request left no requests until the reset
+            await client.get_user_balance(1, 2)
+            started = time.monotonic()
+            try:
+                await client.get_user_balance(1, 2, wait=False)
+            except unbelipy.RateLimited as error:
+                assert error.retry_after > 0
+            else:
+                raise AssertionError("an exhausted bucket didn't raise")
+            assert time.monotonic() - started < 0.05
+            assert client.rate_limits.held() == {}
+
+    asyncio.run(main())
+
+
+def test_prune_keeps_buckets_of_waiting_requests():
+    async def main():
+        api = StandInAPI()
+        async with serve(api, request_queue=RequestQueue(1)) as client:
+            rate_limits = client.rate_limits
+            api.gate.clear()
+            first = asyncio.ensure_future(client.get_user_balance(1, 2))
+            while api.started < 1:
+                await asyncio.sleep(0.01)
+            # waits for the request queue before taking its bucket's lock
+            second = asyncio.ensure_future(client.get_user_balance(1, 3))
+            await asyncio.sleep(0.05)
+            waiting = rate_limits.buckets['GET/guilds/1/users/3']
+            assert waiting.references == 1 and waiting.held_since is None
+
+            rate_limits.bucket_ttl = 0
+            rate_limits.prune()
+            assert rate_limits.get_bucket('GET/guilds/1/users/3') is waiting
+
+            api.gate.set()
+            await asyncio.gather(first, second)
+            assert waiting.references == 0 and waiting.idle
+
+    asyncio.run(main())
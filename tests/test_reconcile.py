@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from unbelipy import Reconciler
+from tests.helpers import StandInAPI, serve
+
+# users 1 to 5 hold [user_id * 10, user_id] on the stand-in
+LEDGER = [(1, 10, 1), (2, 25, 2), (3, 30, 3), (5, 50, 5), (7, 70, 7)]
+
+
+def test_differences_are_found_and_corrected():
+    async def main():
+        api = StandInAPI(users=5)
+        async with serve(api) as client:
+            report = await Reconciler(client, 1, LEDGER, page_size=2).run()
+            assert (report.checked, report.matched, report.pages) == (5, 3, 3)
+            assert [(m.user_id, m.kind) for m in report.mismatches] == [(2, 'mismatch'), (4, 'unexpected'), (7, 'missing')]
+            assert api.balances[1][2] == [20, 2]
+
+            report = await Reconciler(client, 1, LEDGER, correct=True, reason='ledger').run()
+            assert (report.corrected, report.failed, report.stale) == (2, 0, 0)
+            assert all(m.corrected for m in report.mismatches if m.kind != 'unexpected')
+            assert api.balances[1][2] == [25, 2]
+            assert api.balances[1][7] == [70, 7]
+            assert 4 in api.balances[1]
+
+            report = await Reconciler(client, 1, LEDGER).run()
+            assert [(m.user_id, m.kind) for m in report.mismatches] == [(4, 'unexpected')]
+
+    asyncio.run(main())
+
+
+def test_async_source_must_be_sorted():
+    async def ledger():
+        for row in reversed(LEDGER):
+            yield row
+
+    async def main():
+        async with serve(StandInAPI(users=5)) as client:
+            with pytest.raises(ValueError):
+                await Reconciler(client, 1, ledger()).run()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+from unbelipy import QuantileSketch
+from unbelipy.objects import UserBalance
+from unbelipy.stats import _EconomyAccumulator
+from tests.helpers import StandInAPI, serve
+
+
+def balance(user_id, total):
+    return UserBalance(total=total, cash=total, bank=0, user_id=user_id, guild_id=1, bucket='guild')
+
+
+def gini(totals):
+    # the mean absolute difference over twice the mean
+    n = len(totals)
+    return sum(abs(a - b) for a in totals for b in totals) / (2 * n * n * (sum(totals) / n))
+
+
+def top_share(totals, percent):
+    ranked = sorted(totals, reverse=True)
+    return sum(ranked[:math.ceil(len(ranked) * percent / 100)]) / sum(ranked)
+
+
+def test_accumulator_matches_direct_computation():
+    rng = random.Random(7)
+    totals = sorted((rng.randint(0, 10_000) for _ in range(950)), reverse=True)
+    accumulator = _EconomyAccumulator(top_percent=5, relative_accuracy=0.01)
+    # pages of 100 users, the number of users is only known within a page
+    accumulator.expect(901, 1000)
+    for start in range(0, len(totals), 100):
+        accumulator.add_many(balance(start + i, total) for i, total in enumerate(totals[start:start + 100]))
+    stats = accumulator.result()
+
+    assert stats.users == 950 and stats.money_supply == sum(totals)
+    assert stats.gini == pytest.approx(gini(totals))
+    assert stats.top_share == pytest.approx(top_share(totals, 5))
+    assert (stats.min, stats.max) == (min(totals), max(totals))
+
+
+def test_infinite_balances_are_left_out():
+    accumulator = _EconomyAccumulator(top_percent=50, relative_accuracy=0.01)
+    accumulator.add_many([balance(1, float('inf')), balance(2, 30), balance(3, 10)])
+    stats = accumulator.result()
+    assert (stats.users, stats.infinite, stats.finite_users) == (3, 1, 2)
+    assert stats.top_share == pytest.approx(0.75)
+    assert stats.mean == 20
+
+
+def test_guild_economy_stats_over_pages():
+    async def main():
+        async with serve(StandInAPI(users=25)) as client:
+            stats = await client.guild_economy_stats(1, top_percent=10, page_size=10)
+            totals = [user_id * 11 for user_id in range(1, 26)]
+            assert (stats.users, stats.pages, stats.complete) == (25, 3, True)
+            assert stats.gini == pytest.approx(gini(totals))
+            assert stats.top_share == pytest.approx(top_share(totals, 10))
+
+            partial = await client.guild_economy_stats(1, page_size=10, max_pages=1)
+            assert (partial.users, partial.complete) == (10, False)
+
+    asyncio.run(main())
+
+
+def test_merged_sketches_match_a_single_sketch():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(8, 2) * rng.choice((1, 1, 1, -1)) for _ in range(5000)] + [0] * 50
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+
+    assert first.count == whole.count == len(values)
+    ordered = sorted(values)
+    for q in (0, 0.1, 0.25, 0.5, 0.9, 0.99, 1):
+        assert first.quantile(q) == whole.quantile(q)
+        exact = ordered[int(q * (len(values) - 1))]
+        assert first.quantile(q) == pytest.approx(exact, rel=0.01, abs=1e-9)
+
+    with pytest.raises(ValueError):
+        first.merge(QuantileSketch(0.02))
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from unbelipy import TransferFailed
+from tests.helpers import StandInAPI, serve
+
+# users 1 and 2 hold [10, 1] and [20, 2] on the stand-in
+BEFORE = {1: [10, 1], 2: [20, 2]}
+
+
+def receiver_fails_with(client, fail):
+    edit = client.edit_user_balance
+
+    async def failing_edit(guild_id, user_id, *args, **options):
+        if user_id == 2:
+            await fail()
+        return await edit(guild_id, user_id, *args, **options)
+
+    client.edit_user_balance = failing_edit
+
+
+def test_failed_leg_is_compensated():
+    async def main():
+        api = StandInAPI(users=2)
+        async with serve(api) as client:
+            async def fail():
+                raise ConnectionResetError("connection lost")
+
+            receiver_fails_with(client, fail)
+            with pytest.raises(TransferFailed) as info:
+                await client.transfer(1, 1, 2, cash=5)
+            assert info.value.compensated and info.value.failed_user_id == 2
+            assert api.balances[1] == BEFORE
+
+    asyncio.run(main())
+
+
+def test_cancelled_leg_is_compensated():
+    async def main():
+        api = StandInAPI(users=2)
+        async with serve(api) as client:
+            async def fail():
+                raise asyncio.CancelledError()
+
+            receiver_fails_with(client, fail)
+            with pytest.raises(asyncio.CancelledError):
+                await client.transfer(1, 1, 2, cash=5)
+            assert api.balances[1] == BEFORE
+
+    asyncio.run(main())
+
+
+def test_cancelled_transfer_reverts_the_applied_leg():
+    async def main():
+        api = StandInAPI(users=2)
+        async with serve(api) as client:
+            receiver_fails_with(client, asyncio.Event().wait)  # the credit is never sent
+            transfer = asyncio.ensure_future(client.transfer(1, 1, 2, cash=5, check_balance=False))
+            while api.balances[1][1] == [10, 1]:
+                await asyncio.sleep(0.01)
+            assert api.balances[1][1] == [5, 1]
+
+            transfer.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await transfer
+            assert api.balances[1] == BEFORE
+
+    asyncio.run(main())
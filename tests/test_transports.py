@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('h2')
+
+from unbelipy.transports import HTTP2Session
+from tests.helpers import StandInAPI, serve
+
+
+def test_client_works_over_the_httpx_session():
+    async def main():
+        api = StandInAPI(users=30, limit=5)
+        async with serve(api, http2=True) as client:
+            balance = await client.get_user_balance(1, 3)
+            assert isinstance(client._session, HTTP2Session)
+            assert (balance.cash, balance.bank) == (30, 3)
+            assert client.rate_limits.get_bucket('GET/guilds/1/users/3').remaining == 4
+
+            balance = await client.edit_user_balance(1, 3, cash=-5, reason='fee')
+            assert api.balances[1][3] == [25, 3] and balance.cash == 25
+
+            rows = [row async for row in client.stream_guild_leaderboard(1, raw=True, chunk_size=128)]
+            assert [int(row['rank']) for row in rows] == list(range(1, 31))
+            page = await client.get_guild_leaderboard(1, limit=10, offset=None, page=3)
+            assert (page['page'], page['total_pages'], len(page['users'])) == (3, 3, 10)
+
+        assert client._session.closed
+
+    asyncio.run(main())
+
+
+def test_response_exposes_what_the_client_reads():
+    async def main():
+        async with serve(StandInAPI()) as client:
+            session = HTTP2Session()
+            async with session.request('GET', client._BASE_URL + '/guilds/1', headers={'Authorization': 'token'}) as response:
+                assert (response.status, response.reason) == (200, 'OK')
+                # the stand-in only speaks HTTP/1.1, which httpx falls back to
+                assert response.http_version == 'HTTP/1.1'
+                assert int(response.headers['X-RateLimit-Limit']) == 20
+                assert (await response.json())['id'] == '1'
+                assert await response.read() == await response.read()
+            await session.close()
+            assert session.closed
+
+    asyncio.run(main())
+
+
+def test_transport_errors_are_the_sessions():
+    async def main():
+        session = HTTP2Session(timeout=1)
+        with pytest.raises(session.transport_errors):
+            async with session.request('GET', 'http://127.0.0.1:9/'):
+                pass
+        await session.close()
+
+    asyncio.run(main())
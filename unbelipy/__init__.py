@@ -25,14 +25,90 @@ SOFTWARE.
 __version__ = '2.1.1b'
 
 import logging
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from .client import UnbeliClient as UnbeliClient
 from .errors import *
-from .objects import (
-    UserBalance as UserBalance,
-    Guild as Guild
-)
-from .rate_limits import *
+from .errors import __all__ as _errors_all
+
+# every other name is imported from its submodule on first access, so that ``import unbelipy``
+# doesn't pay for aiohttp, aiolimiter or dataclasses until they are actually used
+_LAZY_ATTRIBUTES = {
+    "UnbeliClient": "client",
+    "UserBalance": "objects",
+    "Guild": "objects",
+    "BucketHandler": "rate_limits",
+    "ClientRateLimits": "rate_limits",
+    "ServerClock": "rate_limits",
+    "AdaptivePadding": "rate_limits",
+    "BucketStall": "rate_limits",
+    "BucketWatchdog": "rate_limits",
+    "GuildRankIndex": "rank_index",
+    "RankIndex": "rank_index",
+    "JournalEntry": "journal",
+    "MutationJournal": "journal",
+    "ProjectedBalance": "projection",
+    "BalanceProjection": "projection",
+    "BalancePoint": "history",
+    "BalanceHistory": "history",
+    "CircuitBreaker": "circuit_breaker",
+    "ClientCircuitBreakers": "circuit_breaker",
+    "HedgingPolicy": "hedging",
+    "CrawlEstimate": "crawl",
+    "CrawlSummary": "crawl",
+    "CrawlJob": "crawl",
+    "RequestQueue": "admission",
+    "AdaptiveConcurrencyLimit": "concurrency",
+    "AuditRecord": "audit",
+    "AuditLog": "audit",
+    "BalanceMismatch": "reconcile",
+    "ReconcileReport": "reconcile",
+    "Reconciler": "reconcile",
+    "QuantileSketch": "stats",
+    "EconomyStats": "stats",
+    "BalanceOperation": "bulk",
+    "BalanceOperationResult": "bulk",
+    "BalanceOperationBatch": "bulk",
+    "MergedLeaderboard": "merge",
+    "Permissions": "permissions",
+    "PermissionCache": "permissions",
+}
+
+__all__ = _errors_all + tuple(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .client import UnbeliClient as UnbeliClient
+    from .objects import (
+        UserBalance as UserBalance,
+        Guild as Guild
+    )
+    from .rate_limits import *
+    from .rank_index import *
+    from .journal import *
+    from .projection import *
+    from .history import *
+    from .circuit_breaker import *
+    from .hedging import *
+    from .crawl import *
+    from .admission import *
+    from .concurrency import *
+    from .audit import *
+    from .reconcile import *
+    from .stats import *
+    from .bulk import *
+    from .merge import *
+    from .permissions import *
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
@@ -0,0 +1,208 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import (
+    AsyncIterator,
+    Deque,
+    Optional
+)
+
+from .constants import GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
+from .errors import QueueFull, RequestShed
+
+__all__ = (
+    "RequestQueue",
+)
+
+OVERFLOW_POLICIES = ('wait', 'reject', 'shed')
+
+# completions older than this many seconds don't count towards the throughput
+THROUGHPUT_WINDOW = 10.0
+
+class RequestQueue:
+    """
+    Caps the number of requests a :class:`UnbeliClient` has queued on its rate limits or in flight.
+
+    A request is *admitted* once it holds one of the ``max_pending`` slots, and keeps it until its response
+    is handled. Requests beyond the cap are handled according to ``overflow``:
+
+    * ``"wait"``: wait for a slot, in order of arrival (backpressure).
+    * ``"reject"``: raise :exc:`QueueFull` immediately.
+    * ``"shed"``: raise :exc:`RequestShed` when the estimated wait before being sent exceeds ``max_wait``,
+      otherwise wait for a slot. This check applies to every request, even below the cap.
+
+    Parameters
+    ----------
+    max_pending: :class:`int`
+        The maximum number of admitted requests.
+    overflow: :class:`str`
+        "wait", "reject" or "shed". This defaults to "wait".
+    max_wait: Optional[:class:`float`]
+        The longest estimated wait in seconds a request may face, required when ``overflow`` is "shed".
+
+    Attributes
+    ----------
+    admitted: :class:`int`
+        Requests holding a slot, whether they are waiting on the rate limits or in flight.
+    in_flight: :class:`int`
+        Admitted requests whose HTTP request has been sent and not answered yet.
+    waiting: :class:`int`
+        Requests waiting for a slot.
+    """
+
+    def __init__(
+        self,
+        max_pending: int,
+        *,
+        overflow: str = 'wait',
+        max_wait: Optional[float] = None
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow can only be "wait", "reject" or "shed" but was "{overflow}"')
+        if overflow == 'shed' and max_wait is None:
+            raise ValueError('max_wait must be specified when overflow is "shed"')
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be 1 or greater but was {max_pending}")
+
+        self.max_pending: int = max_pending
+        self.overflow: str = overflow
+        self.max_wait: Optional[float] = max_wait
+        self.admitted: int = 0
+        self.in_flight: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._completions: Deque[float] = deque(maxlen=64)
+
+    def __repr__(self) -> str:
+        return (
+            f"RequestQueue(max_pending={self.max_pending}, overflow={self.overflow}, "
+            f"admitted={self.admitted}, in_flight={self.in_flight}, waiting={self.waiting})"
+        )
+
+    @property
+    def waiting(self) -> int:
+        """:class:`int`: Requests waiting for a slot."""
+        return len(self._waiters)
+
+    @property
+    def depth(self) -> int:
+        """:class:`int`: Every request admitted or waiting for a slot."""
+        return self.admitted + self.waiting
+
+    @property
+    def throughput(self) -> float:
+        """:class:`float`: Requests completed per second over the last 10 seconds, or the global rate limit if unknown."""
+        completions = self._completions
+        # after an idle gap the last completions say nothing about the current rate
+        since = time.monotonic() - THROUGHPUT_WINDOW
+        while completions and completions[0] < since:
+            completions.popleft()
+        if len(completions) >= 2:
+            span = completions[-1] - completions[0]
+            if span > 0:
+                return (len(completions) - 1) / span
+        return GLOBAL_RATE_LIMIT / GLOBAL_RATE_PERIOD
+
+    def estimated_wait(self) -> float:
+        """Estimates the seconds a new request would wait before being sent.
+
+        Returns
+        -------
+        :class:`float`
+            The number of requests ahead divided by the recent throughput.
+        """
+
+        return self.depth / self.throughput
+
+    async def acquire(self, wait: bool = True) -> None:
+        """Waits for a slot according to the overflow policy.
+
+        Parameters
+        ----------
+        wait: :class:`bool`
+            Whether to wait for a slot at all. If ``False``, a full queue is rejected whatever the policy.
+
+        Raises
+        ------
+        QueueFull
+            The queue is full and ``overflow`` is "reject" or ``wait`` is ``False``.
+        RequestShed
+            The estimated wait exceeds ``max_wait`` and ``overflow`` is "shed".
+        """
+
+        if self.overflow == 'shed' and (estimated := self.estimated_wait()) > self.max_wait:
+            raise RequestShed(self.depth, estimated)
+
+        if self.admitted < self.max_pending and not self._waiters:
+            self.admitted += 1
+            return
+
+        if self.overflow == 'reject' or wait is False:
+            raise QueueFull(self.depth)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            # the slot is handed over by release, admitted is already counted
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(completed=False)
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self, completed: bool = True) -> None:
+        """Gives back a slot, handing it to the next waiting request.
+
+        Parameters
+        ----------
+        completed: :class:`bool`
+            Whether the request was answered, which counts towards the throughput estimate.
+        """
+
+        if completed:
+            self._completions.append(time.monotonic())
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.admitted -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds a slot for the duration of the ``async with`` block."""
+        await self.acquire()
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            self.release(completed)
@@ -0,0 +1,267 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Union
+)
+
+from .batching import BatchWriter
+from .objects import UserBalance
+
+__all__ = (
+    "AuditRecord",
+    "AuditLog"
+)
+
+def _amount(value: Optional[Union[int, float, str]]) -> Optional[Union[int, str]]:
+    # json would write infinity as a bare Infinity, which isn't valid JSON
+    if value == float('inf'):
+        return 'Infinity'
+    elif value == float('-inf'):
+        return '-Infinity'
+    return value
+
+@dataclass
+class AuditRecord:
+    """
+    Dataclass representing a balance mutation written to an :class:`AuditLog`.
+
+    Attributes
+    ----------
+    method: :class:`str`
+        The HTTP method of the mutation, "PATCH" to edit or "PUT" to set a balance.
+    guild_id: :class:`int`
+        The guild's ID.
+    user_id: :class:`int`
+        The user's ID.
+    cash: Optional[Union[:class:`int`, :class:`str`]]
+        The cash amount sent.
+    bank: Optional[Union[:class:`int`, :class:`str`]]
+        The bank amount sent.
+    reason: Optional[:class:`str`]
+        The reason sent.
+    balance: Optional[:class:`UserBalance`]
+        The resulting balance, or ``None`` if the mutation failed.
+    error: Optional[:class:`str`]
+        The error which made the mutation fail, if any.
+    duration: :class:`float`
+        Seconds the mutation took from the call until it was answered or failed, including the
+        waits for the request queue and the rate limits.
+    timestamp: :class:`float`
+        UNIX timestamp of when the mutation was answered.
+    """
+
+    method: str
+    guild_id: int
+    user_id: int
+    cash: Optional[Union[int, str]]
+    bank: Optional[Union[int, str]]
+    reason: Optional[str]
+    balance: Optional[UserBalance]
+    error: Optional[str]
+    duration: float
+    timestamp: float = field(default_factory=time.time)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns the record as a JSON serializable :class:`dict`, with infinite amounts as "Infinity" strings."""
+        data = {
+            'ts': round(self.timestamp, 3),
+            'method': self.method,
+            'guild_id': self.guild_id,
+            'user_id': self.user_id,
+            'cash': _amount(self.cash),
+            'bank': _amount(self.bank),
+            'reason': self.reason,
+            'duration': round(self.duration, 4),
+        }
+        if self.balance is not None:
+            data['balance'] = {
+                'cash': _amount(self.balance.cash),
+                'bank': _amount(self.balance.bank),
+                'total': _amount(self.balance.total),
+            }
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+class AuditLog:
+    """
+    A buffered audit trail of balance mutations, written as JSON Lines.
+
+    Every mutation sent by :meth:`UnbeliClient.edit_user_balance` and :meth:`UnbeliClient.set_user_balance`
+    is added to an in-memory queue without waiting, and a background task writes the queued records in
+    batches from an executor, so the disk is never on the path of a request.
+
+    When the file grows beyond ``max_bytes`` it's rotated like :class:`logging.handlers.RotatingFileHandler`:
+    ``path`` is renamed to ``path.1``, ``path.1`` to ``path.2`` and so on, keeping ``backup_count`` old files.
+
+    .. note::
+        Unlike :class:`MutationJournal`, the audit log favours latency over durability: records that are
+        still queued when the process crashes are lost, and records added while the queue is full are
+        dropped and counted in :attr:`dropped`.
+
+    Parameters
+    ----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The log's file. Records are appended to it if it exists.
+    max_queue: :class:`int`
+        The maximum number of records waiting to be written. This defaults to 10000.
+    batch_size: :class:`int`
+        The maximum number of records written at once. This defaults to 500.
+    flush_interval: :class:`float`
+        Seconds to wait for a batch to fill up before writing it. This defaults to 0.5.
+    max_bytes: :class:`int`
+        The size in bytes above which the file is rotated, or 0 to never rotate. This defaults to 10 MiB.
+    backup_count: :class:`int`
+        The number of rotated files kept. This defaults to 5.
+
+    Attributes
+    ----------
+    written: :class:`int`
+        The number of records written so far.
+    dropped: :class:`int`
+        The number of records dropped because the queue was full or they couldn't be written.
+    last_error: Optional[:class:`Exception`]
+        The last error raised while writing a batch, if any.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        *,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5
+    ) -> None:
+        if max_queue < 1 or batch_size < 1:
+            raise ValueError("max_queue and batch_size must be at least 1")
+
+        self.path: str = os.fspath(path)
+        self.max_queue: int = max_queue
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.max_bytes: int = max_bytes
+        self.backup_count: int = backup_count
+        self.written: int = 0
+        self.dropped: int = 0
+        self.last_error: Optional[Exception] = None
+        self._file = None
+        self._size: int = 0
+        self._writer: BatchWriter[AuditRecord] = BatchWriter(
+            self._write, batch_size=batch_size, delay=flush_interval, on_written=self._written
+        )
+        self._closing: bool = False
+
+    def __repr__(self) -> str:
+        return (
+            f"AuditLog(path={self.path!r}, queued={self._writer.queued}, "
+            f"written={self.written}, dropped={self.dropped})"
+        )
+
+    @property
+    def queued(self) -> int:
+        """The number of records waiting to be written."""
+        return self._writer.queued
+
+    def add(self, record: AuditRecord) -> bool:
+        """Queues a record to be written, without waiting.
+
+        This must be called from a running event loop, which the background writer is started on.
+
+        Parameters
+        ----------
+        record: :class:`AuditRecord`
+            The record to write.
+
+        Returns
+        -------
+        :class:`bool`
+            ``False`` if the record was dropped because the queue is full or the log is closed.
+        """
+
+        if self._closing or self._writer.queued >= self.max_queue:
+            self.dropped += 1
+            return False
+
+        self._writer.put(record)
+        return True
+
+    def _open(self) -> None:
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, batch: List[AuditRecord]) -> None:
+        # runs in an executor, encoding happens here too so the event loop only moves references
+        if self._file is None:
+            self._open()
+        data = b''.join(
+            json.dumps(record.to_json(), separators=(',', ':')).encode() + b'\n'
+            for record in batch
+        )
+        if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _written(self, batch: List[AuditRecord], error: Optional[Exception]) -> None:
+        # the writer keeps going after an error, the next batch may succeed once the disk recovers
+        if error is None:
+            self.written += len(batch)
+        else:
+            self.last_error = error
+            self.dropped += len(batch)
+
+    async def close(self) -> None:
+        """Writes every queued record and closes the log's file. Records added afterwards are dropped."""
+        self._closing = True
+        await self._writer.wait_closed()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,157 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import (
+    Callable,
+    Deque,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar
+)
+
+__all__ = (
+    "BatchWriter",
+)
+
+T = TypeVar('T')
+
+class BatchWriter(Generic[T]):
+    """
+    Writes queued items in batches from the default executor, so the disk is never touched on the event loop.
+
+    Items queued while a batch is written are written together by the next batch (a group commit),
+    one batch at a time and in the order they were queued. The background writer is started by
+    the first queued item and stops once the queue is empty.
+
+    Parameters
+    ----------
+    write: Callable[[List[T]], None]
+        Writes a batch of items, called from the executor.
+    batch_size: Optional[:class:`int`]
+        The maximum number of items written at once, or ``None`` for no limit. This defaults to ``None``.
+    delay: :class:`float`
+        Seconds to wait for a batch to fill up to ``batch_size`` before writing it. This defaults to 0.
+    on_written: Optional[Callable[[List[T], Optional[:class:`Exception`]], None]]
+        Called on the event loop after each batch, with the error ``write`` raised if any.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[T]], None],
+        *,
+        batch_size: Optional[int] = None,
+        delay: float = 0.0,
+        on_written: Optional[Callable[[List[T], Optional[Exception]], None]] = None
+    ) -> None:
+        self._write: Callable[[List[T]], None] = write
+        self.batch_size: Optional[int] = batch_size
+        self.delay: float = delay
+        self._on_written = on_written
+        self._queue: Deque[Tuple[T, Optional[asyncio.Future]]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: bool = False
+
+    def __repr__(self) -> str:
+        return f"BatchWriter(queued={len(self._queue)}, batch_size={self.batch_size}, delay={self.delay})"
+
+    @property
+    def queued(self) -> int:
+        """The number of items waiting to be written."""
+        return len(self._queue)
+
+    def _full(self) -> bool:
+        return self.batch_size is not None and len(self._queue) >= self.batch_size
+
+    def _enqueue(self, item: T, future: Optional[asyncio.Future]) -> None:
+        self._queue.append((item, future))
+        if self._writer is None:
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._run())
+        elif self._full():
+            self._wakeup.set()
+
+    def put(self, item: T) -> None:
+        """Queues an item to be written, without waiting. Errors are only reported to ``on_written``.
+
+        This must be called from a running event loop, which the background writer is started on.
+        """
+        self._enqueue(item, None)
+
+    async def write(self, item: T) -> None:
+        """Queues an item and waits until the batch holding it was written.
+
+        Raises
+        ------
+        Exception
+            The error ``write`` raised for the batch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(item, future)
+        await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._queue:
+                if self.delay and not self._closing and not self._full():
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+
+                count = len(self._queue) if self.batch_size is None else min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+                items = [item for item, _ in batch]
+                error = None
+                try:
+                    await loop.run_in_executor(None, self._write, items)
+                except Exception as exc:
+                    # keep the writer going, the next batch may succeed once the disk recovers
+                    error = exc
+
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        if error is None:
+                            future.set_result(None)
+                        else:
+                            future.set_exception(error)
+                if self._on_written is not None:
+                    self._on_written(items, error)
+        finally:
+            self._writer = None
+
+    async def wait_closed(self) -> None:
+        """Writes every queued item without waiting for ``delay`` and waits until they were written."""
+        self._closing = True
+        if self._writer is not None:
+            self._wakeup.set()
+            await asyncio.shield(self._writer)
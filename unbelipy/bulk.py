@@ -0,0 +1,252 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Union
+)
+
+if TYPE_CHECKING:
+    from .client import UnbeliClient
+    from .objects import UserBalance
+
+__all__ = (
+    "BalanceOperation",
+    "BalanceOperationResult",
+    "BalanceOperationBatch"
+)
+
+@dataclass
+class BalanceOperation:
+    """
+    Dataclass representing a balance mutation for :meth:`UnbeliClient.apply_balance_operations`.
+
+    Attributes
+    ----------
+    user_id: :class:`int`
+        The user's ID.
+    cash: Optional[Union[:class:`int`, :class:`str`]]
+        The cash amount. If this is a :class:`str`, it must be "Infinity" or "-Infinity".
+    bank: Optional[Union[:class:`int`, :class:`str`]]
+        The bank amount. If this is a :class:`str`, it must be "Infinity" or "-Infinity".
+    reason: Optional[:class:`str`]
+        The reason to why the balance was modified.
+    mode: :class:`str`
+        "edit" to add the amounts with :meth:`UnbeliClient.edit_user_balance` or "set" to replace the
+        balance with :meth:`UnbeliClient.set_user_balance`. This defaults to "edit".
+    """
+
+    user_id: int
+    cash: Optional[Union[int, str]] = None
+    bank: Optional[Union[int, str]] = None
+    reason: Optional[str] = None
+    mode: str = 'edit'
+
+@dataclass
+class BalanceOperationResult:
+    """
+    Dataclass representing the outcome of a :class:`BalanceOperation`.
+
+    Attributes
+    ----------
+    index: :class:`int`
+        The operation's position in the operations given.
+    operation: :class:`BalanceOperation`
+        The operation.
+    balance: Optional[:class:`UserBalance`]
+        The resulting balance, or ``None`` if the operation failed.
+    error: Optional[:class:`Exception`]
+        The error which made the operation fail, if any.
+    """
+
+    index: int
+    operation: BalanceOperation
+    balance: Optional[UserBalance] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the API accepted the operation."""
+        return self.error is None
+
+class BalanceOperationBatch:
+    """
+    The run of a list of balance operations, created by :meth:`UnbeliClient.apply_balance_operations`.
+
+    Iterating over the batch with ``async for`` runs the operations and yields a :class:`BalanceOperationResult`
+    for each of them as it completes. At most ``concurrency`` operations are in flight at once and
+    operations on the same user are applied in the order they were given.
+
+    The batch keeps track of every operation, so a run that is stopped partway can be accounted for:
+    :meth:`cancel` stops starting new operations and lets the ones in flight finish, while cancelling the
+    iterating task (or leaving the loop early) abandons the operations in flight, which are then ``unknown``:
+    the API may or may not have applied them.
+
+    Attributes
+    ----------
+    operations: List[:class:`BalanceOperation`]
+        The validated operations.
+    applied: Set[:class:`int`]
+        The indices of the operations accepted by the API.
+    failed: Set[:class:`int`]
+        The indices of the operations which raised an error.
+    unknown: Set[:class:`int`]
+        The indices of the operations abandoned while in flight.
+    """
+
+    def __init__(
+        self,
+        client: UnbeliClient,
+        guild_id: int,
+        operations: Union[Iterable[BalanceOperation], AsyncIterable[BalanceOperation]],
+        concurrency: int,
+        validate: Callable[[int, BalanceOperation], None]
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.client: UnbeliClient = client
+        self.guild_id: int = guild_id
+        self.concurrency: int = concurrency
+        self._validate = validate
+        self._source: Optional[AsyncIterable[BalanceOperation]] = None
+        self.operations: List[BalanceOperation] = []
+        if hasattr(operations, '__aiter__'):
+            # validated once collected, before anything is sent
+            self._source = operations
+        else:
+            self.operations = self._validated(operations)
+
+        self.applied: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.unknown: Set[int] = set()
+        self._in_flight: Set[int] = set()
+        self._waiting: Set[int] = set()
+        self._next: int = 0
+        self._cancelled: bool = False
+        self._started: bool = False
+
+    def __repr__(self) -> str:
+        return (
+            f"BalanceOperationBatch(operations={len(self.operations)}, applied={len(self.applied)}, "
+            f"failed={len(self.failed)}, unknown={len(self.unknown)})"
+        )
+
+    def _validated(self, operations: Iterable[BalanceOperation]) -> List[BalanceOperation]:
+        operations = list(operations)
+        for index, operation in enumerate(operations):
+            self._validate(index, operation)
+        return operations
+
+    @property
+    def not_started(self) -> List[int]:
+        """The indices of the operations that were never sent."""
+        return sorted(self._waiting) + list(range(self._next, len(self.operations)))
+
+    def cancel(self) -> None:
+        """Stops starting new operations. The ones in flight still complete and are yielded."""
+        self._cancelled = True
+
+    async def _apply(self, operation: BalanceOperation) -> UserBalance:
+        method = self.client.set_user_balance if operation.mode == 'set' else self.client.edit_user_balance
+        return await method(self.guild_id, operation.user_id, operation.cash, operation.bank, operation.reason)
+
+    async def _worker(self, results: asyncio.Queue, locks: Dict[int, asyncio.Lock]) -> None:
+        operations = self.operations
+        while not self._cancelled and self._next < len(operations):
+            index = self._next
+            self._next += 1
+            operation = operations[index]
+            # indices are taken in order and locks are fair, so a user's operations keep their order
+            lock = locks.setdefault(operation.user_id, asyncio.Lock())
+            self._waiting.add(index)
+            async with lock:
+                if self._cancelled:
+                    return
+                self._waiting.discard(index)
+                result = BalanceOperationResult(index, operation)
+                self._in_flight.add(index)
+                try:
+                    result.balance = await self._apply(operation)
+                except Exception as error:
+                    result.error = error
+                    self.failed.add(index)
+                except asyncio.CancelledError:
+                    # the request may or may not have reached the API
+                    self.unknown.add(index)
+                    raise
+                else:
+                    self.applied.add(index)
+                finally:
+                    self._in_flight.discard(index)
+            results.put_nowait(result)
+
+    async def __aiter__(self) -> AsyncIterator[BalanceOperationResult]:
+        if self._started:
+            raise RuntimeError("a batch can only be run once")
+        self._started = True
+
+        if self._source is not None:
+            self.operations = self._validated([operation async for operation in self._source])
+
+        results: asyncio.Queue = asyncio.Queue()
+        locks: Dict[int, asyncio.Lock] = {}
+        workers = [
+            asyncio.ensure_future(self._worker(results, locks))
+            for _ in range(min(self.concurrency, len(self.operations)))
+        ]
+        remaining = set(workers)
+        try:
+            while remaining or not results.empty():
+                if results.empty():
+                    getter = asyncio.ensure_future(results.get())
+                    done, _ = await asyncio.wait({getter, *remaining}, return_when=asyncio.FIRST_COMPLETED)
+                    remaining -= done
+                    for worker in done:
+                        if worker is not getter and worker.exception() is not None:
+                            raise worker.exception()
+                    if getter in done:
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+                else:
+                    yield results.get_nowait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if workers:
+                await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,250 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import (
+    Deque,
+    Dict,
+    List,
+    Optional
+)
+
+from .errors import CircuitOpen
+from .rate_limits import bucket_route
+
+__all__ = (
+    "CircuitBreaker",
+    "ClientCircuitBreakers"
+)
+
+class CircuitBreaker:
+    """
+    A circuit breaker for a single route or bucket.
+
+    The circuit is ``"closed"`` while requests succeed. It opens after ``failure_threshold``
+    consecutive failures, or when the share of failures among the last ``window`` requests reaches
+    ``error_rate``. While ``"open"``, requests fail fast with :exc:`CircuitOpen`. Once ``reset_timeout``
+    seconds have passed it becomes ``"half_open"`` and lets ``half_open_probes`` requests through:
+    a success closes it again and a failure re-opens it.
+
+    A failure is a response with a 5xx status code or a connection error.
+
+    Attributes
+    ----------
+    key: :class:`str`
+        The route or bucket this breaker protects.
+    failure_threshold: :class:`int`
+        Consecutive failures which open the circuit.
+    error_rate: :class:`float`
+        Share of failures in the window which opens the circuit, between 0 and 1.
+    window: :class:`int`
+        Number of recent requests the error rate is computed over.
+    min_requests: :class:`int`
+        Requests needed in the window before the error rate is considered.
+    reset_timeout: :class:`float`
+        Seconds the circuit stays open before probing.
+    half_open_probes: :class:`int`
+        Concurrent probe requests allowed while half-open.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        key: str,
+        *,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        window: int = 20,
+        min_requests: int = 10,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1
+    ) -> None:
+        self.key: str = key
+        self.failure_threshold: int = failure_threshold
+        self.error_rate: float = error_rate
+        self.window: int = window
+        self.min_requests: int = min_requests
+        self.reset_timeout: float = reset_timeout
+        self.half_open_probes: int = half_open_probes
+
+        self._state: str = self.CLOSED
+        self._opened_at: float = 0.0
+        self._consecutive_failures: int = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._probes: int = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"CircuitBreaker(key={self.key}, state={self.state}, "
+            f"consecutive_failures={self._consecutive_failures})"
+        )
+
+    @property
+    def state(self) -> str:
+        """:class:`str`: The circuit's state, ``"closed"``, ``"open"`` or ``"half_open"``."""
+        if self._state == self.OPEN and self.retry_after == 0:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """:class:`float`: Seconds until an open circuit lets a probe through, 0 if it isn't open."""
+        if self._state != self.OPEN:
+            return 0.0
+        return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def before_request(self) -> None:
+        """Checks whether a request may be sent, reserving a probe when half-open.
+
+        Raises
+        ------
+        CircuitOpen
+            The circuit is open, or every half-open probe is already in flight.
+        """
+
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpen(self.key, self.retry_after)
+        elif state == self.HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                raise CircuitOpen(self.key, 0.0)
+            self._probes += 1
+
+    def record(self, success: Optional[bool]) -> None:
+        """Records the outcome of a request allowed by :meth:`before_request`.
+
+        Parameters
+        ----------
+        success: Optional[:class:`bool`]
+            Whether the request succeeded, or ``None`` if it was cancelled before an outcome was known.
+        """
+
+        if self._state == self.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            if success is True:
+                self._close()
+            elif success is False:
+                self._open()
+            return
+
+        if success is None:
+            return
+
+        self._outcomes.append(success)
+        if success:
+            self._consecutive_failures = 0
+            return
+
+        self._consecutive_failures += 1
+        failures = self._outcomes.count(False)
+        if (
+            self._consecutive_failures >= self.failure_threshold
+            or (len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.error_rate)
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _close(self) -> None:
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._outcomes.clear()
+
+    def reset(self) -> None:
+        """Closes the circuit and forgets every recorded outcome."""
+        self._close()
+        self._probes = 0
+
+class ClientCircuitBreakers:
+    """
+    The circuit breakers of a :class:`UnbeliClient`, created on demand for each route or bucket.
+
+    Parameters
+    ----------
+    per: :class:`str`
+        ``"route"`` to share a breaker between every bucket of a route (e.g. every user's balance),
+        or ``"bucket"`` to keep one per bucket. This defaults to ``"route"``.
+    **options
+        Passed to every :class:`CircuitBreaker`.
+
+    Attributes
+    ----------
+    breakers: Dict[:class:`str`, :class:`CircuitBreaker`]
+        The breakers created so far, by route or bucket.
+    """
+
+    def __init__(self, per: str = 'route', **options) -> None:
+        if per not in ('route', 'bucket'):
+            raise ValueError(f'per can only be "route" or "bucket" but was "{per}"')
+        self.per: str = per
+        self.options = options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def __repr__(self) -> str:
+        return f"ClientCircuitBreakers(per={self.per}, open={self.currently_open()})"
+
+    def get(self, bucket: str) -> CircuitBreaker:
+        """Returns the breaker protecting a bucket, creating it if needed.
+
+        Parameters
+        ----------
+        bucket: :class:`str`
+            The request's bucket.
+        """
+
+        key = bucket_route(bucket) if self.per == 'route' else bucket
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(key, **self.options)
+        return breaker
+
+    def currently_open(self) -> List[str]:
+        """
+        This is useful to get the routes or buckets which are currently failing fast.
+
+        Returns
+        -------
+        List[:class:`str`]
+            The keys of the breakers which are open or half-open.
+        """
+
+        return [key for key, breaker in self.breakers.items() if breaker.state != CircuitBreaker.CLOSED]
+
+    def any_open(self) -> bool:
+        """Returns ``True`` if any breaker is open or half-open."""
+        return any(self.currently_open())
+
+    def is_open(self, bucket: str) -> bool:
+        """Returns ``True`` if requests to ``bucket`` currently fail fast."""
+        return self.get(bucket).state == CircuitBreaker.OPEN
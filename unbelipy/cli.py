@@ -0,0 +1,289 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import (
+    IO,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union
+)
+
+from .constants import GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
+
+__all__ = (
+    "main",
+)
+
+TOKEN_ENV = 'UNBELIPY_TOKEN'
+
+_Amount = Optional[Union[int, str]]
+
+def _parse_amount(value: Optional[str]) -> _Amount:
+    if value is None or value.strip() == '':
+        return None
+    value = value.strip()
+    if value in ('Infinity', '-Infinity'):
+        return value
+    return int(value)
+
+def _format_amount(value: Union[int, float]) -> Union[int, str]:
+    if value == float('inf'):
+        return 'Infinity'
+    elif value == float('-inf'):
+        return '-Infinity'
+    return value
+
+@dataclass
+class _ImportRow:
+    line: int
+    user_id: int
+    cash: _Amount
+    bank: _Amount
+    reason: Optional[str]
+
+class _Progress:
+    """Prints a single, rewritten progress line to stderr at most every ``interval`` seconds."""
+
+    def __init__(self, total: int, enabled: bool, stream: IO[str] = sys.stderr, interval: float = 0.5) -> None:
+        self.total: int = total
+        self.enabled: bool = enabled
+        self.stream: IO[str] = stream
+        self.interval: float = interval
+        self.done: int = 0
+        self.failed: int = 0
+        self._started: float = time.monotonic()
+        self._printed: float = 0
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        now = time.monotonic()
+        if self.enabled and (now - self._printed >= self.interval or self.done == self.total):
+            self._printed = now
+            rate = self.done / max(now - self._started, 1e-9)
+            eta = (self.total - self.done) / rate if rate else 0
+            self.stream.write(
+                f"\r{self.done}/{self.total} done, {self.failed} failed, {rate:.1f}/s, eta {eta:.0f}s "
+            )
+            self.stream.flush()
+
+    def close(self) -> None:
+        if self.enabled and self.done:
+            self.stream.write('\n')
+            self.stream.flush()
+
+def _read_import(path: str, default_reason: Optional[str]) -> List[_ImportRow]:
+    """Reads and validates every row before anything is sent, so a bad file fails as a whole."""
+    rows = []
+    errors = []
+    with open(path, newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None or 'user_id' not in reader.fieldnames:
+            raise ValueError(f'{path} must have a header row with a "user_id" column and "cash" and/or "bank" columns')
+        for row in reader:
+            line = reader.line_num
+            try:
+                cash = _parse_amount(row.get('cash'))
+                bank = _parse_amount(row.get('bank'))
+                if cash is None and bank is None:
+                    raise ValueError('cash or bank must be set')
+                rows.append(_ImportRow(line, int(row['user_id']), cash, bank, row.get('reason') or default_reason))
+            except (TypeError, ValueError) as error:
+                errors.append(f'line {line}: {error}')
+    if errors:
+        raise ValueError('invalid rows in ' + path + ':\n' + '\n'.join(errors[:20]))
+    return rows
+
+def _load_resume(path: Optional[str]) -> Set[int]:
+    done = set()
+    if path is not None and os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                line = line.strip()
+                if line.isdigit():
+                    done.add(int(line))
+    return done
+
+def _make_client(args: argparse.Namespace):
+    from .client import UnbeliClient
+
+    token = args.token or os.environ.get(TOKEN_ENV)
+    if not token:
+        raise SystemExit(f'a token is required, use --token or set {TOKEN_ENV}')
+    # sleep through the rate limits and retry the odd 429 rather than failing rows
+    client = UnbeliClient(token, prevent_rate_limits=True, retry_rate_limits=True)
+    if args.base_url:
+        client._BASE_URL = args.base_url
+    return client
+
+async def _export(args: argparse.Namespace) -> int:
+    client = _make_client(args)
+    output = sys.stdout if args.output in (None, '-') else open(args.output, 'w', newline='')
+    fields = ('rank', 'user_id', 'cash', 'bank', 'total')
+    count = 0
+    try:
+        writer = None
+        if args.format == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(fields)
+        pages = client.iter_leaderboard_pages(
+            args.guild_id, args.sort, page_size=args.page_size, concurrency=args.concurrency
+        )
+        async for users in pages:
+            for user in users:
+                row = (user.rank, user.user_id, _format_amount(user.cash), _format_amount(user.bank), _format_amount(user.total))
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(dict(zip(fields, row)), separators=(',', ':')) + '\n')
+                count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await client.close_session()
+
+    print(f'exported {count} users', file=sys.stderr)
+    return 0
+
+async def _import(args: argparse.Namespace) -> int:
+    rows = _read_import(args.file, args.reason)
+    done = _load_resume(args.resume)
+    pending = [row for row in rows if row.line not in done]
+
+    seconds = len(pending) * GLOBAL_RATE_PERIOD / GLOBAL_RATE_LIMIT
+    print(
+        f'{len(rows)} rows, {len(rows) - len(pending)} already done, {len(pending)} to {args.mode}, '
+        f'at least {seconds:.0f}s at the global rate limit',
+        file=sys.stderr
+    )
+    if args.dry_run:
+        for row in pending:
+            print(json.dumps({'line': row.line, 'op': args.mode, 'user_id': row.user_id, 'cash': row.cash, 'bank': row.bank}))
+        return 0
+
+    from .bulk import BalanceOperation
+
+    client = _make_client(args)
+    batch = client.apply_balance_operations(
+        args.guild_id,
+        [BalanceOperation(row.user_id, row.cash, row.bank, row.reason, args.mode) for row in pending],
+        concurrency=args.concurrency
+    )
+    progress = _Progress(len(pending), enabled=args.progress if args.progress is not None else sys.stderr.isatty())
+    resume = open(args.resume, 'a') if args.resume else None
+    failures = []
+
+    try:
+        async for result in batch:
+            row = pending[result.index]
+            if result.ok:
+                if resume is not None:
+                    # written as soon as the API accepts the row, so an interrupted import resumes after it
+                    resume.write(f'{row.line}\n')
+                    resume.flush()
+            else:
+                failures.append(f'line {row.line} (user {row.user_id}): {type(result.error).__name__}: {result.error}')
+            progress.update(result.ok)
+    finally:
+        progress.close()
+        if resume is not None:
+            resume.close()
+        await client.close_session()
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    print(f'{len(batch.applied)} rows applied, {len(failures)} failed', file=sys.stderr)
+    return 1 if failures else 0
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='unbelipy', description="Bulk tools for UnbelievaBoat's API.")
+    parser.add_argument('--token', help=f'the application token, defaults to the {TOKEN_ENV} environment variable')
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="write a guild's leaderboard to CSV or JSON Lines")
+    export.add_argument('guild_id', type=int)
+    export.add_argument('-o', '--output', help='the output file, defaults to stdout')
+    export.add_argument('-f', '--format', choices=('csv', 'jsonl'), default='csv')
+    export.add_argument('--sort', choices=('cash', 'bank', 'total'))
+    export.add_argument('--page-size', type=int, default=1000)
+    export.add_argument('--concurrency', type=int, default=4, help='pages requested at once')
+
+    import_ = commands.add_parser(
+        'import',
+        help='apply balances from a CSV file',
+        description='Applies a CSV file with a "user_id" column, "cash" and/or "bank" columns and an optional '
+                    '"reason" column. Empty amounts are left unchanged.'
+    )
+    import_.add_argument('guild_id', type=int)
+    import_.add_argument('file')
+    import_.add_argument('--mode', choices=('edit', 'set'), default='edit', help='add the amounts (edit) or replace the balances (set)')
+    import_.add_argument('--reason', help='the reason of rows without one')
+    import_.add_argument('--dry-run', action='store_true', help='validate the file and print the operations without sending them')
+    import_.add_argument('--resume', help='a file recording applied rows, rows already in it are skipped')
+    import_.add_argument('--concurrency', type=int, default=10, help='requests sent at once')
+    # argparse.BooleanOptionalAction needs python 3.9
+    import_.add_argument('--progress', dest='progress', action='store_const', const=True, default=None,
+                         help='show a progress line, by default only on a terminal')
+    import_.add_argument('--no-progress', dest='progress', action='store_const', const=False)
+    return parser
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the ``unbelipy`` command line tool.
+
+    Parameters
+    ----------
+    argv: Optional[Sequence[:class:`str`]]
+        The arguments, defaults to :data:`sys.argv`.
+
+    Returns
+    -------
+    :class:`int`
+        The exit status.
+    """
+
+    args = _parser().parse_args(argv)
+    try:
+        if args.command == 'export':
+            return asyncio.run(_export(args))
+        return asyncio.run(_import(args))
+    except (OSError, ValueError) as error:
+        print(f'error: {error}', file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
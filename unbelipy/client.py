@@ -24,28 +24,56 @@ SOFTWARE.
 
 from __future__ import annotations
 
-# import logging
 import asyncio
+import logging
 import atexit
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
 # from pprint import pprint
 from typing import (
+    TYPE_CHECKING,
     Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
     Union, 
     Dict, 
     List, 
     Optional,
+    Set,
     Tuple
 )
-from inspect import stack
 from json import dumps
 from urllib.parse import urlencode
 
-from aiohttp import ClientSession, ClientResponse
-
-from .errors import BadRequest, Unauthorized, Forbidden, NotFound, TooManyRequests, InternalServerError, UnknownException
-from .rate_limits import BucketHandler, ClientRateLimits
-from .constants import API_BASE_URL
+from .errors import (
+    BadRequest, Unauthorized, Forbidden, NotFound, TooManyRequests, InternalServerError, UnknownException, RateLimited,
+    InsufficientFunds, TransferFailed, CircuitOpen, QueueFull
+)
+from .rate_limits import BucketHandler, BucketWatchdog, ClientRateLimits, bucket_route
+from .constants import API_BASE_URL, GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
 from .objects import UserBalance, Guild
+from .rank_index import RankIndex
+from .journal import JournalEntry, MutationJournal
+from .projection import BalanceProjection, ProjectedBalance
+from .history import BalanceHistory
+from .streaming import LeaderboardStreamDecoder
+from .circuit_breaker import ClientCircuitBreakers
+from .hedging import HedgingPolicy
+from .admission import RequestQueue
+from .audit import AuditLog, AuditRecord
+from .stats import EconomyStats, _EconomyAccumulator
+from .bulk import BalanceOperation, BalanceOperationBatch
+from .permissions import PermissionCache, Permissions
+from .merge import MergedLeaderboard
+from .concurrency import AdaptiveConcurrencyLimit
+
+if TYPE_CHECKING:
+    from inspect import stack
+    from aiohttp import ClientSession, ClientResponse
+    from .transports import HTTP2Session
 
 __all__ = (
     "UnbeliClient"
@@ -60,6 +88,8 @@ API_ERRORS = {
     500: InternalServerError
 }
 
+_GUILD_ID = re.compile(r'/guilds/(\d+)')
+
 def _program_close_session(session: ClientSession):
     if not session.closed:
         try:
@@ -68,6 +98,31 @@ def _program_close_session(session: ClientSession):
             loop = asyncio.new_event_loop()
         loop.run_until_complete(session.close())
 
+_log = logging.getLogger(__name__)
+
+# sessions still open at exit are closed by a single hook instead of one registered per session
+_open_sessions: Set[Union[ClientSession, HTTP2Session]] = set()
+
+@atexit.register
+def _close_open_sessions() -> None:
+    for session in list(_open_sessions):
+        _program_close_session(session)
+
+def _log_unsettled_transfer(settling: asyncio.Future) -> None:
+    # a transfer cancelled with one leg applied can't raise TransferFailed to its caller
+    if not settling.cancelled():
+        error = settling.exception()
+        if isinstance(error, TransferFailed) and error.compensated is False:
+            _log.error(
+                "A cancelled transfer is half applied, user %s's mutation failed and the other one couldn't be reverted: %r",
+                error.failed_user_id, error.compensation_error
+            )
+
+def _track_session(session: Union[ClientSession, HTTP2Session]) -> None:
+    # sessions closed by their owner are dropped, so renewing sessions doesn't grow the set
+    _open_sessions.difference_update([open_session for open_session in _open_sessions if open_session.closed])
+    _open_sessions.add(session)
+
 def _process_bal(
     response_data: Dict[str, Any], 
     guild_id: int, 
@@ -157,6 +212,70 @@ def _check_bal_args(
 
     return True
 
+def _check_operation(index: int, operation: BalanceOperation) -> None:
+    """Checks a :class:`BalanceOperation` with :func:`_check_bal_args`, naming the operation in errors."""
+    try:
+        if type(operation.user_id) is not int:
+            raise TypeError(f'user_id can only be int but was "{type(operation.user_id)}"')
+        if operation.mode not in ('edit', 'set'):
+            raise ValueError(f'mode can only be "edit" or "set" but was "{operation.mode}"')
+        _check_bal_args(operation.cash, operation.bank, operation.reason)
+    except (TypeError, ValueError) as error:
+        raise type(error)(f'operation {index}: {error}') from None
+
+def _leaderboard_route(
+    guild_id: int,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    page: Optional[int] = None
+) -> Tuple[str, str]:
+    """Checks the leaderboard's query parameters and builds its path.
+
+    Raises
+    ------
+    TypeError
+        You specified both ``offset`` and ``page``, or a parameter of the wrong type.
+    ValueError
+        You specified something other than "cash", "bank" or "total" for ``sort``.
+
+    Returns
+    -------
+    Tuple[:class:`str`, :class:`str`]
+        The path with its query string, and the bucket of the request.
+    """
+
+    if offset and page:
+        raise TypeError('offset cannot be used with the page parameter')
+
+    params: dict[str, Any] = {}
+
+    if sort is not None:
+        if (t := type(sort)) is not str:
+            raise TypeError(f'sort must be type str but was "{t}"')
+        elif sort not in ['cash', 'bank', 'total']:
+            raise ValueError(f'sort can only be "cash", "bank" or "total" but was "{sort}"')
+        else:
+            params['sort'] = sort
+
+    for key, item in (('limit', limit), ('offset', offset), ('page', page)):
+        if item is None: 
+            continue
+        elif (t := type(item)) is not int:
+            raise TypeError(f'{item} can only be type int but was "{t}"')
+        else:
+            params[key] = item
+
+
+    base_path = f'/guilds/{guild_id}/users/'
+    query_path = base_path
+    
+    if params:
+        query_path += '?' + urlencode(params)
+    
+    bucket = 'GET' + base_path
+    return query_path, bucket
+
 class UnbeliClient:
     """
     The client to interact with UnbelievaBoat's API.
@@ -169,9 +288,45 @@ class UnbeliClient:
         Whether the client will sleep through ratelimits to prevent 429 errors. This defaults to ``True``.
     retry_rate_limits: Optional[:class:`bool`]
         Whether the client will sleep and retry after 429 errors. This defaults to ``False``.
-    session: Optional[:class:`aiohttp.ClientSession`]
+    session: Optional[Union[:class:`aiohttp.ClientSession`, :class:`HTTP2Session`]]
         An open ClientSession which will be used throughout to request with.
         If this is ``None``, a new ClientSession will be opened.
+    rank_index: Optional[:class:`bool`]
+        Whether the client keeps a local :class:`RankIndex` of the leaderboards and balances it receives.
+        This defaults to ``False``.
+    journal: Optional[:class:`MutationJournal`]
+        A write-ahead journal in which every balance mutation is recorded before being sent.
+        Use :meth:`replay_journal` on startup to send the mutations that were never acknowledged.
+    projection_staleness: Optional[:class:`float`]
+        If set, the client keeps a :class:`BalanceProjection` of every balance it sends or receives and
+        :meth:`get_projected_balance` serves balances younger than this many seconds locally.
+    history: Optional[:class:`BalanceHistory`]
+        If set, every balance the client receives from the API is recorded in this history,
+        which serves balance over time queries locally.
+    circuit_breakers: Optional[:class:`ClientCircuitBreakers`]
+        Circuit breakers which make requests to a failing route raise :exc:`CircuitOpen` without being sent.
+    hedging: Optional[:class:`HedgingPolicy`]
+        If set, slow ``GET`` requests are hedged with a second identical request when the rate limits allow it.
+    request_queue: Optional[:class:`RequestQueue`]
+        If set, caps the requests queued on the rate limits or in flight, applying backpressure, rejecting
+        or shedding requests beyond the cap.
+    audit_log: Optional[:class:`AuditLog`]
+        If set, the outcome of every balance mutation is queued in this log and written in the background.
+        Use :meth:`AuditLog.close` before exiting to write the records still queued.
+    permission_ttl: Optional[:class:`float`]
+        If set, the application's permissions are cached per guild for this many seconds and balance
+        mutations in guilds known to lack :attr:`Permissions.ECONOMY` raise :exc:`Forbidden` without being sent.
+        See :meth:`preflight_permissions`.
+    concurrency_limit: Optional[:class:`AdaptiveConcurrencyLimit`]
+        If set, caps the requests in flight at a limit adapted to the API's response times, so that
+        sending more requests at once stops once it only makes every response slower.
+    stall_threshold: Optional[:class:`float`]
+        If set, a :class:`BucketWatchdog` checks in the background for buckets whose lock is held longer
+        than this many seconds and reports them, see :meth:`diagnostics`.
+    http2: :class:`bool`
+        Whether the client uses :class:`HTTP2Session` sessions, which multiplex concurrent requests over
+        a single HTTP/2 connection instead of aiohttp's HTTP/1.1 connections. This needs the ``http2`` extra.
+        This defaults to ``False``.
 
     Attributes
     ----------
@@ -189,6 +344,28 @@ class UnbeliClient:
         +---------------------------+--------------------------------------------------------------------------+
         | ``retry_after``           | The number of seconds to wait before being able to make another request. |
         +---------------------------+--------------------------------------------------------------------------+
+    circuit_breakers: Optional[:class:`ClientCircuitBreakers`]
+        The state of the client's circuit breakers, if any.
+    hedging: Optional[:class:`HedgingPolicy`]
+        The client's hedging policy and statistics, if any.
+    request_queue: Optional[:class:`RequestQueue`]
+        The client's request queue and its current depth, if any.
+    concurrency_limit: Optional[:class:`AdaptiveConcurrencyLimit`]
+        The client's adaptive concurrency limit and its current value, if any.
+    rank_index: Optional[:class:`RankIndex`]
+        The local leaderboard index, or ``None`` if ``rank_index`` was not enabled.
+    journal: Optional[:class:`MutationJournal`]
+        The client's mutation journal, if any.
+    projection: Optional[:class:`BalanceProjection`]
+        The client's projected balances, or ``None`` if ``projection_staleness`` was not set.
+    history: Optional[:class:`BalanceHistory`]
+        The client's balance history, if any.
+    audit_log: Optional[:class:`AuditLog`]
+        The client's audit log, if any.
+    permissions: Optional[:class:`PermissionCache`]
+        The application's cached permissions per guild, or ``None`` if ``permission_ttl`` was not set.
+    watchdog: Optional[:class:`BucketWatchdog`]
+        The watchdog of the client's buckets, or ``None`` if ``stall_threshold`` was not set.
     """
 
     _BASE_URL = API_BASE_URL
@@ -199,7 +376,19 @@ class UnbeliClient:
         *,
         prevent_rate_limits: Optional[bool] = True,
         retry_rate_limits: Optional[bool] = False,
-        session: Optional[ClientSession] = None
+        session: Optional[ClientSession] = None,
+        rank_index: Optional[bool] = False,
+        journal: Optional[MutationJournal] = None,
+        projection_staleness: Optional[float] = None,
+        history: Optional[BalanceHistory] = None,
+        circuit_breakers: Optional[ClientCircuitBreakers] = None,
+        hedging: Optional[HedgingPolicy] = None,
+        request_queue: Optional[RequestQueue] = None,
+        audit_log: Optional[AuditLog] = None,
+        permission_ttl: Optional[float] = None,
+        concurrency_limit: Optional[AdaptiveConcurrencyLimit] = None,
+        stall_threshold: Optional[float] = None,
+        http2: bool = False
     ) -> None:
         self._headers: Dict[str, Any] = {
             "Accept": "application/json",
@@ -207,18 +396,76 @@ class UnbeliClient:
         }
         self._prevent_rate_limits: bool = prevent_rate_limits
         self._retry_rate_limits: bool = retry_rate_limits
-        self._session: Union[ClientSession, None] = session
+        self._session: Union[ClientSession, HTTP2Session, None] = session
+        self._http2: bool = http2
 
         self.rate_limits: ClientRateLimits = ClientRateLimits(prevent_rate_limits=prevent_rate_limits)
+        self.circuit_breakers: Optional[ClientCircuitBreakers] = circuit_breakers
+        self.hedging: Optional[HedgingPolicy] = hedging
+        self.request_queue: Optional[RequestQueue] = request_queue
+        self.concurrency_limit: Optional[AdaptiveConcurrencyLimit] = concurrency_limit
+        self.rank_index: Optional[RankIndex] = RankIndex() if rank_index is True else None
+        self.journal: Optional[MutationJournal] = journal
+        self.projection: Optional[BalanceProjection] = (
+            BalanceProjection(projection_staleness) if projection_staleness is not None else None
+        )
+        self.history: Optional[BalanceHistory] = history
+        self.audit_log: Optional[AuditLog] = audit_log
+        self.permissions: Optional[PermissionCache] = (
+            PermissionCache(permission_ttl) if permission_ttl is not None else None
+        )
+        self.watchdog: Optional[BucketWatchdog] = (
+            BucketWatchdog(self.rate_limits, stall_threshold) if stall_threshold is not None else None
+        )
     
     async def close_session(self) -> None:
         """Closes the current session."""
-        if self._session and isinstance(self._session, ClientSession) and not self._session.closed:
+        # a session only exists once a request was made or one was given, so aiohttp is already imported
+        if self._session and not self._session.closed:
             await self._session.close()
+        _open_sessions.discard(self._session)
+        if self.watchdog is not None:
+            self.watchdog.stop()
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the client's rate limiting state, to find out why requests are slow or stuck.
+
+        Returns
+        -------
+        Dict[:class:`str`, Any]
+            With the keys:
+
+            * ``"buckets"``: the number of buckets tracked.
+            * ``"limited"``: the buckets currently rate limited, the soonest to reset first.
+            * ``"held"``: the seconds each bucket's lock has been held, the longest first.
+            * ``"stalls"``: the latest :class:`BucketStall` records, if the client has a :attr:`watchdog`.
+            * ``"open_circuits"``: the open circuits, if the client has :attr:`circuit_breakers`.
+            * ``"queue_depth"``: the requests queued or in flight, if the client has a :attr:`request_queue`.
+            * ``"concurrency_limit"``: the current limit, if the client has a :attr:`concurrency_limit`.
+        """
+
+        diagnostics: Dict[str, Any] = {
+            'buckets': len(self.rate_limits.buckets),
+            'limited': list(self.rate_limits.iter_limited()),
+            'held': self.rate_limits.held(),
+        }
+        if self.watchdog is not None:
+            self.watchdog.check()
+            diagnostics['stalls'] = list(self.watchdog.stalls)
+        if self.circuit_breakers is not None:
+            diagnostics['open_circuits'] = self.circuit_breakers.currently_open()
+        if self.request_queue is not None:
+            diagnostics['queue_depth'] = self.request_queue.depth
+        if self.concurrency_limit is not None:
+            diagnostics['concurrency_limit'] = self.concurrency_limit.limit
+        return diagnostics
 
     async def get_permissions(
         self, 
-        guild_id: int
+        guild_id: int,
+        *,
+        wait: bool = True
     ) -> int:
         """
         Returns the application's permissions for the specified guild's ID.
@@ -227,6 +474,9 @@ class UnbeliClient:
         ----------
         guild_id: :class:`int` 
             The target guild's ID.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
 
         Raises:
         TypeError
@@ -248,11 +498,71 @@ class UnbeliClient:
         path = f'/applications/@me/guilds/{guild_id}'
         bucket = method + path
 
-        return await self._request(method, path, bucket)
+        permissions = await self._request(method, path, bucket, caller='get_permissions', wait=wait)
+        if self.permissions is not None:
+            self.permissions.set(guild_id, permissions)
+        return permissions
+
+    async def preflight_permissions(
+        self,
+        guild_ids: Iterable[int],
+        *,
+        concurrency: int = 20
+    ) -> Dict[int, Optional[Permissions]]:
+        """
+        Requests the application's permissions in many guilds concurrently and caches them.
+
+        This is meant to be called on startup, so that requests to guilds where the application is not
+        authorized fail locally instead of wasting a rate limited request each.
+        Guilds answering ``403`` or ``404`` are cached without any permission.
+
+        Parameters
+        ----------
+        guild_ids: Iterable[:class:`int`]
+            The guilds to probe.
+        concurrency: :class:`int`
+            The maximum number of requests in flight at once. This defaults to 20.
+
+        Raises
+        ------
+        ValueError
+            The client was created without ``permission_ttl``.
+        Unauthorized
+            The wrong Application Token was passed.
+
+        Returns
+        -------
+        Dict[:class:`int`, Optional[:class:`Permissions`]]
+            The permissions of every guild, ``None`` where they couldn't be requested (e.g. a server error).
+        """
+
+        if self.permissions is None:
+            raise ValueError("the client has no permission cache, set permission_ttl to enable it")
+
+        results: Dict[int, Optional[Permissions]] = dict.fromkeys(guild_ids)
+        pending = list(results)
+
+        async def worker() -> None:
+            while pending:
+                guild_id = pending.pop()
+                try:
+                    await self.get_permissions(guild_id)
+                except (Forbidden, NotFound):
+                    self.permissions.set(guild_id, Permissions.NONE)
+                except Unauthorized:
+                    raise
+                except Exception:
+                    continue
+                results[guild_id] = self.permissions.get(guild_id)
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+        return results
 
     async def get_guild(
         self, 
-        guild_id: int
+        guild_id: int,
+        *,
+        wait: bool = True
     ) -> Guild:
         """
         Retrieves a guild from the API.
@@ -261,6 +571,9 @@ class UnbeliClient:
         ----------
         guild_id: :class:`int`
             The target guild's ID.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
     
         Raises
         ------
@@ -280,7 +593,7 @@ class UnbeliClient:
         path = f"/guilds/{guild_id}"
         bucket = method + path
 
-        return await self._request(method, path, bucket)
+        return await self._request(method, path, bucket, caller='get_guild', wait=wait)
 
     async def get_guild_leaderboard(
         self,
@@ -288,7 +601,9 @@ class UnbeliClient:
         sort: Optional[str] = None,
         limit: Optional[int] = None,
         offset: Optional[int] = 1,
-        page: Optional[int] = None
+        page: Optional[int] = None,
+        *,
+        wait: bool = True
     ) -> Union[
         List[UserBalance],
         Dict[str, Union[int, List[UserBalance]]]
@@ -310,6 +625,9 @@ class UnbeliClient:
             page number to retrieve
             if specified returns a dictionary containing the list of user's leaderboard under key 'users' and
             additional 'page' with the current page and 'total_pages' with number available pages.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
         
         Raises
         ------
@@ -327,49 +645,326 @@ class UnbeliClient:
                 Dictionary containing leaderboard information.
         """
 
-        if offset and page:
-            raise TypeError('offset cannot be used with the page parameter')
-
-        params: dict[str, Any] = {}
-
-        if sort is not None:
-            if (t := type(sort)) is not str:
-                raise TypeError(f'sort must be type str but was "{t}"')
-            elif sort not in ['cash', 'bank', 'total']:
-                raise ValueError(f'sort can only be "cash", "bank" or "total" but was "{sort}"')
-            else:
-                params['sort'] = sort
-
-        for key, item in (('limit', limit), ('offset', offset), ('page', page)):
-            if item is None: 
-                continue
-            elif (t := type(item)) is not int:
-                raise TypeError(f'{item} can only be type int but was "{t}"')
-            else:
-                params[key] = item
-
-
         method = 'GET'
-        base_path = f'/guilds/{guild_id}/users/'
-        query_path = base_path
-        
-        if params:
-            query_path += '?' + urlencode(params)
-        
-        bucket = method + base_path
+        query_path, bucket = _leaderboard_route(guild_id, sort, limit, offset, page)
 
-        return await self._request(
+        leaderboard = await self._request(
             method, 
             query_path, 
             bucket, 
+            caller='get_guild_leaderboard',
             guild_id=guild_id, 
-            page=page
+            page=page,
+            wait=wait
         )
 
+        # only an unpaginated leaderboard starting at the first rank holds every user
+        complete = page is None and limit is None and offset in (None, 1)
+        self._observe_leaderboard(guild_id, leaderboard if page is None else leaderboard['users'], complete)
+        return leaderboard
+
+    async def stream_guild_leaderboard(
+        self,
+        guild_id: int,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = 1,
+        page: Optional[int] = None,
+        *,
+        raw: bool = False,
+        chunk_size: int = 65536,
+        wait: bool = True
+    ) -> AsyncIterator[Union[UserBalance, Dict[str, Any]]]:
+        """
+        Retrieves the leaderboard for a guild, yielding each user as soon as it is received.
+
+        Unlike :meth:`get_guild_leaderboard`, the response body is read and decoded in chunks,
+        so memory use is bounded by ``chunk_size`` instead of the size of the guild.
+        Compressed transfer encodings are requested to reduce the size of the response.
+
+        .. note::
+            The bucket's lock, the :attr:`request_queue` slot and the :attr:`concurrency_limit` slot
+            are held until the generator is closed, including while it is suspended between users.
+            When the iteration may stop early, close the generator explicitly, e.g. with
+            :func:`contextlib.aclosing` (Python 3.10+) or by awaiting its ``aclose()``, instead of
+            leaving it to the garbage collector.
+
+            Balances received this way are not added to the client's :attr:`rank_index` or :attr:`projection`.
+
+        .. code-block:: python
+
+            async with contextlib.aclosing(client.stream_guild_leaderboard(guild_id)) as stream:
+                async for user in stream:
+                    if user.total < threshold:
+                        break
+
+        Parameters
+        ----------
+        guild_id: :class:`int` 
+            The target guild's ID.
+        sort: :class:`str` 
+            Sort the leaderboard by "cash", "bank" or "total".
+        limit: :class:`int` 
+            Limit the amount of users to retrieve.
+        offset: :class:`int` 
+            retrieve users only from said place and below in the leaderboard
+        page: :class:`int` 
+            page number to retrieve
+        raw: :class:`bool`
+            Whether to yield the user records as received instead of :class:`UserBalance`. This defaults to ``False``.
+        chunk_size: :class:`int`
+            The number of bytes read from the response at once. This defaults to 65536.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
+
+        Raises
+        ------
+        TypeError
+            You specified both ``offset`` and ``page``.
+        ValueError
+            You specified something other than "cash", "bank" or "total" for ``sort``,
+            or the response was not a valid leaderboard.
+        Unauthorized
+            The wrong Application Token was passed.
+        NotFound
+            You provided an invalid guild ID.
+
+        Yields
+        ------
+        Union[:class:`UserBalance`, Dict[:class:`str`, :class:`Any`]]
+            Each user in the leaderboard, in order.
+        """
+
+        method = 'GET'
+        query_path, bucket = _leaderboard_route(guild_id, sort, limit, offset, page)
+
+        headers = {'Accept-Encoding': 'gzip, deflate'}
+        async with self._send(method, query_path, bucket, headers=headers, wait=wait) as response:
+            await self._check_response(response=response, bucket=bucket)
+
+            decoder = LeaderboardStreamDecoder()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                for row in decoder.feed(chunk):
+                    yield row if raw is True else _process_bal(row, guild_id, bucket)
+            decoder.close()
+
+    async def iter_leaderboard_pages(
+        self,
+        guild_id: int,
+        sort: Optional[str] = None,
+        page_size: int = 1000,
+        concurrency: int = 4,
+        *,
+        max_pages: Optional[int] = None,
+        wait: bool = True
+    ) -> AsyncIterator[List[UserBalance]]:
+        """
+        Retrieves a whole leaderboard page by page, fetching up to ``concurrency`` pages at once.
+
+        The first page is requested alone to learn the number of pages, the following ones are prefetched
+        concurrently but always yielded in order, so at most ``concurrency`` pages are held in memory.
+
+        .. note::
+            Pages are not a snapshot: a user whose balance changes during the sweep may move to another
+            page and be seen twice or not at all.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        sort: Optional[:class:`str`]
+            Sort by "cash", "bank" or "total". This defaults to "total".
+        page_size: :class:`int`
+            The number of users per page. This defaults to 1000.
+        concurrency: :class:`int`
+            The maximum number of pages requested at once. This defaults to 4.
+        max_pages: Optional[:class:`int`]
+            Stops after the first ``max_pages`` pages, i.e. at the top ``max_pages * page_size`` users.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
+
+        Raises
+        ------
+        TypeError
+            You specified a parameter of the wrong type.
+        ValueError
+            You specified something other than "cash", "bank" or "total" for ``sort``,
+            or ``concurrency`` is less than 1.
+
+        Yields
+        ------
+        List[:class:`UserBalance`]
+            The users of each page, in leaderboard order.
+        """
+
+        async for _, users in self._leaderboard_pages(guild_id, sort, page_size, concurrency, max_pages, wait):
+            yield users
+
+    async def _leaderboard_pages(
+        self,
+        guild_id: int,
+        sort: Optional[str],
+        page_size: int,
+        concurrency: int,
+        max_pages: Optional[int],
+        wait: bool
+    ) -> AsyncIterator[Tuple[int, List[UserBalance]]]:
+        """Yields the leaderboard's number of pages along with each page, see :meth:`iter_leaderboard_pages`."""
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        def fetch(page: int) -> asyncio.Future:
+            return asyncio.ensure_future(
+                self.get_guild_leaderboard(guild_id, sort, limit=page_size, offset=None, page=page, wait=wait)
+            )
+
+        first = await self.get_guild_leaderboard(guild_id, sort, limit=page_size, offset=None, page=1, wait=wait)
+        total_pages = first['total_pages']
+        last_page = total_pages if max_pages is None else min(total_pages, max_pages)
+        yield total_pages, first['users']
+
+        next_page = 2
+        prefetched: deque = deque()
+        try:
+            while next_page <= last_page or prefetched:
+                while next_page <= last_page and len(prefetched) < concurrency:
+                    prefetched.append(fetch(next_page))
+                    next_page += 1
+                leaderboard = await prefetched.popleft()
+                yield total_pages, leaderboard['users']
+        finally:
+            for task in prefetched:
+                task.cancel()
+
+    async def guild_economy_stats(
+        self,
+        guild_id: int,
+        *,
+        max_pages: Optional[int] = None,
+        page_size: int = 1000,
+        concurrency: int = 4,
+        top_percent: float = 1.0,
+        relative_accuracy: float = 0.01
+    ) -> EconomyStats:
+        """
+        Computes the money supply, percentiles, top share and Gini coefficient of a guild's economy.
+
+        The leaderboard is read with :meth:`iter_leaderboard_pages` and every page is folded into the
+        statistics as it arrives, so memory doesn't grow with the number of users: sums and the Gini
+        coefficient are exact one-pass aggregates and percentiles come from a :class:`QuantileSketch`.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        max_pages: Optional[:class:`int`]
+            Stops after the first ``max_pages`` pages, computing the statistics of the richest users only.
+        page_size: :class:`int`
+            The number of users per page. This defaults to 1000.
+        concurrency: :class:`int`
+            The maximum number of pages requested at once. This defaults to 4.
+        top_percent: :class:`float`
+            The percentage of richest users :attr:`EconomyStats.top_share` is computed for. This defaults to 1.
+        relative_accuracy: :class:`float`
+            The relative error of the percentiles. This defaults to 0.01.
+
+        Returns
+        -------
+        :class:`EconomyStats`
+            The guild's statistics.
+        """
+
+        accumulator = _EconomyAccumulator(top_percent, relative_accuracy)
+        stats = accumulator.stats
+        pages = self._leaderboard_pages(guild_id, 'total', page_size, concurrency, max_pages, True)
+        async for total_pages, users in pages:
+            if stats.pages == 0:
+                if max_pages is not None and total_pages > max_pages:
+                    stats.complete = False
+                    accumulator.expect(max_pages * page_size, max_pages * page_size)
+                else:
+                    accumulator.expect((total_pages - 1) * page_size + 1, total_pages * page_size)
+            stats.pages += 1
+            accumulator.add_many(users)
+        return accumulator.result()
+
+    def merge_leaderboards(
+        self,
+        guild_ids: Iterable[int],
+        sort: Optional[str] = None,
+        *,
+        limit: Optional[int] = None,
+        page_size: Optional[int] = None,
+        concurrency: int = 10,
+        wait: bool = True,
+        skip_failed: bool = True
+    ) -> MergedLeaderboard:
+        """
+        Merges the leaderboards of several guilds into one, fetching only the pages the merge reaches.
+
+        The guilds' leaderboards are requested page by page and merged lazily on the sort key, so the
+        global top ``limit`` costs the first page of every guild plus the deeper pages of the guilds which
+        actually hold that many top users, instead of every guild's whole leaderboard.
+
+        .. code-block:: python
+
+            merge = client.merge_leaderboards(guild_ids, limit=100)
+            top = await merge.collect()
+            for rank, user in enumerate(top, 1):
+                print(rank, user.guild_id, user.user_id, user.total)
+            for guild_id, error in merge.failed.items():
+                print("left out", guild_id, error)
+
+        Parameters
+        ----------
+        guild_ids: Iterable[:class:`int`]
+            The IDs of the guilds to merge. Duplicates are ignored.
+        sort: Optional[:class:`str`]
+            Sort by "cash", "bank" or "total". This defaults to "total".
+        limit: Optional[:class:`int`]
+            The number of users to merge. If ``None``, every guild's whole leaderboard is merged.
+        page_size: Optional[:class:`int`]
+            The number of users per page. Smaller pages cost more requests for the guilds near the top
+            but hold less in memory. This defaults to ``limit``, up to 1000.
+        concurrency: :class:`int`
+            The maximum number of pages requested at once. This defaults to 10.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
+        skip_failed: :class:`bool`
+            Whether guilds whose leaderboard raises :exc:`NotFound` or :exc:`Forbidden` are left out and
+            recorded in :attr:`MergedLeaderboard.failed` instead of ending the merge. This defaults to ``True``.
+
+        Raises
+        ------
+        TypeError
+            You specified a parameter of the wrong type.
+        ValueError
+            You specified something other than "cash", "bank" or "total" for ``sort``, a negative ``limit``,
+            or ``page_size`` or ``concurrency`` is less than 1.
+
+        Returns
+        -------
+        :class:`MergedLeaderboard`
+            The merge to iterate over, yielding users in descending order across all guilds.
+        """
+
+        if page_size is None:
+            page_size = min(limit, 1000) if limit else 1000
+        guild_ids = list(guild_ids)
+        for guild_id in guild_ids:
+            _leaderboard_route(guild_id, sort, page_size, None, 1)
+        return MergedLeaderboard(self, guild_ids, sort, limit, page_size, concurrency, wait, skip_failed)
+
     async def get_user_balance(
         self, 
         guild_id: int, 
-        user_id: int
+        user_id: int,
+        *,
+        wait: bool = True
     ) -> UserBalance:
         """
         Retrieves a user's balance.
@@ -380,6 +975,9 @@ class UnbeliClient:
             The guild's ID which the user belongs to.
         user_id: :class:`int` 
             The user's ID. 
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
         
         Raises
         ------
@@ -402,7 +1000,9 @@ class UnbeliClient:
         path = f"/guilds/{guild_id}/users/{user_id}"
         bucket = method + path
 
-        return await self._request(method, path, bucket, guild_id=guild_id)
+        balance = await self._request(method, path, bucket, caller='get_user_balance', guild_id=guild_id, wait=wait)
+        self._observe_balance(balance)
+        return balance
 
     async def edit_user_balance(
         self,
@@ -410,7 +1010,9 @@ class UnbeliClient:
         user_id: int,
         cash: Optional[Union[int, str]] = None,
         bank: Optional[Union[int, str]] = None,
-        reason: Optional[str] = None
+        reason: Optional[str] = None,
+        *,
+        wait: bool = True
     ) -> UserBalance:
         """
         Increase or decrease the user's balance by a value given in the params.
@@ -428,6 +1030,9 @@ class UnbeliClient:
             Amount to modify the user's bank amount to. If this is a :class:`str`, it must be set to "Infinity".
         reason: Optional[:class:`str`]
             The reason to why the balance was modified. 
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
 
         Raises
         ------
@@ -446,16 +1051,7 @@ class UnbeliClient:
 
         check = _check_bal_args(cash, bank, reason)
         if check:
-            data: Dict[str, Any] = {
-                'cash': cash, 
-                'bank': bank, 
-                'reason': reason
-            }
-
-            method = 'PATCH'
-            path = f"/guilds/{guild_id}/users/{user_id}"
-            bucket = method + path
-            return await self._request(method, path, bucket, guild_id=guild_id, data=dumps(data))
+            return await self._mutate_balance('PATCH', guild_id, user_id, cash, bank, reason, wait=wait)
 
     async def set_user_balance(
         self,
@@ -463,12 +1059,18 @@ class UnbeliClient:
         user_id: int,
         cash: Optional[Union[int, str]] = None,
         bank: Optional[Union[int, str]] = None,
-        reason: Optional[str] = None
+        reason: Optional[str] = None,
+        *,
+        wait: bool = True
     ) -> UserBalance:
         """
         Sets a user's balance to a given amount.
         At least one of cash, or bank must be specified.
 
+        .. note::
+            This sends a ``PUT`` request, which replaces the amounts. Earlier versions sent a ``PATCH``
+            request, which added them to the balance like :meth:`edit_user_balance`.
+
         Parameters
         ----------
         guild_id: :class:`int`
@@ -481,6 +1083,9 @@ class UnbeliClient:
             Amount to set the user's bank amount to. If this is a :class:`str`, it must be set to "Infinity".
         reason: Optional[:class:`str`]
             The reason to why the balance was mofified.
+        wait: :class:`bool`
+            Whether to wait for the rate limits. If ``False``, :exc:`RateLimited` is raised instead
+            of waiting. This defaults to ``True``.
     
         Raises
         ------
@@ -499,16 +1104,394 @@ class UnbeliClient:
 
         check = _check_bal_args(cash, bank, reason)
         if check:
-            data: Dict[str, Any] = {
-                'cash': cash, 
-                'bank': bank, 
-                'reason': reason
-            }
+            return await self._mutate_balance('PUT', guild_id, user_id, cash, bank, reason, wait=wait)
+
+    async def transfer(
+        self,
+        guild_id: int,
+        from_user: int,
+        to_user: int,
+        cash: Optional[int] = None,
+        bank: Optional[int] = None,
+        reason: Optional[str] = None,
+        *,
+        check_balance: bool = True
+    ) -> Tuple[UserBalance, UserBalance]:
+        """
+        Moves money from one user to another, sending the debit and the credit concurrently.
+
+        The sender's balance is checked first, from the client's :attr:`projection` if it holds a fresh
+        enough balance or with :meth:`get_user_balance` otherwise. Both mutations are then sent at once,
+        so a transfer takes about one round trip. If only one of them fails, the other one is reverted
+        with a compensating :meth:`edit_user_balance` and :exc:`TransferFailed` is raised.
+        If the transfer is cancelled while they're in flight, a mutation which was already applied is
+        reverted the same way before the cancellation is raised, even if the caller is cancelled again.
+
+        .. note::
+            A request which failed without a response (e.g. a timeout) may still have been applied
+            by the API, in which case reverting the other side leaves the transfer half applied.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID which both users belong to.
+        from_user: :class:`int`
+            The sender's ID.
+        to_user: :class:`int`
+            The receiver's ID.
+        cash: Optional[:class:`int`]
+            The cash amount to move, it must be positive.
+        bank: Optional[:class:`int`]
+            The bank amount to move, it must be positive.
+        reason: Optional[:class:`str`]
+            The reason to why the balances were modified.
+        check_balance: :class:`bool`
+            Whether to check that the sender can afford the transfer. This defaults to ``True``.
+
+        Raises
+        ------
+        ValueError
+            The amounts are not positive, neither was specified or both users are the same.
+        InsufficientFunds
+            The sender's cash or bank is lower than the amount to move. Nothing was sent.
+        TransferFailed
+            One side of the transfer failed and the other one was reverted, if possible.
+
+        Returns
+        -------
+        Tuple[:class:`UserBalance`, :class:`UserBalance`]
+            The sender's and the receiver's balances after the transfer.
+        """
+
+        if cash is None and bank is None:
+            raise ValueError('an amount must be specified for either cash or bank')
+        for arg, value in (('cash', cash), ('bank', bank)):
+            if value is not None and (type(value) is not int or value <= 0):
+                raise ValueError(f'{arg} must be a positive int but "{value}" was received')
+        if from_user == to_user:
+            raise ValueError('from_user and to_user must be different users')
+
+        if check_balance is True:
+            projected = self.projection.get(guild_id, from_user) if self.projection is not None else None
+            sender = projected.balance if projected is not None else await self.get_user_balance(guild_id, from_user)
+            if sender.cash < (cash or 0) or sender.bank < (bank or 0):
+                raise InsufficientFunds(from_user, sender.cash, sender.bank)
+
+        legs = (
+            asyncio.ensure_future(self.edit_user_balance(
+                guild_id, from_user, -cash if cash else None, -bank if bank else None, reason
+            )),
+            asyncio.ensure_future(self.edit_user_balance(guild_id, to_user, cash, bank, reason))
+        )
+        try:
+            await asyncio.wait(legs)
+        except BaseException:
+            # cancelled with the legs in flight, they're cancelled too but one of them may be applied already
+            for leg in legs:
+                leg.cancel()
+            settling = asyncio.ensure_future(self._settle_transfer(guild_id, from_user, to_user, cash, bank, reason, legs))
+            settling.add_done_callback(_log_unsettled_transfer)
+            try:
+                await asyncio.shield(settling)
+            except Exception:
+                pass  # the caller only sees the cancellation, a failed compensation is logged
+            raise
+        return await self._settle_transfer(guild_id, from_user, to_user, cash, bank, reason, legs)
+
+    async def _settle_transfer(
+        self,
+        guild_id: int,
+        from_user: int,
+        to_user: int,
+        cash: Optional[int],
+        bank: Optional[int],
+        reason: Optional[str],
+        legs: Tuple[asyncio.Future, asyncio.Future]
+    ) -> Tuple[UserBalance, UserBalance]:
+        """Waits for both legs of a transfer and reverts the one applied if the other failed, see :meth:`transfer`."""
+
+        await asyncio.wait(legs)
+        sent, received = (
+            asyncio.CancelledError() if leg.cancelled() else leg.exception() or leg.result() for leg in legs
+        )
+
+        if not isinstance(sent, BaseException) and not isinstance(received, BaseException):
+            return sent, received
+        elif isinstance(sent, BaseException) and isinstance(received, BaseException):
+            # nothing was applied, there's nothing to compensate
+            raise sent
+
+        if isinstance(sent, BaseException):
+            error, failed_user, applied_user, sign = sent, from_user, to_user, -1
+        else:
+            error, failed_user, applied_user, sign = received, to_user, from_user, 1
 
-            method = 'PATCH'
-            path = f"/guilds/{guild_id}/users/{user_id}"
-            bucket = method + path
-            return await self._request(method, path, bucket, guild_id=guild_id, data=dumps(data))
+        compensation = f"{reason} (reverted)" if reason else "transfer reverted"
+        try:
+            await self.edit_user_balance(
+                guild_id,
+                applied_user,
+                sign * cash if cash else None,
+                sign * bank if bank else None,
+                compensation
+            )
+        except Exception as compensation_error:
+            raise TransferFailed(error, failed_user, False, compensation_error) from error
+        if not isinstance(error, Exception):
+            raise error  # e.g. the leg was cancelled, it was reverted all the same
+        raise TransferFailed(error, failed_user, True) from error
+
+    def apply_balance_operations(
+        self,
+        guild_id: int,
+        operations: Union[Iterable[BalanceOperation], AsyncIterable[BalanceOperation]],
+        *,
+        concurrency: int = 10
+    ) -> BalanceOperationBatch:
+        """
+        Applies many balance operations concurrently, yielding each result as it completes.
+
+        Every operation is validated before the first one is sent, an iterable right away and an async
+        iterable when the batch starts running. Operations go through the client's per-bucket and global
+        rate limits like any other request, with at most ``concurrency`` of them in flight.
+
+        .. code-block:: python
+
+            batch = client.apply_balance_operations(guild_id, [
+                BalanceOperation(user_id, cash=100, reason="event payout") for user_id in winners
+            ])
+            async for result in batch:
+                if not result.ok:
+                    print(result.operation.user_id, result.error)
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID which the users belong to.
+        operations: Union[Iterable[:class:`BalanceOperation`], AsyncIterable[:class:`BalanceOperation`]]
+            The operations to apply.
+        concurrency: :class:`int`
+            The maximum number of operations in flight at once. This defaults to 10.
+
+        Raises
+        ------
+        TypeError
+            An operation has an amount, reason or user ID of the wrong type.
+        ValueError
+            An operation has no amount, an invalid amount or mode, or ``concurrency`` is less than 1.
+
+        Returns
+        -------
+        :class:`BalanceOperationBatch`
+            The batch to iterate over, which tracks the applied, failed and unknown operations.
+        """
+
+        return BalanceOperationBatch(self, guild_id, operations, concurrency, _check_operation)
+
+    async def _mutate_balance(
+        self,
+        method: str,
+        guild_id: int,
+        user_id: int,
+        cash: Optional[Union[int, str]] = None,
+        bank: Optional[Union[int, str]] = None,
+        reason: Optional[str] = None,
+        journal_entry: Optional[JournalEntry] = None,
+        wait: bool = True
+    ) -> UserBalance:
+        """Sends a balance mutation, recording it in the journal if there's one.
+
+        Parameters
+        ----------
+        method: :class:`str`
+            "PATCH" to edit the balance or "PUT" to set it.
+        journal_entry: Optional[:class:`JournalEntry`]
+            An already recorded entry, when replaying the journal.
+        """
+
+        data: Dict[str, Any] = {
+            'cash': cash, 
+            'bank': bank, 
+            'reason': reason
+        }
+        caller = 'edit_user_balance' if method == 'PATCH' else 'set_user_balance'
+        path = f"/guilds/{guild_id}/users/{user_id}"
+        bucket = method + path
+
+        if self.permissions is not None and self.permissions.is_missing(guild_id):
+            raise Forbidden(f'The application lacks the economy permission in guild {guild_id} (cached), bucket: {bucket}')
+
+        entry = journal_entry
+        if entry is None and self.journal is not None:
+            entry = await self.journal.record(method, guild_id, user_id, cash, bank, reason)
+
+        token = None
+        if self.projection is not None:
+            token = self.projection.begin(method, guild_id, user_id, cash, bank)
+
+        try:
+            started = time.perf_counter()
+            try:
+                balance = await self._request(
+                    method, path, bucket, guild_id=guild_id, data=dumps(data), caller=caller, wait=wait
+                )
+            except Exception as error:
+                if self.audit_log is not None:
+                    self._audit(method, guild_id, user_id, cash, bank, reason, None, error, started)
+                raise
+        except (BadRequest, Unauthorized, Forbidden, NotFound) as error:
+            # these will fail the same way every time, there's no point in replaying them
+            if entry is not None:
+                await self.journal.abandon(entry.key, error)
+            raise
+        except (RateLimited, QueueFull, CircuitOpen) as error:
+            # the mutation was never sent, it was skipped rather than waiting or shed (RequestShed is a QueueFull)
+            if entry is not None:
+                await self.journal.abandon(entry.key, error)
+            raise
+        except Exception:
+            # the mutation may or may not have been applied, the next read has to go to the API
+            if self.projection is not None:
+                self.projection.invalidate(guild_id, user_id)
+            raise
+        finally:
+            if token is not None:
+                self.projection.end(guild_id, user_id, token)
+
+        if self.audit_log is not None:
+            self._audit(method, guild_id, user_id, cash, bank, reason, balance, None, started)
+        if entry is not None:
+            await self.journal.complete(entry.key)
+        self._observe_balance(balance)
+        return balance
+
+    def _audit(
+        self,
+        method: str,
+        guild_id: int,
+        user_id: int,
+        cash: Optional[Union[int, str]],
+        bank: Optional[Union[int, str]],
+        reason: Optional[str],
+        balance: Optional[UserBalance],
+        error: Optional[Exception],
+        started: float
+    ) -> None:
+        """Queues a mutation's outcome in the audit log, this never waits for the disk."""
+        self.audit_log.add(AuditRecord(
+            method,
+            guild_id,
+            user_id,
+            cash,
+            bank,
+            reason,
+            balance,
+            f"{type(error).__name__}: {error}" if error is not None else None,
+            time.perf_counter() - started
+        ))
+
+    async def replay_journal(self) -> List[UserBalance]:
+        """
+        Sends again every mutation in the client's journal which was never acknowledged by the API.
+
+        This should be called once on startup, before new mutations are made.
+        Mutations rejected by the API with a 4xx error are dropped from the journal,
+        any other error is raised and leaves the remaining mutations pending.
+
+        Raises
+        ------
+        ValueError
+            The client was created without a ``journal``.
+
+        Returns
+        -------
+        List[:class:`UserBalance`]
+            The balances resulting from the replayed mutations.
+        """
+
+        if self.journal is None:
+            raise ValueError("the client has no journal to replay")
+
+        balances = []
+        for entry in self.journal.pending():
+            try:
+                balance = await self._mutate_balance(
+                    entry.method,
+                    entry.guild_id,
+                    entry.user_id,
+                    entry.cash,
+                    entry.bank,
+                    entry.reason,
+                    journal_entry=entry
+                )
+            except (BadRequest, Unauthorized, Forbidden, NotFound):
+                continue
+            balances.append(balance)
+        return balances
+
+    async def get_projected_balance(
+        self,
+        guild_id: int,
+        user_id: int,
+        max_staleness: Optional[float] = None,
+        *,
+        wait: bool = True
+    ) -> ProjectedBalance:
+        """
+        Returns a user's balance from the client's projection, requesting it only if it's missing or too old.
+
+        Mutations sent with :meth:`edit_user_balance` or :meth:`set_user_balance` which haven't been answered
+        yet are applied optimistically, in which case the result is not ``confirmed``.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID which the user belongs to.
+        user_id: :class:`int`
+            The user's ID.
+        max_staleness: Optional[:class:`float`]
+            Overrides the client's ``projection_staleness`` for this read.
+        wait: :class:`bool`
+            Whether to wait for the rate limits if the balance is requested, see :meth:`get_user_balance`.
+
+        Raises
+        ------
+        ValueError
+            The client was created without ``projection_staleness``.
+
+        Returns
+        -------
+        :class:`ProjectedBalance`
+            The user's balance and whether it is confirmed by the API or projected.
+        """
+
+        if self.projection is None:
+            raise ValueError("the client has no projection, set projection_staleness to enable it")
+
+        projected = self.projection.get(guild_id, user_id, max_staleness)
+        if projected is None:
+            balance = await self.get_user_balance(guild_id, user_id, wait=wait)
+            projected = ProjectedBalance(balance, True, 0.0)
+        return projected
+
+    def _observe_balance(self, balance: UserBalance) -> None:
+        """Feeds a balance received from the API to the client's local state."""
+        if self.rank_index is not None:
+            self.rank_index.update(balance)
+        if self.projection is not None:
+            self.projection.confirm(balance)
+        if self.history is not None:
+            self.history.record(balance)
+
+    def _observe_leaderboard(self, guild_id: int, users: List[UserBalance], complete: bool) -> None:
+        """Feeds leaderboard balances received from the API to the client's local state."""
+        if self.rank_index is not None:
+            self.rank_index.update_many(guild_id, users, complete=complete)
+        if self.projection is not None:
+            for balance in users:
+                self.projection.confirm(balance)
+        if self.history is not None:
+            self.history.record_many(users)
 
     def _get_member_url(self, guild_id: int, member_id: int) -> Tuple(str, str):
         url = self._BASE_URL + f'/guilds/{guild_id}/users/{member_id}'
@@ -517,20 +1500,27 @@ class UnbeliClient:
 
     @staticmethod
     def _get_caller() -> stack:
+        from inspect import stack
         return stack()[2][3]
 
     def _get_bucket_handler(self, bucket: str) -> BucketHandler:
-        bucket_handler = self.rate_limits.buckets.get(bucket)
-        if bucket_handler is None:
-            bucket_handler = self.rate_limits.buckets[bucket] = BucketHandler(bucket=bucket)
-        return bucket_handler
+        return self.rate_limits.get_bucket(bucket)
 
     async def _ensure_session(self):
         """Ensures theres an open ``ClientSession``. If it does not exist or it's closed a new one is created.
         """
         if not self._session or self._session.closed:
-            self._session = cs = ClientSession()
-            atexit.register(_program_close_session, cs)
+            self._session = cs = self._new_session()
+            _track_session(cs)
+        if self.watchdog is not None:
+            self.watchdog.start()
+
+    def _new_session(self) -> Union[ClientSession, HTTP2Session]:
+        if self._http2 is True:
+            from .transports import HTTP2Session
+            return HTTP2Session()
+        from aiohttp import ClientSession
+        return ClientSession()
     
     async def generate_new_session(self, session: Optional[ClientSession] = None):
         """ Generates a new ``ClientSession`` for the client.
@@ -541,8 +1531,8 @@ class UnbeliClient:
             The session to use with the client.
         """
         await self.close_session()
-        self._session = cs = session or ClientSession()
-        atexit.register(_program_close_session, cs)
+        self._session = cs = session or self._new_session()
+        _track_session(cs)
 
     async def _request(
         self,
@@ -552,7 +1542,8 @@ class UnbeliClient:
         data: Optional[str] = None,
         caller = None,
         guild_id: Optional[int] = None,
-        page: Optional[int] = None
+        page: Optional[int] = None,
+        wait: bool = True
     ) -> Any:
         """
         Processes requests to the Unbelievaboat's API.
@@ -569,6 +1560,8 @@ class UnbeliClient:
             The guild's ID.
         page: Optional[:class:`int`]
             Number of pages in the leaderboard to retrieve from the API.
+        wait: :class:`bool`
+            Whether to wait for the rate limits and retry rate limited requests.
 
         Raises
         ------
@@ -582,71 +1575,270 @@ class UnbeliClient:
             The wrong data was passed, leading to an unknown endpoint.
         TooManyRequests
             You got ratelimited - too many requests were sent.
+        RateLimited
+            ``wait`` is ``False`` and the request would have waited for a rate limit.
         InternalServerError
             ...
         """
 
+        if caller is None:
+            caller = self._get_caller()
+
+        async with self._send(method, path, bucket, data=data, hedge=True, wait=wait) as response:
+            response_data: Dict[str, Any] = await response.json()
+
+        try:
+            await self._check_response(response=response, bucket=bucket)
+        except TooManyRequests as E:
+            if self._retry_rate_limits is True and wait is True:
+                timeout = response_data['retry_after'] / 1000 + self.rate_limits.padding.value
+                await asyncio.sleep(timeout)
+                # reschedule same request, outside of the bucket's lock
+                return await self._request(method, path, bucket, data, caller=caller, guild_id=guild_id, page=page, wait=wait)
+
+            else:
+                raise E
+
+        if caller in ['set_user_balance', 'edit_user_balance', 'get_user_balance']:
+            return _process_bal(response_data, guild_id, bucket)
+
+        elif caller == 'get_guild_leaderboard':
+            if page is None:
+                return _process_leaderboard(response_data, guild_id, bucket)
+            else:
+                response_data['users'] = _process_leaderboard(response_data['users'], guild_id, bucket)
+                return response_data
+
+        elif caller == 'get_permissions':
+            return response_data['permissions']
+
+        elif caller == 'get_guild':
+            response_data['bucket'] = bucket                     
+            # a change in the API adds a few empty fields to the response (vanity_code, roles and channels)
+            response_data = {
+                key: value for key, value in response_data.items()
+                if key in ['id', 'name', 'icon', 'owner_id', 'member_count', 'symbol', 'bucket']
+            }
+            return Guild(**response_data)
+
+    @asynccontextmanager
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        bucket: str,
+        data: Optional[str] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        hedge: bool = False,
+        wait: bool = True
+    ) -> AsyncIterator[ClientResponse]:
+        """
+        Sends a request through the client's rate limits, yielding the response before its body is read.
+
+        The bucket's rate limit attributes are updated with the response headers.
+        The response's status is *not* checked, see :meth:`_check_response`.
+
+        Parameters
+        ----------
+        method: :class:`str`
+            The method used for the request, can be 'PUT', 'PATCH' or 'GET'.
+        path: :class:`str`
+            The path to request to/from.
+        bucket: :class:`str`
+            The request's rate limit bucket.
+        data: Optional[:class:`str`]
+            Data which will be used for the request.
+        headers: Optional[Dict[:class:`str`, :class:`Any`]]
+            Headers added to the client's default headers.
+        hedge: :class:`bool`
+            Whether a ``GET`` request may be hedged according to the client's :attr:`hedging` policy.
+            The body of a hedged response is already read when it's yielded.
+        wait: :class:`bool`
+            Whether to wait for the request queue, the rate limits and the concurrency limit.
+            If ``False``, :exc:`QueueFull` or :exc:`RateLimited` is raised instead.
+        """
+
         url = self._BASE_URL + path
-        headers = self._headers
+        headers = {**self._headers, **headers} if headers else self._headers
 
-        # method_types = {
-        #     'PUT': self._session.put(url=url, data=data),
-        #     'PATCH': self._session.patch(url=url, data=data),
-        #     'GET': self._session.get(url=url)
-        # }
         method_types = ['PUT', 'PATCH', 'GET']
         if method not in method_types:
             raise ValueError("method must be either PUT, PATCH or GET")
 
-        if caller is None:
-            caller = self._get_caller()
-
         bucket_handler: BucketHandler = self._get_bucket_handler(bucket)
         bucket_handler.prevent_429 = self._prevent_rate_limits
-
-        await self._ensure_session()
-
-        async with self.rate_limits.global_limiter:
-            async with bucket_handler as bh:
-                # async with method_types[method] as response:
-                async with self._session.request(method, url, headers=headers, data=data) as response:
-                    bh.check_limit_headers(response)  # sets up the bucket rate limit attributes with response headers
-                    response_data: Dict[str, Any] = await response.json()
-
+        # counted until the request ends, so the handler isn't pruned while it waits before taking the lock
+        bucket_handler.references += 1
+        try:
+            await self._ensure_session()
+            transport_errors = getattr(self._session, 'transport_errors', None)
+            if transport_errors is None:
+                from aiohttp import ClientError
+                transport_errors = (ClientError,)
+
+            breaker = None
+            if self.circuit_breakers is not None:
+                breaker = self.circuit_breakers.get(bucket)
+                # fails fast before waiting on any rate limit, a half-open probe must be given back from here on
+                breaker.before_request()
+
+            queue = self.request_queue
+            if queue is not None:
                 try:
-                    if await self._check_response(response=response, bucket=bucket):
+                    await queue.acquire(wait=wait)
+                except BaseException:
+                    if breaker is not None:
+                        breaker.record(None)  # gives back a half-open probe
+                    raise
+
+            success = None
+            try:
+                if wait is False:
+                    self._check_capacity(bucket_handler)  # nothing is awaited until the limiters are entered
+                async with self.rate_limits.global_limiter:
+                    await bucket_handler.acquire(wait=wait)
+                    try:
+                        # taken last, right before sending, so only requests on the wire hold a slot
+                        # and a request waiting for its bucket doesn't keep one from other buckets
+                        limiter = self.concurrency_limit
+                        if limiter is not None:
+                            await limiter.acquire(wait=wait)
+                        rtt = None
+                        try:
+                            hedged = hedge is True and self.hedging is not None and method == 'GET'
+                            if hedged:
+                                request = self._hedged_request(url, headers, bucket_handler)
+                            else:
+                                request = self._session.request(method, url, headers=headers, data=data)
+
+                            flying = queue is not None
+                            if flying:
+                                queue.in_flight += 1
+                            sent = time.monotonic()
+                            try:
+                                async with request as response:
+                                    rtt = time.monotonic() - sent  # up to the headers, the body's size doesn't count
+                                    if flying:
+                                        queue.in_flight -= 1
+                                        flying = False
+                                    success = response.status < 500
+                                    if not hedged:  # a hedged request already updated the bucket
+                                        bucket_handler.check_limit_headers(response)  # sets up the bucket rate limit attributes with response headers
+                                    yield response
+                            except (*transport_errors, asyncio.TimeoutError):
+                                if success is None:
+                                    success = False
+                                raise
+                            finally:
+                                if flying:
+                                    queue.in_flight -= 1
+                        finally:
+                            if limiter is not None:
+                                limiter.release(rtt, dropped=success is False and rtt is None)
+                    finally:
+                        bucket_handler.release()
+            finally:
+                if breaker is not None:
+                    breaker.record(success)
+                if queue is not None:
+                    queue.release(completed=success is not None)
+        finally:
+            bucket_handler.references -= 1
+
+    def _check_capacity(self, bucket_handler: BucketHandler) -> None:
+        """Raises :exc:`RateLimited` if entering the global limiter or the bucket would wait,
+        or :exc:`QueueFull` if the concurrency limit would.
+
+        They're checked again as they're entered, this only avoids spending a global token first.
+        """
+        if not self.rate_limits.global_limiter.has_capacity():
+            raise RateLimited(GLOBAL_RATE_PERIOD / GLOBAL_RATE_LIMIT, bucket_handler.bucket, is_global=True)
 
-                        if caller in ['set_user_balance', 'edit_user_balance', 'get_user_balance']:
-                            return _process_bal(response_data, guild_id, bucket)
+        bucket_handler.check_capacity()
+        if self.concurrency_limit is not None:
+            self.concurrency_limit.check_capacity()
 
-                        elif caller == 'get_guild_leaderboard':
-                            if page is None:
-                                return _process_leaderboard(response_data, guild_id, bucket)
-                            else:
-                                response_data['users'] = _process_leaderboard(response_data['users'], guild_id, bucket)
-                                return response_data
-
-                        elif caller == 'get_permissions':
-                            return response_data['permissions']
-
-                        elif caller == 'get_guild':
-                            response_data['bucket'] = bucket                     
-                            # a change in the API adds a few empty fields to the response (vanity_code, roles and channels)
-                            response_data = {
-                                key: value for key, value in response_data.items()
-                                if key in ['id', 'name', 'icon', 'owner_id', 'member_count', 'symbol', 'bucket']
-                            }
-                            return Guild(**response_data)
-
-                except TooManyRequests as E:
-                    if self._retry_rate_limits is True:
-                        timeout = response_data['retry_after'] / 1000 + 1
-                        await asyncio.sleep(timeout)
-                        # reschedule same request
-                        return await self._request(method, url, bucket, data, caller=caller, guild_id=guild_id, page=page)
-
-                    else:
-                        raise E
+    @asynccontextmanager
+    async def _hedged_request(
+        self,
+        url: str,
+        headers: Dict[str, Any],
+        bucket_handler: BucketHandler
+    ) -> AsyncIterator[ClientResponse]:
+        """Sends a ``GET`` request, racing it against a hedge request if it's slow.
+
+        This is called while holding the global limiter and the bucket, the hedge request
+        only acquires the global limiter when it has spare capacity. The bucket is updated with
+        the headers of the response used, minus the requests still in flight when it arrived.
+        """
+
+        policy = self.hedging
+        route = bucket_route(bucket_handler.bucket)
+        delay = policy.delay_for(route)
+        sent: Set[asyncio.Task] = set()
+
+        async def attempt(primary: bool) -> ClientResponse:
+            task = asyncio.current_task()
+            started = time.monotonic()
+            sent.add(task)
+            try:
+                async with self._session.request('GET', url, headers=headers) as response:
+                    await response.read()
+            except asyncio.CancelledError:
+                if primary:
+                    # a lower bound of the latency, leaving it out would hide the slow responses hedging cuts short
+                    policy.record(route, time.monotonic() - started)
+                raise
+            finally:
+                sent.discard(task)
+            policy.record(route, time.monotonic() - started)
+            return response
+
+        async def hedge() -> ClientResponse:
+            async with self.rate_limits.global_limiter:
+                return await attempt(False)
+
+        primary = asyncio.ensure_future(attempt(True))
+        pending = {primary}
+        try:
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+                if not primary.done() and self._can_hedge(bucket_handler):
+                    # the hedge uses one more request of the bucket than the headers know about
+                    bucket_handler.remaining -= 1
+                    policy.hedges_sent += 1
+                    pending.add(asyncio.ensure_future(hedge()))
+
+            error = None
+            response = None
+            while pending and response is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        response = task.result()
+                        if task is not primary:
+                            policy.hedges_won += 1
+                        break
+                    error = task.exception()
+            if response is None:
+                raise error
+        finally:
+            # the API may have counted a request which is cancelled after being sent
+            in_flight = len(pending & sent)
+            for task in pending:
+                task.cancel()
+
+        bucket_handler.check_limit_headers(response)
+        if in_flight and bucket_handler.remaining is not None:
+            bucket_handler.remaining = max(bucket_handler.remaining - in_flight, 0)
+        yield response
+
+    def _can_hedge(self, bucket_handler: BucketHandler) -> bool:
+        """Whether a hedge request fits in the global and bucket rate limits without waiting."""
+        if not self.rate_limits.global_limiter.has_capacity():
+            return False
+        # the original request is already using one of the remaining requests
+        return bucket_handler.remaining is not None and bucket_handler.remaining >= 2
 
     async def _check_response(self, response: ClientResponse, bucket: str) -> bool:
         """Checks API response for errors. This only returns ``True`` on status code 200.
@@ -661,25 +1853,40 @@ class UnbeliClient:
 
         status = response.status
         reason = response.reason
-        data = await response.json()
 
         if status == 200:
+            self.rate_limits.padding.on_success()
             return True
-        elif status == 429:
+
+        data = await response.json()
+        if status == 429:
+            self.rate_limits.padding.on_rate_limited()
             message = data['message']
-            if 'global' in data:
-                text = f"Global rate limit. {data['message']}"
-            elif retry_after := data.get('retry_after'):
+            bucket_handler = self._get_bucket_handler(bucket)
+            retry_after = data.get('retry_after')
+            if retry_after is not None:
                 retry_after = int(retry_after) / 1000
-                bucket_handler = self._get_bucket_handler(bucket)
+            is_global = 'global' in data
+            if is_global:
+                text = f"Global rate limit. {data['message']}"
+            elif retry_after:
                 bucket_handler.retry_after = retry_after
                 text = f"{message} retry after: {retry_after}s"
             else:
                 text = f"{message}"
-            raise TooManyRequests(text + f', bucket: {bucket}')
+            raise TooManyRequests(
+                text + f', bucket: {bucket}',
+                retry_after=retry_after,
+                bucket=bucket,
+                reset=bucket_handler.reset,
+                is_global=is_global
+            )
         elif status == 404:
             raise NotFound(f'Error Code: "{status}" Reason: "{reason}", bucket {bucket}')
         else:
+            if status == 403 and self.permissions is not None and (match := _GUILD_ID.search(bucket)):
+                # the cached permissions were wrong or have been revoked since
+                self.permissions.invalidate(int(match[1]))
             error_text = f'Error code: "{status}" Reason: "{reason}"'
             if status in API_ERRORS:
                 raise API_ERRORS[status](error_text)
@@ -0,0 +1,277 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import (
+    Deque,
+    Optional
+)
+
+from .errors import QueueFull
+
+__all__ = (
+    "AdaptiveConcurrencyLimit",
+)
+
+class AdaptiveConcurrencyLimit:
+    """
+    Adapts the number of requests a :class:`UnbeliClient` has in flight to their round-trip time.
+
+    Rate limits cap how many requests are sent per second, not how many are answered at once: beyond some
+    concurrency, requests only queue in the API or in the connection pool and every one of them gets slower.
+    This limit follows the gradient algorithm of Netflix's concurrency-limits, against the round-trip time
+    of an unloaded API in the style of TCP Vegas. Every ``sample_window`` responses, their average time to
+    the response headers is compared with the smallest one seen:
+
+    * while it stays under ``tolerance`` times the smallest, the limit grows by about ``queue_size``,
+    * beyond, the limit shrinks in proportion (by half at most), so latency can't grow without bound.
+
+    Every ``probe_interval`` windows, the limit is held at ``min_limit`` until ``sample_window`` responses
+    were received at that concurrency, and the smallest round-trip time is measured again from them. Queued
+    requests never look unloaded, so this keeps the reference from drifting up with the latency it bounds,
+    and lets it follow a lasting change of the API's speed.
+
+    The limit doesn't grow while fewer than half of it is used, and a request that fails without a
+    response (a timeout or connection error) shrinks it by ``backoff``. Requests wait for a slot after the
+    rate limits, right before they're sent, in order of arrival, so only requests on the wire hold a slot and
+    a request waiting for its bucket's reset doesn't keep one from the other buckets.
+
+    Parameters
+    ----------
+    initial_limit: :class:`int`
+        The starting limit. This defaults to 20.
+    min_limit: :class:`int`
+        The smallest limit, also the concurrency of probes. This defaults to 1.
+    max_limit: :class:`int`
+        The largest limit. This defaults to 200.
+    tolerance: :class:`float`
+        How many times slower than unloaded responses may get before the limit shrinks. This defaults to 1.5.
+    queue_size: :class:`float`
+        How much the limit grows per sample window while latency is tolerated. This defaults to 4.
+    smoothing: :class:`float`
+        The weight of each new estimate of the limit, between 0 and 1. This defaults to 0.2.
+    sample_window: :class:`int`
+        The number of responses averaged for each update. This defaults to 10.
+    probe_interval: :class:`int`
+        The number of sample windows between two probes of the unloaded round-trip time. This defaults to 100.
+    backoff: :class:`float`
+        The factor the limit is multiplied by when a request fails without a response. This defaults to 0.9.
+
+    Attributes
+    ----------
+    limit: :class:`float`
+        The current limit, requests are sent while fewer than ``int(limit)`` are in flight.
+    in_flight: :class:`int`
+        Requests holding a slot.
+    min_rtt: Optional[:class:`float`]
+        The smallest time to the response headers in seconds since the last probe.
+    last_rtt: Optional[:class:`float`]
+        The average time to the response headers of the last sample window in seconds.
+    probing: :class:`bool`
+        Whether the unloaded round-trip time is being measured again.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        *,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        tolerance: float = 1.5,
+        queue_size: float = 4,
+        smoothing: float = 0.2,
+        sample_window: int = 10,
+        probe_interval: int = 100,
+        backoff: float = 0.9
+    ) -> None:
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("the limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if tolerance < 1:
+            raise ValueError(f"tolerance must be 1 or greater but was {tolerance}")
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"smoothing must be between 0 and 1 but was {smoothing}")
+        if not 0 < backoff < 1:
+            raise ValueError(f"backoff must be between 0 and 1 but was {backoff}")
+        if sample_window < 1 or probe_interval < 1:
+            raise ValueError("sample_window and probe_interval must be 1 or greater")
+
+        self.limit: float = float(initial_limit)
+        self.min_limit: int = min_limit
+        self.max_limit: int = max_limit
+        self.tolerance: float = tolerance
+        self.queue_size: float = queue_size
+        self.smoothing: float = smoothing
+        self.sample_window: int = sample_window
+        self.probe_interval: int = probe_interval
+        self.backoff: float = backoff
+        self.in_flight: int = 0
+        self.min_rtt: Optional[float] = None
+        self.last_rtt: Optional[float] = None
+        self.probing: bool = False
+        self._windows: int = 0
+        self._samples: int = 0
+        self._rtt_sum: float = 0.0
+        self._max_in_flight: int = 0
+        self._probe_samples: int = 0
+        self._probe_rtt: float = float('inf')
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def __repr__(self) -> str:
+        return (
+            f"AdaptiveConcurrencyLimit(limit={self.limit:.1f}, in_flight={self.in_flight}, "
+            f"waiting={self.waiting}, min_rtt={self.min_rtt}, last_rtt={self.last_rtt})"
+        )
+
+    @property
+    def waiting(self) -> int:
+        """:class:`int`: Requests waiting for a slot."""
+        return len(self._waiters)
+
+    @property
+    def _cap(self) -> int:
+        return self.min_limit if self.probing else int(self.limit)
+
+    def _take(self) -> None:
+        self.in_flight += 1
+        if self.in_flight > self._max_in_flight:
+            self._max_in_flight = self.in_flight
+
+    def check_capacity(self) -> None:
+        """Raises :exc:`QueueFull` if :meth:`acquire` would wait for a slot.
+
+        Raises
+        ------
+        QueueFull
+            No slot is free.
+        """
+
+        if self.in_flight >= self._cap or self._waiters:
+            raise QueueFull(
+                self.in_flight + self.waiting,
+                f"Concurrency limit of {self._cap} reached with {self.in_flight} requests in flight"
+            )
+
+    async def acquire(self, wait: bool = True) -> None:
+        """Waits for a slot.
+
+        Parameters
+        ----------
+        wait: :class:`bool`
+            Whether to wait for a slot. If ``False``, :exc:`QueueFull` is raised when none is free.
+
+        Raises
+        ------
+        QueueFull
+            No slot is free and ``wait`` is ``False``.
+        """
+
+        if self.in_flight < self._cap and not self._waiters:
+            self._take()
+            return
+
+        if wait is False:
+            self.check_capacity()
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            # the slot is taken by _wake before the future is resolved
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self, rtt: Optional[float] = None, dropped: bool = False) -> None:
+        """Gives back a slot and updates the limit.
+
+        Parameters
+        ----------
+        rtt: Optional[:class:`float`]
+            Seconds between sending the request and receiving the response headers, if it was answered.
+        dropped: :class:`bool`
+            Whether the request failed without a response.
+        """
+
+        concurrency = self.in_flight
+        self.in_flight -= 1
+        if dropped:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif rtt is not None:
+            if self.probing:
+                self._probe(rtt, concurrency)
+            else:
+                if self.min_rtt is None or rtt < self.min_rtt:
+                    self.min_rtt = rtt
+                self._samples += 1
+                self._rtt_sum += rtt
+                if self._samples >= self.sample_window:
+                    self._update(self._rtt_sum / self._samples)
+        self._wake()
+
+    def _probe(self, rtt: float, concurrency: int) -> None:
+        # only the requests answered once the probe drained the others count
+        if concurrency > self.min_limit:
+            return
+        self._probe_rtt = min(self._probe_rtt, rtt)
+        self._probe_samples += 1
+        if self._probe_samples >= self.sample_window:
+            self.min_rtt = self._probe_rtt
+            self.probing = False
+
+    def _update(self, short_rtt: float) -> None:
+        max_in_flight = self._max_in_flight
+        self._samples = 0
+        self._rtt_sum = 0.0
+        self._max_in_flight = self.in_flight
+        self.last_rtt = short_rtt
+
+        self._windows += 1
+        if self._windows % self.probe_interval == 0:
+            self.probing = True
+            self._probe_samples = 0
+            self._probe_rtt = float('inf')
+            return
+
+        if max_in_flight < self.limit / 2 or short_rtt <= 0:
+            # too few requests to tell whether a higher limit would hurt latency
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.min_rtt / short_rtt))
+        estimate = self.limit * gradient + self.queue_size
+        limit = self.limit * (1 - self.smoothing) + estimate * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self._cap:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._take()
+                future.set_result(None)
@@ -23,4 +23,8 @@ SOFTWARE.
 """
 
 API_VERSION = "v1"
-API_BASE_URL = f"https://unbelievaboat.com/api/{API_VERSION}"
\ No newline at end of file
+API_BASE_URL = f"https://unbelievaboat.com/api/{API_VERSION}"
+
+# requests allowed by the global rate limit per period, in seconds
+GLOBAL_RATE_LIMIT = 20
+GLOBAL_RATE_PERIOD = 1
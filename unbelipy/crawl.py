@@ -0,0 +1,295 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Set,
+    Tuple,
+    Union
+)
+
+from .batching import BatchWriter
+from .constants import GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
+from .errors import BadRequest, Forbidden, NotFound, Unauthorized
+
+if TYPE_CHECKING:
+    from .client import UnbeliClient
+
+__all__ = (
+    "CrawlEstimate",
+    "CrawlSummary",
+    "CrawlJob"
+)
+
+OPERATIONS = ('guild', 'permissions', 'leaderboard')
+
+# errors which will happen again if the operation is retried
+_PERMANENT_ERRORS = (BadRequest, Unauthorized, Forbidden, NotFound)
+
+def _to_json(obj: Any) -> Any:
+    if hasattr(obj, '__dataclass_fields__'):
+        data = asdict(obj)
+        data.pop('bucket', None)
+        return data
+    return obj
+
+@dataclass
+class CrawlEstimate:
+    """
+    Dataclass representing the estimated cost of a :class:`CrawlJob`.
+
+    Attributes
+    ----------
+    requests: :class:`int`
+        The number of requests left to send.
+    seconds: :class:`float`
+        The estimated wall time in seconds.
+    """
+
+    requests: int
+    seconds: float
+
+@dataclass
+class CrawlSummary:
+    """
+    Dataclass representing the outcome of :meth:`CrawlJob.run`.
+
+    Attributes
+    ----------
+    completed: :class:`int`
+        Operations which succeeded.
+    failed: :class:`int`
+        Operations which failed with a permanent error (e.g. ``404``) and won't be retried.
+    skipped: :class:`int`
+        Operations skipped because the checkpoint already held them.
+    errored: :class:`int`
+        Operations which failed with a transient error and will be retried by the next run.
+    """
+
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    errored: int = 0
+
+class CrawlJob:
+    """
+    Runs a set of operations over many guilds concurrently, checkpointing progress so an interrupted
+    run resumes where it stopped.
+
+    Results are written to ``output`` in the JSON Lines format as each operation finishes, one line per result:
+    ``{"guild_id": ..., "op": ..., "result": ...}``, or ``"error"`` instead of ``"result"``.
+    Leaderboards are streamed with :meth:`UnbeliClient.stream_guild_leaderboard` one page of ``page_size`` users
+    at a time and written one user per line. Each page is written with its own checkpoint record once it was
+    fully received, so at most a page is held in memory, a failed page never leaves part of its users, and a
+    large guild resumes at the page it stopped at. The results and checkpoint records finishing together
+    are written and synced at once, off the event loop.
+
+    .. note::
+        An operation or page whose results were written right before a crash, but not its checkpoint record,
+        is run again on resume and written twice. Like :meth:`UnbeliClient.iter_leaderboard_pages`, pages
+        are not a snapshot: users whose balance changed between pages may be written twice or not at all.
+
+    Parameters
+    ----------
+    client: :class:`UnbeliClient`
+        The client to request with.
+    guild_ids: Iterable[:class:`int`]
+        The guilds to crawl.
+    operations: Iterable[:class:`str`]
+        Any of "guild", "permissions" and "leaderboard". This defaults to all of them.
+    output: Union[:class:`str`, :class:`os.PathLike`]
+        The JSON Lines file results are appended to.
+    checkpoint: Union[:class:`str`, :class:`os.PathLike`]
+        The file finished operations are recorded in.
+    concurrency: :class:`int`
+        The maximum number of operations running at once. This defaults to 20.
+    page_size: :class:`int`
+        The number of users per leaderboard page. This defaults to 1000.
+    """
+
+    def __init__(
+        self,
+        client: UnbeliClient,
+        guild_ids: Iterable[int],
+        operations: Iterable[str] = OPERATIONS,
+        *,
+        output: Union[str, os.PathLike],
+        checkpoint: Union[str, os.PathLike],
+        concurrency: int = 20,
+        page_size: int = 1000
+    ) -> None:
+        self.client: UnbeliClient = client
+        self.guild_ids: Tuple[int, ...] = tuple(guild_ids)
+        self.operations: Tuple[str, ...] = tuple(operations)
+        for operation in self.operations:
+            if operation not in OPERATIONS:
+                raise ValueError(f'operations can only be "guild", "permissions" or "leaderboard" but "{operation}" was received')
+        self.output: str = os.fspath(output)
+        self.checkpoint: str = os.fspath(checkpoint)
+        self.concurrency: int = concurrency
+        self.page_size: int = page_size
+
+    def __repr__(self) -> str:
+        return f"CrawlJob(guilds={len(self.guild_ids)}, operations={self.operations}, concurrency={self.concurrency})"
+
+    def _load_checkpoint(self) -> Tuple[Set[Tuple[int, str]], Dict[int, int]]:
+        # finished operations, and the last page written of each unfinished leaderboard
+        done = set()
+        pages: Dict[int, int] = {}
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'page' in record:
+                        pages[record['guild_id']] = max(pages.get(record['guild_id'], 0), record['page'])
+                    else:
+                        done.add((record['guild_id'], record['op']))
+        return done, pages
+
+    def _pending(self) -> Tuple[list, int, Dict[int, int]]:
+        done, pages = self._load_checkpoint()
+        pending = [
+            (guild_id, operation)
+            for guild_id in self.guild_ids
+            for operation in self.operations
+            if (guild_id, operation) not in done
+        ]
+        return pending, len(self.guild_ids) * len(self.operations) - len(pending), pages
+
+    def estimate(self, latency: float = 0.3) -> CrawlEstimate:
+        """Estimates the requests and wall time the remaining operations need.
+
+        Every operation is counted as a single request to its own bucket, so the run is bound by the global
+        rate limit or, if the client doesn't prevent rate limits, by ``concurrency`` and the latency.
+        A leaderboard needs one more request per page after the first, which isn't known in advance.
+
+        Parameters
+        ----------
+        latency: :class:`float`
+            The expected seconds per request. This defaults to 0.3.
+
+        Returns
+        -------
+        :class:`CrawlEstimate`
+            The estimated number of requests and seconds.
+        """
+
+        requests = len(self._pending()[0])
+        rate = self.concurrency / latency
+        if self.client.rate_limits.prevent_rate_limits is True:
+            rate = min(rate, GLOBAL_RATE_LIMIT / GLOBAL_RATE_PERIOD)
+        return CrawlEstimate(requests=requests, seconds=requests / rate)
+
+    @staticmethod
+    def _record(guild_id: int, operation: str, **extra: Any) -> str:
+        return json.dumps({'guild_id': guild_id, 'op': operation, **extra}) + '\n'
+
+    async def _run_leaderboard(self, guild_id: int, page: int, commits: BatchWriter) -> None:
+        # pages are committed one by one, the last one is the first holding fewer than page_size users
+        while True:
+            page += 1
+            stream = self.client.stream_guild_leaderboard(
+                guild_id, limit=self.page_size, offset=None, page=page, raw=True
+            )
+            try:
+                lines = [self._record(guild_id, 'leaderboard', result=row) async for row in stream]
+            finally:
+                await stream.aclose()  # releases the bucket right away if the stream failed halfway
+
+            if len(lines) < self.page_size:
+                await commits.write((lines, [self._record(guild_id, 'leaderboard')]))
+                return
+            await commits.write((lines, [self._record(guild_id, 'leaderboard', page=page)]))
+
+    async def _run_operation(self, guild_id: int, operation: str) -> List[str]:
+        client = self.client
+        if operation == 'guild':
+            result = await client.get_guild(guild_id)
+        else:
+            result = await client.get_permissions(guild_id)
+        return [self._record(guild_id, operation, result=_to_json(result))]
+
+    async def run(self) -> CrawlSummary:
+        """Runs every operation not recorded in the checkpoint yet.
+
+        Returns
+        -------
+        :class:`CrawlSummary`
+            How many operations completed, failed or were skipped.
+        """
+
+        pending, skipped, pages = self._pending()
+        summary = CrawlSummary(skipped=skipped)
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        with open(self.output, 'a') as output, open(self.checkpoint, 'a') as checkpoint:
+            def write(batch: List[Tuple[List[str], List[str]]]) -> None:
+                # results must be on disk before the checkpoint says they are
+                output.writelines(line for lines, _ in batch for line in lines)
+                output.flush()
+                os.fsync(output.fileno())
+                checkpoint.writelines(record for _, records in batch for record in records)
+                checkpoint.flush()
+
+            commits: BatchWriter[Tuple[List[str], List[str]]] = BatchWriter(write)
+
+            async def worker() -> None:
+                while not queue.empty():
+                    guild_id, operation = queue.get_nowait()
+                    try:
+                        if operation == 'leaderboard':
+                            await self._run_leaderboard(guild_id, pages.get(guild_id, 0), commits)
+                        else:
+                            lines = await self._run_operation(guild_id, operation)
+                            await commits.write((lines, [self._record(guild_id, operation)]))
+                    except _PERMANENT_ERRORS as error:
+                        lines = [self._record(guild_id, operation, error=str(error))]
+                        await commits.write((lines, [self._record(guild_id, operation)]))
+                        summary.failed += 1
+                    except Exception:
+                        summary.errored += 1
+                    else:
+                        summary.completed += 1
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+            finally:
+                await commits.wait_closed()  # the files are closed once the write in progress ends
+
+        return summary
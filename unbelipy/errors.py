@@ -24,6 +24,11 @@ SOFTWARE.
 
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
 __all__ = (
     "UnbException",
     "HTTPException",
@@ -33,7 +38,13 @@ __all__ = (
     "NotFound",
     "TooManyRequests",
     "InternalServerError",
-    "UnknownException"
+    "UnknownException",
+    "RateLimited",
+    "CircuitOpen",
+    "QueueFull",
+    "RequestShed",
+    "InsufficientFunds",
+    "TransferFailed"
 )
 
 class UnbException(Exception):
@@ -67,6 +78,9 @@ class Unauthorized(HTTPException):
 
 class Forbidden(HTTPException):
     """Exception that is raised when the response' status code is 403.
+
+    It's also raised without sending the request for balance mutations in guilds where the client's
+    :class:`PermissionCache` knows the application lacks :attr:`Permissions.ECONOMY`.
     
     This inherits from :exc:`HTTPException`.
     """
@@ -85,9 +99,33 @@ class TooManyRequests(HTTPException):
     """Exception that is raised when the response' status code is 429.
     
     This inherits from :exc:`HTTPException`.
+
+    Attributes
+    ----------
+    retry_after: Optional[:class:`float`]
+        The number of seconds to wait before retrying, if known.
+    bucket: Optional[:class:`str`]
+        The rate limited bucket.
+    reset: Optional[:class:`datetime.datetime`]
+        When the bucket's rate limit resets, if known.
+    is_global: :class:`bool`
+        Whether the global rate limit was hit rather than the bucket's.
     """
 
-    pass
+    def __init__(
+        self,
+        message: str = '',
+        *,
+        retry_after: Optional[float] = None,
+        bucket: Optional[str] = None,
+        reset: Optional[datetime] = None,
+        is_global: bool = False
+    ) -> None:
+        self.retry_after: Optional[float] = retry_after
+        self.bucket: Optional[str] = bucket
+        self.reset: Optional[datetime] = reset
+        self.is_global: bool = is_global
+        super().__init__(message)
 
 class InternalServerError(HTTPException):
     """Exception that is raised when the response' status code is 401.
@@ -104,3 +142,140 @@ class UnknownException(UnbException):
     """
 
     pass
+
+class RateLimited(UnbException):
+    """Exception that is raised instead of waiting when a request is made with ``wait=False``
+    and the global rate limit or the bucket has no capacity left. The request is not sent.
+
+    This is a subclass of :exc:`UnbException`.
+
+    Attributes
+    ----------
+    retry_after: :class:`float`
+        The estimated number of seconds until the request can be sent without waiting.
+    bucket: :class:`str`
+        The request's bucket.
+    reset: Optional[:class:`datetime.datetime`]
+        When the bucket's rate limit resets, ``None`` for the global rate limit.
+    is_global: :class:`bool`
+        Whether the global rate limit has no capacity rather than the bucket.
+    """
+
+    def __init__(
+        self,
+        retry_after: float,
+        bucket: str,
+        reset: Optional[datetime] = None,
+        is_global: bool = False
+    ) -> None:
+        self.retry_after: float = retry_after
+        self.bucket: str = bucket
+        self.reset: Optional[datetime] = reset
+        self.is_global: bool = is_global
+        limit = 'global rate limit' if is_global else 'rate limit'
+        super().__init__(f"Would wait for the {limit}, retry after: {retry_after:.2f}s, bucket: {bucket}")
+
+class CircuitOpen(UnbException):
+    """Exception that is raised without sending the request when the route's circuit breaker is open.
+
+    This is a subclass of :exc:`UnbException`.
+
+    Attributes
+    ----------
+    key: :class:`str`
+        The route or bucket whose circuit is open.
+    retry_after: :class:`float`
+        The number of seconds until the circuit lets a probe request through.
+    """
+
+    def __init__(self, key: str, retry_after: float) -> None:
+        self.key: str = key
+        self.retry_after: float = retry_after
+        super().__init__(f"Circuit open for {key}, retry after: {retry_after:.2f}s")
+
+class QueueFull(UnbException):
+    """Exception that is raised when the client's :class:`RequestQueue` rejects a request because it's full,
+    or when a request with ``wait=False`` finds its :class:`AdaptiveConcurrencyLimit` reached.
+
+    This is a subclass of :exc:`UnbException`.
+
+    Attributes
+    ----------
+    depth: :class:`int`
+        The number of requests queued or in flight when the request was rejected.
+    """
+
+    def __init__(self, depth: int, message: Optional[str] = None) -> None:
+        self.depth: int = depth
+        super().__init__(message or f"Request queue is full with {depth} pending requests")
+
+class RequestShed(QueueFull):
+    """Exception that is raised when a request is shed because its estimated queue wait is too long.
+
+    This inherits from :exc:`QueueFull`.
+
+    Attributes
+    ----------
+    estimated_wait: :class:`float`
+        The estimated seconds the request would have waited before being sent.
+    """
+
+    def __init__(self, depth: int, estimated_wait: float) -> None:
+        self.estimated_wait: float = estimated_wait
+        super().__init__(depth, f"Request shed, estimated wait of {estimated_wait:.2f}s with {depth} pending requests")
+
+class InsufficientFunds(UnbException):
+    """Exception that is raised by :meth:`UnbeliClient.transfer` without sending anything when the sender
+    can't afford the transfer.
+
+    This is a subclass of :exc:`UnbException`.
+
+    Attributes
+    ----------
+    user_id: :class:`int`
+        The sender's ID.
+    cash: Union[:class:`int`, :class:`float`]
+        The sender's cash when it was checked.
+    bank: Union[:class:`int`, :class:`float`]
+        The sender's bank when it was checked.
+    """
+
+    def __init__(self, user_id: int, cash: Union[int, float], bank: Union[int, float]) -> None:
+        self.user_id: int = user_id
+        self.cash: Union[int, float] = cash
+        self.bank: Union[int, float] = bank
+        super().__init__(f"User {user_id} has insufficient funds, cash: {cash}, bank: {bank}")
+
+class TransferFailed(UnbException):
+    """Exception that is raised by :meth:`UnbeliClient.transfer` when only one side of the transfer was applied.
+
+    The applied side is reverted before this is raised, unless the compensation fails too,
+    in which case ``compensated`` is ``False`` and the balances are left inconsistent.
+
+    This is a subclass of :exc:`UnbException`.
+
+    Attributes
+    ----------
+    error: :class:`BaseException`
+        The error of the side which failed, :exc:`asyncio.CancelledError` if it was cancelled.
+    failed_user_id: :class:`int`
+        The user whose balance mutation failed.
+    compensated: :class:`bool`
+        Whether the applied side was reverted.
+    compensation_error: Optional[:class:`Exception`]
+        The error which made the compensation fail, if any.
+    """
+
+    def __init__(
+        self,
+        error: BaseException,
+        failed_user_id: int,
+        compensated: bool,
+        compensation_error: Optional[Exception] = None
+    ) -> None:
+        self.error: BaseException = error
+        self.failed_user_id: int = failed_user_id
+        self.compensated: bool = compensated
+        self.compensation_error: Optional[Exception] = compensation_error
+        state = 'reverted' if compensated else f'NOT reverted ({compensation_error!r})'
+        super().__init__(f"Transfer failed for user {failed_user_id} ({error!r}), the other side was {state}")
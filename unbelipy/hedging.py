@@ -0,0 +1,121 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import (
+    Deque,
+    Dict,
+    Optional
+)
+
+__all__ = (
+    "HedgingPolicy",
+)
+
+class HedgingPolicy:
+    """
+    Opt-in request hedging for the idempotent ``GET`` routes of :class:`UnbeliClient`.
+
+    When a response takes longer than the route's hedging delay, a second identical request is sent and the
+    first response to arrive is used while the other request is cancelled. A hedge is only sent when both the
+    global limiter and the bucket have spare budget, so hedging never causes a ``429``.
+
+    Parameters
+    ----------
+    delay: Optional[:class:`float`]
+        A fixed delay in seconds before hedging. If ``None``, the observed ``percentile``
+        latency of each route is used instead.
+    percentile: :class:`float`
+        The latency percentile used as delay when ``delay`` is ``None``. This defaults to 0.95.
+    min_samples: :class:`int`
+        Latencies that must be observed on a route before it's hedged with an observed delay. This defaults to 20.
+    window: :class:`int`
+        The number of recent latencies kept per route. This defaults to 200.
+
+    Attributes
+    ----------
+    hedges_sent: :class:`int`
+        The number of hedge requests sent.
+    hedges_won: :class:`int`
+        The number of hedge requests which were answered before the original request.
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        *,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200
+    ) -> None:
+        if not 0 < percentile < 1:
+            raise ValueError(f"percentile must be between 0 and 1 but was {percentile}")
+        self.delay: Optional[float] = delay
+        self.percentile: float = percentile
+        self.min_samples: int = min_samples
+        self.window: int = window
+        self.hedges_sent: int = 0
+        self.hedges_won: int = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def __repr__(self) -> str:
+        return f"HedgingPolicy(delay={self.delay}, hedges_sent={self.hedges_sent}, hedges_won={self.hedges_won})"
+
+    def record(self, route: str, latency: float) -> None:
+        """Records the latency of a response on a route.
+
+        Parameters
+        ----------
+        route: :class:`str`
+            The request's route.
+        latency: :class:`float`
+            Seconds between sending the request and reading the whole response, or the seconds waited
+            before the request was cancelled, which is a lower bound of its latency.
+        """
+
+        latencies = self._latencies.get(route)
+        if latencies is None:
+            latencies = self._latencies[route] = deque(maxlen=self.window)
+        latencies.append(latency)
+
+    def delay_for(self, route: str) -> Optional[float]:
+        """Returns how long to wait for a response on ``route`` before hedging, or ``None`` to not hedge.
+
+        Parameters
+        ----------
+        route: :class:`str`
+            The request's route.
+        """
+
+        if self.delay is not None:
+            return self.delay
+
+        latencies = self._latencies.get(route)
+        if latencies is None or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(math.ceil(self.percentile * len(ordered)) - 1, len(ordered) - 1)]
@@ -0,0 +1,425 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import bisect
+import math
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+
+from .objects import UserBalance
+
+__all__ = (
+    "BalancePoint",
+    "BalanceHistory"
+)
+
+# raw points are (timestamp, cash, bank), downsampled ones add the lowest and highest total
+_RAW_FIELDS = 3
+_BUCKET_FIELDS = 5
+# measured bytes a user takes besides its points: the dict entry and key, the rings and their arrays
+_USER_BYTES = 800
+# the raw points the same memory would hold, rounded up, what a user counts for toward max_points
+_USER_POINTS = -(-_USER_BYTES // (8 * _RAW_FIELDS))
+
+def _to_amount(value: float) -> Union[int, float]:
+    # infinite balances stay floats, infinity minus infinity in a total included
+    return int(value) if math.isfinite(value) else value
+
+@dataclass
+class BalancePoint:
+    """
+    Dataclass representing a user's balance at a point of a :class:`BalanceHistory`.
+
+    Attributes
+    ----------
+    timestamp: :class:`float`
+        The UNIX timestamp the balance was observed at, or the start of its bucket if downsampled.
+    cash: Union[:class:`int`, :class:`float`]
+        The user's cash, the last one observed in the bucket if downsampled.
+    bank: Union[:class:`int`, :class:`float`]
+        The user's bank, the last one observed in the bucket if downsampled.
+    min_total: Union[:class:`int`, :class:`float`]
+        The lowest total observed in the bucket, or the total if not downsampled.
+    max_total: Union[:class:`int`, :class:`float`]
+        The highest total observed in the bucket, or the total if not downsampled.
+    resolution: :class:`float`
+        The width in seconds of the point's bucket, 0 if it wasn't downsampled.
+    """
+
+    timestamp: float
+    cash: Union[int, float]
+    bank: Union[int, float]
+    min_total: Union[int, float]
+    max_total: Union[int, float]
+    resolution: float = 0.0
+
+    @property
+    def total(self) -> Union[int, float]:
+        """Union[:class:`int`, :class:`float`]: The user's total, cash + bank."""
+        return self.cash + self.bank
+
+class _Ring:
+    """A ring buffer of fixed size records, stored flat in an ``array`` of doubles which grows up to capacity."""
+
+    __slots__ = ('fields', 'capacity', 'data', 'start', 'size')
+
+    def __init__(self, fields: int, capacity: int) -> None:
+        self.fields: int = fields
+        self.capacity: int = capacity
+        self.data: array = array('d')
+        self.start: int = 0
+        self.size: int = 0
+
+    def _offset(self, index: int) -> int:
+        return ((self.start + index) % self.capacity) * self.fields
+
+    def record(self, index: int) -> Tuple[float, ...]:
+        offset = self._offset(index)
+        return tuple(self.data[offset:offset + self.fields])
+
+    def last(self) -> Optional[Tuple[float, ...]]:
+        return self.record(self.size - 1) if self.size else None
+
+    def set_last(self, values: Sequence[float]) -> None:
+        offset = self._offset(self.size - 1)
+        self.data[offset:offset + self.fields] = array('d', values)
+
+    def append(self, values: Sequence[float]) -> Optional[Tuple[float, ...]]:
+        """Appends a record, returning the oldest one if it had to be overwritten."""
+        if self.size < self.capacity:
+            self.data.extend(values)
+            self.size += 1
+            return None
+        evicted = self.record(0)
+        offset = self.start * self.fields
+        self.data[offset:offset + self.fields] = array('d', values)
+        self.start = (self.start + 1) % self.capacity
+        return evicted
+
+    def __iter__(self) -> Iterator[Tuple[float, ...]]:
+        for index in range(self.size):
+            yield self.record(index)
+
+class _UserHistory:
+    __slots__ = ('tiers',)
+
+    def __init__(self, tiers: List[_Ring]) -> None:
+        self.tiers: List[_Ring] = tiers
+
+    @property
+    def points(self) -> int:
+        return sum(tier.size for tier in self.tiers)
+
+class BalanceHistory:
+    """
+    Records the balances a :class:`UnbeliClient` observes into a time series per user, in bounded memory.
+
+    Every balance received from the API, whether from :meth:`UnbeliClient.get_user_balance`, a balance
+    edit or a leaderboard page, is recorded when it differs from the user's last recorded balance,
+    so a series is a step function: a balance holds until the next point.
+
+    The latest ``raw_points`` observations of a user are kept as they are. Older ones are downsampled
+    into the buckets of ``tiers``, each a ``(seconds, buckets)`` pair from the finest to the coarsest:
+    with the default, hourly buckets for two days, then daily buckets for 90 days. A bucket keeps the last
+    cash and bank observed in it, and the lowest and highest total. What falls out of the coarsest tier
+    is forgotten.
+
+    Points are stored as doubles in flat arrays, so a raw point takes 24 bytes and a bucket 40 bytes,
+    and amounts are exact up to 2^53. The structures holding a user's points take about 800 more bytes,
+    so every user also counts for 34 points toward ``max_points``, and many users with few points are
+    bounded like a few users with many. When more than ``max_points`` are stored, the least recently
+    recorded or queried users are forgotten first.
+
+    Parameters
+    ----------
+    raw_points: :class:`int`
+        The number of observations kept per user before downsampling. This defaults to 64.
+    tiers: Sequence[Tuple[:class:`float`, :class:`int`]]
+        The width in seconds and the number of buckets of each downsampling tier.
+        This defaults to ``((3600, 48), (86400, 90))``.
+    max_points: :class:`int`
+        The number of points stored for all users together, each user counting for 34 more.
+        This defaults to 500000, about 12 MB.
+
+    Attributes
+    ----------
+    evicted: :class:`int`
+        The number of users forgotten to stay under ``max_points``.
+    """
+
+    def __init__(
+        self,
+        raw_points: int = 64,
+        tiers: Sequence[Tuple[float, int]] = ((3600, 48), (86400, 90)),
+        *,
+        max_points: int = 500_000
+    ) -> None:
+        if raw_points < 1:
+            raise ValueError(f"raw_points must be 1 or greater but was {raw_points}")
+        widths = [width for width, _ in tiers]
+        if any(width <= 0 for width in widths) or widths != sorted(set(widths)):
+            raise ValueError("tiers must be ordered from the finest to the coarsest with positive widths")
+        if any(buckets < 1 for _, buckets in tiers):
+            raise ValueError("every tier must have at least 1 bucket")
+        if max_points < raw_points:
+            raise ValueError("max_points must be at least raw_points")
+
+        self.raw_points: int = raw_points
+        self.tiers: Tuple[Tuple[float, int], ...] = tuple(tiers)
+        self.max_points: int = max_points
+        self.evicted: int = 0
+        self._points: int = 0
+        self._users: OrderedDict[Tuple[int, int], _UserHistory] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"BalanceHistory(users={len(self._users)}, points={self._points}, max_points={self.max_points})"
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @property
+    def points(self) -> int:
+        """:class:`int`: The number of points stored for all users."""
+        return self._points
+
+    @property
+    def memory_bytes(self) -> int:
+        """:class:`int`: The estimated bytes taken by the stored points and the structures holding them."""
+        return len(self._users) * _USER_BYTES + sum(
+            tier.data.itemsize * len(tier.data)
+            for history in self._users.values() for tier in history.tiers
+        )
+
+    def _new_user(self) -> _UserHistory:
+        tiers = [_Ring(_RAW_FIELDS, self.raw_points)]
+        tiers.extend(_Ring(_BUCKET_FIELDS, buckets) for _, buckets in self.tiers)
+        return _UserHistory(tiers)
+
+    def record(self, balance: UserBalance, timestamp: Optional[float] = None) -> bool:
+        """Records a balance observed from the API.
+
+        Parameters
+        ----------
+        balance: :class:`UserBalance`
+            The balance to record.
+        timestamp: Optional[:class:`float`]
+            The UNIX timestamp of the observation. This defaults to now. Timestamps older than the
+            user's last point are recorded at the last point's time, a series never goes back in time.
+
+        Returns
+        -------
+        :class:`bool`
+            Whether a point was added, ``False`` if the balance didn't change.
+        """
+
+        key = (balance.guild_id, balance.user_id)
+        history = self._users.get(key)
+        if history is None:
+            history = self._users[key] = self._new_user()
+        else:
+            self._users.move_to_end(key)
+
+        raw = history.tiers[0]
+        last = raw.last()
+        cash, bank = float(balance.cash), float(balance.bank)
+        if timestamp is None:
+            timestamp = time.time()
+        if last is not None:
+            if last[1] == cash and last[2] == bank:
+                return False
+            timestamp = max(timestamp, last[0])
+
+        before = history.points
+        evicted = raw.append((timestamp, cash, bank))
+        if evicted is not None:
+            total = evicted[1] + evicted[2]
+            self._downsample(history, 1, (*evicted, total, total))
+        self._points += history.points - before
+        self._evict()
+        return True
+
+    def record_many(self, balances: Iterable[UserBalance], timestamp: Optional[float] = None) -> int:
+        """Records several balances observed at once, e.g. a leaderboard page.
+
+        Returns
+        -------
+        :class:`int`
+            The number of points added.
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+        return sum(self.record(balance, timestamp) for balance in balances)
+
+    def _downsample(self, history: _UserHistory, level: int, bucket: Tuple[float, ...]) -> None:
+        # bucket is (timestamp, cash, bank, min_total, max_total), the oldest of the finer tier, so it's newer
+        # than anything in this tier and either joins its last bucket or starts a new one
+        while level < len(history.tiers):
+            width = self.tiers[level - 1][0]
+            tier = history.tiers[level]
+            start = bucket[0] - bucket[0] % width
+            last = tier.last()
+            if last is not None and last[0] == start:
+                tier.set_last((start, bucket[1], bucket[2], min(last[3], bucket[3]), max(last[4], bucket[4])))
+                return
+            bucket = tier.append((start, *bucket[1:]))
+            if bucket is None:
+                return
+            level += 1
+
+    def _evict(self) -> None:
+        while self._points + len(self._users) * _USER_POINTS > self.max_points and len(self._users) > 1:
+            _, history = self._users.popitem(last=False)
+            self._points -= history.points
+            self.evicted += 1
+
+    def forget(self, guild_id: int, user_id: int) -> None:
+        """Forgets the history of a user."""
+        history = self._users.pop((guild_id, user_id), None)
+        if history is not None:
+            self._points -= history.points
+
+    def clear(self) -> None:
+        """Forgets every user's history."""
+        self._users.clear()
+        self._points = 0
+
+    def series(
+        self,
+        guild_id: int,
+        user_id: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[BalancePoint]:
+        """Returns the recorded history of a user, the oldest point first.
+
+        Downsampled buckets come before the raw points, at the resolution they were kept at.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        user_id: :class:`int`
+            The user's ID.
+        start: Optional[:class:`float`]
+            Only points from this UNIX timestamp on are returned, plus the point in force at ``start``.
+        end: Optional[:class:`float`]
+            Only points up to this UNIX timestamp are returned.
+
+        Returns
+        -------
+        List[:class:`BalancePoint`]
+            The user's points, empty if none were recorded.
+        """
+
+        history = self._users.get((guild_id, user_id))
+        if history is None:
+            return []
+        self._users.move_to_end((guild_id, user_id))
+
+        points = []
+        for level in range(len(history.tiers) - 1, 0, -1):
+            width = self.tiers[level - 1][0]
+            for timestamp, cash, bank, min_total, max_total in history.tiers[level]:
+                points.append(BalancePoint(
+                    timestamp, _to_amount(cash), _to_amount(bank),
+                    _to_amount(min_total), _to_amount(max_total), width
+                ))
+        for timestamp, cash, bank in history.tiers[0]:
+            total = _to_amount(cash + bank)
+            points.append(BalancePoint(timestamp, _to_amount(cash), _to_amount(bank), total, total))
+
+        timestamps = [point.timestamp for point in points]
+        first = 0 if start is None else max(bisect.bisect_right(timestamps, start) - 1, 0)
+        last = len(points) if end is None else bisect.bisect_right(timestamps, end)
+        return points[first:last]
+
+    def at(self, guild_id: int, user_id: int, timestamp: float) -> Optional[BalancePoint]:
+        """Returns the point of a user's history in force at a UNIX timestamp.
+
+        Returns
+        -------
+        Optional[:class:`BalancePoint`]
+            The latest point at or before ``timestamp``, or ``None`` if there is none.
+        """
+
+        points = self.series(guild_id, user_id, end=timestamp)
+        return points[-1] if points else None
+
+    def sample(
+        self,
+        guild_id: int,
+        user_id: int,
+        start: float,
+        end: float,
+        step: float
+    ) -> List[Tuple[float, Optional[BalancePoint]]]:
+        """Samples a user's history at regular intervals, e.g. for a chart.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        user_id: :class:`int`
+            The user's ID.
+        start: :class:`float`
+            The UNIX timestamp of the first sample.
+        end: :class:`float`
+            The UNIX timestamp after which sampling stops.
+        step: :class:`float`
+            The seconds between two samples.
+
+        Returns
+        -------
+        List[Tuple[:class:`float`, Optional[:class:`BalancePoint`]]]
+            Each sample's timestamp with the point in force then, ``None`` before the first point.
+        """
+
+        if step <= 0:
+            raise ValueError(f"step must be greater than 0 but was {step}")
+
+        points = self.series(guild_id, user_id, start, end)
+        samples = []
+        index = -1
+        at = start
+        while at <= end:
+            while index + 1 < len(points) and points[index + 1].timestamp <= at:
+                index += 1
+            samples.append((at, points[index] if index >= 0 else None))
+            at += step
+        return samples
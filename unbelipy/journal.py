@@ -0,0 +1,217 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Union
+)
+
+from .batching import BatchWriter
+
+__all__ = (
+    "JournalEntry",
+    "MutationJournal"
+)
+
+@dataclass
+class JournalEntry:
+    """
+    Dataclass representing a balance mutation recorded in a :class:`MutationJournal`.
+
+    Attributes
+    ----------
+    key: :class:`str`
+        The entry's unique idempotency key.
+    method: :class:`str`
+        The HTTP method of the mutation, "PATCH" to edit or "PUT" to set a balance.
+    guild_id: :class:`int`
+        The guild's ID.
+    user_id: :class:`int`
+        The user's ID.
+    cash: Optional[Union[:class:`int`, :class:`str`]]
+        The cash amount sent.
+    bank: Optional[Union[:class:`int`, :class:`str`]]
+        The bank amount sent.
+    reason: Optional[:class:`str`]
+        The reason sent.
+    created_at: :class:`float`
+        UNIX timestamp of when the mutation was recorded.
+    """
+
+    key: str
+    method: str
+    guild_id: int
+    user_id: int
+    cash: Optional[Union[int, str]] = None
+    bank: Optional[Union[int, str]] = None
+    reason: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+class MutationJournal:
+    """
+    An append-only, write-ahead journal of balance mutations.
+
+    Every mutation sent by :meth:`UnbeliClient.edit_user_balance` and :meth:`UnbeliClient.set_user_balance`
+    is appended to the journal before the request is made and marked as done once the API accepts it.
+    Mutations that were never acknowledged (because the process crashed or the API failed) are kept
+    and can be sent again with :meth:`UnbeliClient.replay_journal`.
+
+    Appends are group-committed: every record queued while a write is in progress is flushed
+    (and synced to disk) together with a single write.
+
+    .. note::
+        Replays are *at-least-once*: a mutation accepted by the API right before a crash,
+        whose acknowledgement did not reach the disk, will be sent again.
+
+    Parameters
+    ----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The journal's file. It is created if it does not exist.
+    fsync: :class:`bool`
+        Whether every group commit is synced to disk with :func:`os.fsync`. This defaults to ``True``.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], *, fsync: bool = True) -> None:
+        self.path: str = os.fspath(path)
+        self.fsync: bool = fsync
+        self._pending: Dict[str, JournalEntry] = self._load()
+        self._compact()
+        self._file = open(self.path, 'ab')
+        # every record appended while a batch is written is written and synced with the next one
+        self._writer: BatchWriter[bytes] = BatchWriter(self._write)
+
+    def __repr__(self) -> str:
+        return f"MutationJournal(path={self.path!r}, pending={len(self._pending)})"
+
+    def _load(self) -> Dict[str, JournalEntry]:
+        pending: Dict[str, JournalEntry] = {}
+        if not os.path.exists(self.path):
+            return pending
+
+        with open(self.path, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a torn write from a crash, only this line is skipped and the records after it are still read
+                    continue
+                op = record.pop('op', None)
+                if op == 'begin':
+                    pending[record['key']] = JournalEntry(**record)
+                elif op in ('done', 'abandon'):
+                    pending.pop(record['key'], None)
+        return pending
+
+    def _compact(self) -> None:
+        # rewrite the journal with only the unacknowledged entries so it doesn't grow forever
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            for entry in self._pending.values():
+                file.write(self._encode('begin', **asdict(entry)))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _encode(op: str, **record) -> bytes:
+        return json.dumps({'op': op, **record}, separators=(',', ':')).encode() + b'\n'
+
+    def _write(self, lines: List[bytes]) -> None:
+        self._file.write(b''.join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def pending(self) -> List[JournalEntry]:
+        """Returns the mutations that were recorded but not yet acknowledged, oldest first.
+
+        Returns
+        -------
+        List[:class:`JournalEntry`]
+            The unacknowledged mutations.
+        """
+
+        return sorted(self._pending.values(), key=lambda entry: entry.created_at)
+
+    async def record(
+        self,
+        method: str,
+        guild_id: int,
+        user_id: int,
+        cash: Optional[Union[int, str]] = None,
+        bank: Optional[Union[int, str]] = None,
+        reason: Optional[str] = None
+    ) -> JournalEntry:
+        """Durably records a mutation before it is sent.
+
+        Returns
+        -------
+        :class:`JournalEntry`
+            The recorded entry, with a new idempotency key.
+        """
+
+        entry = JournalEntry(uuid.uuid4().hex, method, guild_id, user_id, cash, bank, reason)
+        self._pending[entry.key] = entry
+        await self._writer.write(self._encode('begin', **asdict(entry)))
+        return entry
+
+    async def complete(self, key: str) -> None:
+        """Marks a mutation as accepted by the API.
+
+        Parameters
+        ----------
+        key: :class:`str`
+            The entry's idempotency key.
+        """
+
+        self._pending.pop(key, None)
+        await self._writer.write(self._encode('done', key=key))
+
+    async def abandon(self, key: str, error: Optional[BaseException] = None) -> None:
+        """Marks a mutation that can never succeed (e.g. a 4xx error) so it isn't replayed.
+
+        Parameters
+        ----------
+        key: :class:`str`
+            The entry's idempotency key.
+        error: Optional[:class:`BaseException`]
+            The error which made the mutation fail.
+        """
+
+        self._pending.pop(key, None)
+        await self._writer.write(self._encode('abandon', key=key, error=repr(error) if error else None))
+
+    async def close(self) -> None:
+        """Waits for queued records to be written and closes the journal's file."""
+        await self._writer.wait_closed()
+        self._file.close()
@@ -0,0 +1,234 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple
+)
+
+from .errors import Forbidden, NotFound
+
+if TYPE_CHECKING:
+    from .client import UnbeliClient
+    from .objects import UserBalance
+
+__all__ = (
+    "MergedLeaderboard",
+)
+
+class _GuildCursor:
+    """The position of a :class:`MergedLeaderboard` in one guild's leaderboard."""
+
+    __slots__ = ('guild_id', 'users', 'position', 'next_page', 'total_pages', 'pending')
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id: int = guild_id
+        self.users: List[UserBalance] = []
+        self.position: int = 0
+        self.next_page: int = 1
+        self.total_pages: int = 1
+        self.pending: Optional[asyncio.Future] = None
+
+    @property
+    def has_more_pages(self) -> bool:
+        return self.next_page <= self.total_pages
+
+class MergedLeaderboard:
+    """
+    The leaderboards of several guilds merged into one, created by :meth:`UnbeliClient.merge_leaderboards`.
+
+    Iterating over it with ``async for`` yields every guild's users in descending order of the sort key.
+    The first page of every guild is requested concurrently, then the pages are merged lazily with a heap
+    that holds one user per guild: a deeper page is only requested once every user above it was yielded,
+    so stopping after ``limit`` users leaves the rest of the leaderboards unfetched. A guild's next page is
+    prefetched once its last buffered user reaches the heap, so at most two pages per guild are held in memory.
+
+    A user who belongs to several guilds is yielded once per guild, with the :attr:`UserBalance.guild_id`
+    and :attr:`UserBalance.rank` of that guild. Users with equal balances are yielded in the order the
+    guilds were given.
+
+    When ``skip_failed`` is set, a guild whose leaderboard can't be read (:exc:`NotFound` or :exc:`Forbidden`)
+    is left out of the merge and recorded in :attr:`failed` instead of ending the iteration. If one of its
+    deeper pages fails, the users of its pages already merged are kept.
+
+    .. note::
+        Pages are not a snapshot, see :meth:`UnbeliClient.iter_leaderboard_pages`.
+
+    Attributes
+    ----------
+    guild_ids: List[:class:`int`]
+        The guilds whose leaderboards are merged, without duplicates.
+    sort: :class:`str`
+        The balance the users are sorted by.
+    limit: Optional[:class:`int`]
+        The maximum number of users yielded.
+    requests: :class:`int`
+        The number of pages requested so far.
+    yielded: :class:`int`
+        The number of users yielded so far.
+    failed: Dict[:class:`int`, :class:`Exception`]
+        The guilds left out of the merge, with the error raised for their leaderboard.
+    """
+
+    def __init__(
+        self,
+        client: UnbeliClient,
+        guild_ids: Iterable[int],
+        sort: Optional[str],
+        limit: Optional[int],
+        page_size: int,
+        concurrency: int,
+        wait: bool,
+        skip_failed: bool = True
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if limit is not None and limit < 0:
+            raise ValueError("limit cannot be negative")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+        self.client: UnbeliClient = client
+        self.guild_ids: List[int] = list(dict.fromkeys(guild_ids))
+        self._api_sort: Optional[str] = sort
+        self.sort: str = sort or 'total'
+        self.limit: Optional[int] = limit
+        self.page_size: int = page_size
+        self.concurrency: int = concurrency
+        self._wait: bool = wait
+        self._skip_failed: bool = skip_failed
+        self.requests: int = 0
+        self.yielded: int = 0
+        self.failed: Dict[int, Exception] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._started: bool = False
+
+    def __repr__(self) -> str:
+        return (
+            f"MergedLeaderboard(guilds={len(self.guild_ids)}, sort={self.sort!r}, limit={self.limit}, "
+            f"requests={self.requests}, yielded={self.yielded}, failed={len(self.failed)})"
+        )
+
+    async def _fetch(self, guild_id: int, page: int) -> Dict:
+        async with self._semaphore:
+            self.requests += 1
+            return await self.client.get_guild_leaderboard(
+                guild_id, self._api_sort, limit=self.page_size, offset=None, page=page, wait=self._wait
+            )
+
+    def _request_next_page(self, cursor: _GuildCursor) -> None:
+        cursor.pending = asyncio.ensure_future(self._fetch(cursor.guild_id, cursor.next_page))
+        cursor.next_page += 1
+
+    async def _load_next_page(self, cursor: _GuildCursor) -> None:
+        if cursor.pending is None:
+            self._request_next_page(cursor)
+        try:
+            leaderboard = await cursor.pending
+        except (NotFound, Forbidden) as error:
+            if not self._skip_failed:
+                raise
+            self.failed[cursor.guild_id] = error
+            cursor.pending = None
+            cursor.users = []
+            cursor.total_pages = 0
+            return
+        cursor.pending = None
+        cursor.total_pages = leaderboard['total_pages']
+        cursor.users = leaderboard['users']
+        cursor.position = 0
+
+    def _push(self, heap: List[Tuple], index: int, cursor: _GuildCursor) -> None:
+        user = cursor.users[cursor.position]
+        # the users of a guild's last buffered entry are next in line, fetch them while the merge goes on
+        if cursor.position == len(cursor.users) - 1 and cursor.has_more_pages and cursor.pending is None:
+            self._request_next_page(cursor)
+        heapq.heappush(heap, (-getattr(user, self.sort), index, cursor.position, cursor))
+
+    async def collect(self) -> List[UserBalance]:
+        """
+        Runs the merge to the end.
+
+        Returns
+        -------
+        List[:class:`UserBalance`]
+            The merged users, at most ``limit`` of them.
+        """
+
+        return [user async for user in self]
+
+    async def __aiter__(self) -> AsyncIterator[UserBalance]:
+        if self._started:
+            raise RuntimeError("a merged leaderboard can only be iterated once")
+        self._started = True
+
+        if self.limit == 0:
+            return
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        cursors = [_GuildCursor(guild_id) for guild_id in self.guild_ids]
+        heap: List[Tuple] = []
+        try:
+            for cursor in cursors:
+                self._request_next_page(cursor)
+            for index, cursor in enumerate(cursors):
+                await self._load_next_page(cursor)
+                if cursor.users:
+                    self._push(heap, index, cursor)
+
+            while heap:
+                _, index, position, cursor = heapq.heappop(heap)
+                yield cursor.users[position]
+                self.yielded += 1
+                if self.limit is not None and self.yielded >= self.limit:
+                    return
+
+                cursor.position += 1
+                if cursor.position == len(cursor.users):
+                    # only the guild's next page can hold the next contender of this guild
+                    cursor.users = []
+                    if cursor.pending is None and not cursor.has_more_pages:
+                        continue
+                    await self._load_next_page(cursor)
+                    if not cursor.users:
+                        continue
+                self._push(heap, index, cursor)
+        finally:
+            for cursor in cursors:
+                if cursor.pending is None:
+                    continue
+                if cursor.pending.done() and not cursor.pending.cancelled():
+                    # retrieved so that a prefetch that failed after the merge stopped isn't logged
+                    cursor.pending.exception()
+                cursor.pending.cancel()
@@ -74,6 +74,9 @@ class UserBalance:
     def __post_init__(self):
         for attr in ['cash', 'bank', 'total']:
             value = getattr(self, attr)
+            if value in (float('inf'), float('-inf')):
+                # already converted, e.g. when the dataclass is copied with dataclasses.replace
+                continue
             try:
                 value = int(value)
             except ValueError:
@@ -0,0 +1,131 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import time
+from enum import IntFlag
+from typing import (
+    Dict,
+    Optional,
+    Tuple
+)
+
+__all__ = (
+    "Permissions",
+    "PermissionCache"
+)
+
+class Permissions(IntFlag):
+    """
+    The permissions of the application in a guild, as returned by :meth:`UnbeliClient.get_permissions`.
+    """
+
+    NONE = 0
+    #: Allows the application to view and edit the guild's balances.
+    ECONOMY = 1 << 0
+
+class PermissionCache:
+    """
+    The application's permissions per guild, each kept for ``ttl`` seconds.
+
+    The client fills it with :meth:`UnbeliClient.get_permissions` and :meth:`UnbeliClient.preflight_permissions`,
+    refuses balance mutations in guilds known to lack :attr:`Permissions.ECONOMY` and invalidates a guild's
+    entry whenever the API answers ``403``.
+
+    Parameters
+    ----------
+    ttl: :class:`float`
+        Seconds an entry is trusted for. This defaults to 300.
+    """
+
+    def __init__(self, ttl: float = 300) -> None:
+        self.ttl: float = ttl
+        self._entries: Dict[int, Tuple[Permissions, float]] = {}
+
+    def __repr__(self) -> str:
+        return f"PermissionCache(ttl={self.ttl}, guilds={len(self._entries)})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, guild_id: int) -> Optional[Permissions]:
+        """Returns the cached permissions of a guild.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+
+        Returns
+        -------
+        Optional[:class:`Permissions`]
+            The permissions, or ``None`` if they're unknown or expired.
+        """
+
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[guild_id]
+            return None
+        return entry[0]
+
+    def set(self, guild_id: int, permissions: int) -> Permissions:
+        """Caches the permissions of a guild for ``ttl`` seconds.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        permissions: :class:`int`
+            The permission bitfield.
+
+        Returns
+        -------
+        :class:`Permissions`
+            The permissions as flags.
+        """
+
+        permissions = Permissions(permissions)
+        self._entries[guild_id] = (permissions, time.monotonic() + self.ttl)
+        return permissions
+
+    def invalidate(self, guild_id: int) -> None:
+        """Forgets the permissions of a guild."""
+        self._entries.pop(guild_id, None)
+
+    def is_missing(self, guild_id: int, required: Permissions = Permissions.ECONOMY) -> bool:
+        """Whether the guild is known to lack any of the ``required`` permissions.
+
+        Unknown or expired permissions are never missing, so requests are only refused on a fresh answer.
+        """
+
+        permissions = self.get(guild_id)
+        return permissions is not None and (permissions & required) != required
+
+    def clear(self) -> None:
+        """Forgets every guild's permissions."""
+        self._entries.clear()
@@ -0,0 +1,254 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from itertools import count
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+    Union
+)
+
+from .objects import UserBalance
+
+__all__ = (
+    "ProjectedBalance",
+    "BalanceProjection"
+)
+
+_Amount = Optional[Union[int, str]]
+
+def _to_number(value: Union[int, float, str]) -> Union[int, float]:
+    if isinstance(value, str):
+        return float('inf') if value == 'Infinity' else float('-inf')
+    return value
+
+def _to_api(value: Union[int, float]) -> Union[int, str]:
+    # UserBalance expects what the API sends, where infinity is a string
+    if value == float('inf'):
+        return 'Infinity'
+    elif value == float('-inf'):
+        return '-Infinity'
+    return value
+
+@dataclass
+class ProjectedBalance:
+    """
+    Dataclass representing a balance served from the client's :class:`BalanceProjection`.
+
+    Attributes
+    ----------
+    balance: :class:`UserBalance`
+        The user's balance, including any mutation still waiting for the API's response.
+    confirmed: :class:`bool`
+        ``True`` if ``balance`` is exactly what the API last returned,
+        ``False`` if pending mutations were optimistically applied to it.
+    age: :class:`float`
+        Seconds since the underlying balance was received from the API.
+    """
+
+    balance: UserBalance
+    confirmed: bool
+    age: float
+
+class _Projection:
+    __slots__ = ('confirmed', 'confirmed_at', 'pending')
+
+    def __init__(self) -> None:
+        self.confirmed: Optional[UserBalance] = None
+        self.confirmed_at: float = 0.0
+        self.pending: Dict[int, Tuple[str, _Amount, _Amount]] = {}
+
+class BalanceProjection:
+    """
+    Projected balances kept by :class:`UnbeliClient` when ``projection_staleness`` is set.
+
+    Each (guild, user) pair holds the last balance returned by the API plus the mutations sent but
+    not answered yet. Reads apply those pending mutations optimistically on top of the confirmed balance.
+
+    Users without pending mutations are dropped once their balance is too old to be served, and when more
+    than ``max_entries`` users are kept, the least recently updated ones without pending mutations are
+    forgotten first.
+
+    Parameters
+    ----------
+    max_staleness: :class:`float`
+        How many seconds a balance received from the API may be served locally.
+    max_entries: :class:`int`
+        The number of users kept for all guilds together. This defaults to 100000.
+
+    Attributes
+    ----------
+    evicted: :class:`int`
+        The number of users forgotten to stay under ``max_entries``.
+    """
+
+    def __init__(self, max_staleness: float, *, max_entries: int = 100_000) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be 1 or greater but was {max_entries}")
+        self.max_staleness: float = max_staleness
+        self.max_entries: int = max_entries
+        self.evicted: int = 0
+        self._entries: OrderedDict[Tuple[int, int], _Projection] = OrderedDict()
+        self._tokens = count()
+
+    def __repr__(self) -> str:
+        return (
+            f"BalanceProjection(max_staleness={self.max_staleness}, users={len(self._entries)}, "
+            f"max_entries={self.max_entries})"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, guild_id: int, user_id: int) -> _Projection:
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Projection()
+            self._evict()
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self) -> None:
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        # oldest first, users with mutations in flight are kept since their projection is still needed
+        victims = []
+        for key, entry in self._entries.items():
+            if not entry.pending:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self._entries[key]
+        self.evicted += len(victims)
+
+    def prune(self) -> int:
+        """Drops every user whose balance is too old to be served and who has no pending mutation.
+
+        Returns
+        -------
+        :class:`int`
+            The number of users dropped.
+        """
+
+        oldest = time.monotonic() - self.max_staleness
+        stale = [
+            key for key, entry in self._entries.items()
+            if not entry.pending and (entry.confirmed is None or entry.confirmed_at < oldest)
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def begin(self, method: str, guild_id: int, user_id: int, cash: _Amount, bank: _Amount) -> int:
+        """Registers a mutation which was just sent.
+
+        Returns
+        -------
+        :class:`int`
+            A token to pass to :meth:`end` once the request finishes.
+        """
+
+        token = next(self._tokens)
+        self._entry(guild_id, user_id).pending[token] = (method, cash, bank)
+        return token
+
+    def end(self, guild_id: int, user_id: int, token: int) -> None:
+        """Forgets a pending mutation, after it was either confirmed or failed."""
+        entry = self._entries.get((guild_id, user_id))
+        if entry is not None:
+            entry.pending.pop(token, None)
+            if not entry.pending and entry.confirmed is None:
+                del self._entries[(guild_id, user_id)]
+
+    def confirm(self, balance: UserBalance) -> None:
+        """Replaces the projection with a balance returned by the API."""
+        entry = self._entry(balance.guild_id, balance.user_id)
+        entry.confirmed = balance
+        entry.confirmed_at = time.monotonic()
+
+    def invalidate(self, guild_id: int, user_id: int) -> None:
+        """Drops the confirmed balance of a user so the next read goes to the API."""
+        entry = self._entries.get((guild_id, user_id))
+        if entry is None:
+            return
+        if entry.pending:
+            entry.confirmed = None
+        else:
+            del self._entries[(guild_id, user_id)]
+
+    def get(self, guild_id: int, user_id: int, max_staleness: Optional[float] = None) -> Optional[ProjectedBalance]:
+        """Returns the projected balance of a user.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        user_id: :class:`int`
+            The user's ID.
+        max_staleness: Optional[:class:`float`]
+            Overrides the projection's ``max_staleness`` for this read.
+
+        Returns
+        -------
+        Optional[:class:`ProjectedBalance`]
+            The projected balance, or ``None`` if no balance was received or it is too old.
+        """
+
+        entry = self._entries.get((guild_id, user_id))
+        if entry is None or entry.confirmed is None:
+            return None
+
+        age = time.monotonic() - entry.confirmed_at
+        if age > (self.max_staleness if max_staleness is None else max_staleness):
+            if age > self.max_staleness and not entry.pending:
+                del self._entries[(guild_id, user_id)]
+            return None
+
+        if not entry.pending:
+            return ProjectedBalance(entry.confirmed, True, age)
+
+        cash, bank = entry.confirmed.cash, entry.confirmed.bank
+        for method, cash_value, bank_value in entry.pending.values():
+            if cash_value is not None:
+                cash = cash + _to_number(cash_value) if method == 'PATCH' else _to_number(cash_value)
+            if bank_value is not None:
+                bank = bank + _to_number(bank_value) if method == 'PATCH' else _to_number(bank_value)
+
+        balance = replace(
+            entry.confirmed,
+            cash=_to_api(cash),
+            bank=_to_api(bank),
+            total=_to_api(cash + bank)
+        )
+        return ProjectedBalance(balance, False, age)
@@ -0,0 +1,320 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from copy import copy
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
+
+from .objects import UserBalance
+
+__all__ = (
+    "GuildRankIndex",
+    "RankIndex"
+)
+
+SORT_KEYS = ('cash', 'bank', 'total')
+
+_Key = Tuple[Union[int, float], int]
+
+def _sort_key(balance: UserBalance, sort: str) -> _Key:
+    # the leaderboard is ordered from the richest user down, ties are broken by user ID
+    return (-getattr(balance, sort), balance.user_id)
+
+def _ranked(balance: UserBalance, rank: int) -> UserBalance:
+    # a shallow copy skips __post_init__, which can't convert infinite amounts a second time
+    ranked = copy(balance)
+    ranked.rank = rank
+    return ranked
+
+def _check_sort(sort: str) -> None:
+    if sort not in SORT_KEYS:
+        raise ValueError(f'sort can only be "cash", "bank" or "total" but was "{sort}"')
+
+class GuildRankIndex:
+    """
+    An in-memory sorted index of a single guild's leaderboard.
+
+    Every user is kept in one sorted list per sort order ("cash", "bank" and "total"),
+    so the rank of a user is found with a binary search instead of an API call.
+
+    Parameters
+    ----------
+    guild_id: :class:`int`
+        The guild's ID.
+
+    Attributes
+    ----------
+    guild_id: :class:`int`
+        The guild's ID.
+    complete: :class:`bool`
+        Whether the index was built from the guild's whole leaderboard.
+        Ranks are only exact when this is ``True``.
+    """
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id: int = guild_id
+        self.complete: bool = False
+        self._balances: Dict[int, UserBalance] = {}
+        self._keys: Dict[str, List[_Key]] = {sort: [] for sort in SORT_KEYS}
+
+    def __repr__(self) -> str:
+        return f"GuildRankIndex(guild_id={self.guild_id}, users={len(self)}, complete={self.complete})"
+
+    def __len__(self) -> int:
+        return len(self._balances)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._balances
+
+    def replace(self, balances: Iterable[UserBalance]) -> None:
+        """Rebuilds the index from a whole leaderboard.
+
+        Parameters
+        ----------
+        balances: Iterable[:class:`UserBalance`]
+            Every user's balance in the guild.
+        """
+
+        self._balances = {balance.user_id: balance for balance in balances}
+        for sort in SORT_KEYS:
+            self._keys[sort] = sorted(_sort_key(balance, sort) for balance in self._balances.values())
+        self.complete = True
+
+    def update(self, balance: UserBalance) -> None:
+        """Inserts or moves a user in the index.
+
+        Parameters
+        ----------
+        balance: :class:`UserBalance`
+            The user's latest balance.
+        """
+
+        old = self._balances.get(balance.user_id)
+        for sort, keys in self._keys.items():
+            if old is not None:
+                del keys[bisect_left(keys, _sort_key(old, sort))]
+            insort(keys, _sort_key(balance, sort))
+        self._balances[balance.user_id] = balance
+
+    def remove(self, user_id: int) -> None:
+        """Removes a user from the index, if present.
+
+        Parameters
+        ----------
+        user_id: :class:`int`
+            The user's ID.
+        """
+
+        old = self._balances.pop(user_id, None)
+        if old is None:
+            return
+        for sort, keys in self._keys.items():
+            del keys[bisect_left(keys, _sort_key(old, sort))]
+
+    def rank_of(self, user_id: int, sort: str = 'total') -> Optional[int]:
+        """Returns the rank of a user, or ``None`` if the user is not indexed.
+
+        Parameters
+        ----------
+        user_id: :class:`int`
+            The user's ID.
+        sort: :class:`str`
+            Rank by "cash", "bank" or "total". This defaults to "total".
+
+        Returns
+        -------
+        Optional[:class:`int`]
+            The 1-based rank of the user.
+        """
+
+        _check_sort(sort)
+        balance = self._balances.get(user_id)
+        if balance is None:
+            return None
+        return bisect_left(self._keys[sort], _sort_key(balance, sort)) + 1
+
+    def get(self, user_id: int, sort: str = 'total') -> Optional[UserBalance]:
+        """Returns a user's indexed balance with its ``rank`` set for the given sort order.
+
+        Parameters
+        ----------
+        user_id: :class:`int`
+            The user's ID.
+        sort: :class:`str`
+            Rank by "cash", "bank" or "total". This defaults to "total".
+
+        Returns
+        -------
+        Optional[:class:`UserBalance`]
+            The user's balance, or ``None`` if the user is not indexed.
+        """
+
+        rank = self.rank_of(user_id, sort)
+        if rank is None:
+            return None
+        return _ranked(self._balances[user_id], rank)
+
+    def between(self, start: int, end: int, sort: str = 'total') -> List[UserBalance]:
+        """Returns the users ranked from ``start`` to ``end`` (both inclusive).
+
+        Parameters
+        ----------
+        start: :class:`int`
+            The first rank to return, starting at 1.
+        end: :class:`int`
+            The last rank to return.
+        sort: :class:`str`
+            Rank by "cash", "bank" or "total". This defaults to "total".
+
+        Returns
+        -------
+        List[:class:`UserBalance`]
+            The balances in rank order, with ``rank`` set.
+        """
+
+        _check_sort(sort)
+        if start < 1:
+            raise ValueError(f"start must be 1 or greater but was {start}")
+        keys = self._keys[sort][start - 1:end]
+        return [_ranked(self._balances[user_id], start + i) for i, (_, user_id) in enumerate(keys)]
+
+    def top(self, amount: int, sort: str = 'total') -> List[UserBalance]:
+        """Returns the ``amount`` richest users.
+
+        Parameters
+        ----------
+        amount: :class:`int`
+            The number of users to return.
+        sort: :class:`str`
+            Rank by "cash", "bank" or "total". This defaults to "total".
+        """
+
+        return self.between(1, amount, sort)
+
+    def neighbors(self, user_id: int, radius: int = 1, sort: str = 'total') -> List[UserBalance]:
+        """Returns a user together with the ``radius`` users ranked right above and below them.
+
+        Parameters
+        ----------
+        user_id: :class:`int`
+            The user's ID.
+        radius: :class:`int`
+            How many users to return on each side. This defaults to 1.
+        sort: :class:`str`
+            Rank by "cash", "bank" or "total". This defaults to "total".
+
+        Returns
+        -------
+        List[:class:`UserBalance`]
+            The balances in rank order, empty if the user is not indexed.
+        """
+
+        rank = self.rank_of(user_id, sort)
+        if rank is None:
+            return []
+        return self.between(max(rank - radius, 1), rank + radius, sort)
+
+class RankIndex:
+    """
+    Per-guild leaderboard indexes kept by :class:`UnbeliClient` when ``rank_index`` is enabled.
+
+    The indexes are filled by :meth:`UnbeliClient.get_guild_leaderboard` and kept current with the
+    balances returned by :meth:`UnbeliClient.get_user_balance`, :meth:`UnbeliClient.edit_user_balance`
+    and :meth:`UnbeliClient.set_user_balance`.
+    """
+
+    def __init__(self) -> None:
+        self.guilds: Dict[int, GuildRankIndex] = {}
+
+    def __repr__(self) -> str:
+        return f"RankIndex(guilds={len(self.guilds)})"
+
+    def guild(self, guild_id: int) -> GuildRankIndex:
+        """Returns the index of a guild, creating an empty one if needed.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        """
+
+        index = self.guilds.get(guild_id)
+        if index is None:
+            index = self.guilds[guild_id] = GuildRankIndex(guild_id)
+        return index
+
+    def update(self, balance: UserBalance) -> None:
+        """Inserts or moves a single user's balance in its guild's index."""
+        self.guild(balance.guild_id).update(balance)
+
+    def update_many(self, guild_id: int, balances: Iterable[UserBalance], complete: bool = False) -> None:
+        """Adds leaderboard data to a guild's index.
+
+        Parameters
+        ----------
+        guild_id: :class:`int`
+            The guild's ID.
+        balances: Iterable[:class:`UserBalance`]
+            The balances received from the leaderboard.
+        complete: :class:`bool`
+            Whether ``balances`` is the guild's whole leaderboard, in which case the index is rebuilt.
+        """
+
+        index = self.guild(guild_id)
+        if complete:
+            index.replace(balances)
+        else:
+            for balance in balances:
+                index.update(balance)
+
+    def rank_of(self, guild_id: int, user_id: int, sort: str = 'total') -> Optional[int]:
+        """Shortcut for :meth:`GuildRankIndex.rank_of`."""
+        index = self.guilds.get(guild_id)
+        return index.rank_of(user_id, sort) if index is not None else None
+
+    def between(self, guild_id: int, start: int, end: int, sort: str = 'total') -> List[UserBalance]:
+        """Shortcut for :meth:`GuildRankIndex.between`."""
+        index = self.guilds.get(guild_id)
+        return index.between(start, end, sort) if index is not None else []
+
+    def neighbors(self, guild_id: int, user_id: int, radius: int = 1, sort: str = 'total') -> List[UserBalance]:
+        """Shortcut for :meth:`GuildRankIndex.neighbors`."""
+        index = self.guilds.get(guild_id)
+        return index.neighbors(user_id, radius, sort) if index is not None else []
+
+    def clear(self, guild_id: Optional[int] = None) -> None:
+        """Drops the index of one guild, or of every guild if ``guild_id`` is ``None``."""
+        if guild_id is None:
+            self.guilds.clear()
+        else:
+            self.guilds.pop(guild_id, None)
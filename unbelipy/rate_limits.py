@@ -24,22 +24,174 @@ SOFTWARE.
 
 from __future__ import annotations
 import asyncio
-from collections import defaultdict
+import heapq
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
     Dict, 
+    Iterator,
     List,
-    Any
+    Any,
+    Optional,
+    Tuple,
+    Union
 )
 
-from aiohttp import ClientResponse
-from aiolimiter import AsyncLimiter
+from .constants import GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD
+from .errors import RateLimited
+
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
+    from aiolimiter import AsyncLimiter
 
 __all__ = (
+    "ServerClock",
+    "AdaptivePadding",
     "BucketHandler",
-    "ClientRateLimits"
+    "ClientRateLimits",
+    "BucketStall",
+    "BucketWatchdog"
 )
 
+_log = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r'/\d+')
+# the number of buckets below which they're never pruned
+_MIN_PRUNE_AT = 1024
+# the number of superseded reset times kept in the heap before it's rebuilt
+_MIN_HEAP_COMPACT = 64
+
+def bucket_route(bucket: str) -> str:
+    """Returns the route of a bucket, with its IDs replaced by ``:id``.
+
+    e.g. ``"GET/guilds/123/users/456"`` becomes ``"GET/guilds/:id/users/:id"``.
+    """
+
+    return _ID_SEGMENT.sub('/:id', bucket)
+
+class ServerClock:
+    """
+    Estimates the offset between the API's clock and the local clock from the ``Date`` response header.
+
+    Rate limit resets are sent as UNIX timestamps of the API's clock. They are converted to deadlines
+    on the local monotonic clock with this offset, so a skewed or adjusted system clock doesn't make
+    the client sleep too long or too little.
+
+    Parameters
+    ----------
+    samples: :class:`int`
+        The number of recent ``Date`` headers the offset is the median of. This defaults to 15.
+    """
+
+    def __init__(self, samples: int = 15) -> None:
+        self._dates: Deque[Tuple[float, float]] = deque(maxlen=samples)
+        self.offset: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"ServerClock(offset={self.offset:.3f})"
+
+    def observe(self, date: Optional[str]) -> None:
+        """Adds a sample from a ``Date`` header.
+
+        Parameters
+        ----------
+        date: Optional[:class:`str`]
+            The header's value, ignored if ``None`` or invalid.
+        """
+
+        if not date:
+            return
+        from email.utils import parsedate_to_datetime
+        try:
+            server_time = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            return
+
+        # the header is truncated to the second, so each sample only bounds the offset to
+        # [date - now, date + 1 - now). Intersecting recent samples narrows it down.
+        now = time.time()
+        lower, upper = server_time - now, server_time + 1 - now
+        if self._dates:
+            lower = max(lower, max(low for low, _ in self._dates))
+            upper = min(upper, min(up for _, up in self._dates))
+            if lower > upper:
+                # the samples disagree, e.g. one of the clocks was adjusted
+                self._dates.clear()
+                lower, upper = server_time - now, server_time + 1 - now
+        self._dates.append((server_time - now, server_time + 1 - now))
+        # a local clock consistent with every sample is trusted as is
+        self.offset = 0.0 if lower <= 0 <= upper else (lower + upper) / 2
+
+    def server_time(self) -> float:
+        """Returns the estimated current UNIX time of the API's clock."""
+        return time.time() + self.offset
+
+    def to_monotonic(self, timestamp: float) -> float:
+        """Converts a UNIX timestamp of the API's clock to a :func:`time.monotonic` deadline.
+
+        Parameters
+        ----------
+        timestamp: :class:`float`
+            The UNIX timestamp, in seconds.
+        """
+
+        return time.monotonic() + (timestamp - self.server_time())
+
+class AdaptivePadding:
+    """
+    The safety margin added to every wait for a rate limit reset.
+
+    It shrinks while requests succeed and grows each time a ``429`` is received anyway,
+    instead of always waiting a flat extra second.
+
+    Parameters
+    ----------
+    initial: :class:`float`
+        The starting padding in seconds. This defaults to 0.05.
+    minimum: :class:`float`
+        The smallest padding in seconds. This defaults to 0.01.
+    maximum: :class:`float`
+        The largest padding in seconds. This defaults to 2.
+    decay: :class:`float`
+        The factor the padding is multiplied by on every successful response. This defaults to 0.99.
+
+    Attributes
+    ----------
+    value: :class:`float`
+        The current padding in seconds.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.05,
+        *,
+        minimum: float = 0.01,
+        maximum: float = 2.0,
+        decay: float = 0.99
+    ) -> None:
+        self.value: float = initial
+        self.minimum: float = minimum
+        self.maximum: float = maximum
+        self.decay: float = decay
+
+    def __repr__(self) -> str:
+        return f"AdaptivePadding(value={self.value:.3f})"
+
+    def on_success(self) -> None:
+        """Shrinks the padding after a response which was not rate limited."""
+        self.value = max(self.value * self.decay, self.minimum)
+
+    def on_rate_limited(self) -> None:
+        """Grows the padding after a ``429``."""
+        self.value = min(max(self.value * 2, 0.25), self.maximum)
+
 class BucketHandler:
     """
     Handles bucket-specific rate limits.
@@ -49,11 +201,26 @@ class BucketHandler:
     remaining: int = None
     reset: datetime = None
     retry_after: float = None
+    reset_at: float = None
     cond = None
     prevent_429 = False
 
-    def __init__(self, bucket: str) -> None:
+    def __init__(
+        self,
+        bucket: str,
+        on_update: Optional[Callable[[BucketHandler], None]] = None,
+        clock: Optional[ServerClock] = None,
+        padding: Optional[AdaptivePadding] = None
+    ) -> None:
         self.bucket: str = bucket
+        self._on_update = on_update
+        self.clock: ServerClock = clock or ServerClock()
+        self.padding: AdaptivePadding = padding or AdaptivePadding()
+        self.last_used: float = time.monotonic()
+        self.held_since: Optional[float] = None
+        self.holder: Optional[asyncio.Task] = None
+        self.waiting: int = 0
+        self.references: int = 0
 
     def __repr__(self) -> str:
         return (
@@ -68,32 +235,120 @@ class BucketHandler:
             'X-RateLimit-Remaining': 'remaining',
             'X-RateLimit-Reset': 'reset',
         }
+        self.clock.observe(response.headers.get('Date'))
         for key in header_attrs:
             value = response.headers.get(key)
             if value is not None:
                 value = int(value)
                 if key == 'X-RateLimit-Reset':
+                    # reset_at is the same moment as a deadline on the local monotonic clock
+                    limits['reset_at'] = self.clock.to_monotonic(value / 1000)
                     value = datetime.utcfromtimestamp(value / 1000)
+            elif key == 'X-RateLimit-Reset':
+                limits['reset_at'] = None
             limits[header_attrs[key]] = value
 
         for k, v in limits.items():
             setattr(self, k, v)
+        self.last_used = time.monotonic()
 
-    async def __aenter__(self):
-        self.cond = self.cond or asyncio.Condition()
+        if self._on_update is not None:
+            self._on_update(self)
+
+    @property
+    def idle(self) -> bool:
+        """Whether no request holds or waits for the bucket's lock, or is about to.
+
+        A request is counted in :attr:`references` from the moment it gets the handler, including
+        while it waits for the request queue, the global limiter or the concurrency limit.
+        """
+        return self.held_since is None and self.waiting == 0 and self.references == 0
+
+    @property
+    def held_for(self) -> Optional[float]:
+        """Seconds the bucket's lock has been held, or ``None`` if it isn't."""
+        return None if self.held_since is None else time.monotonic() - self.held_since
+
+    def check_capacity(self) -> None:
+        """Raises :exc:`RateLimited` if taking the bucket's lock would wait, for another request or for the reset.
+
+        Raises
+        ------
+        RateLimited
+            The lock is held, or no requests remain until the reset.
+        """
+
+        retry_after = 0.0
+        if self.remaining == 0 and self.reset_at is not None:
+            retry_after = self.reset_at - time.monotonic()
+        if retry_after > 0:
+            raise RateLimited(retry_after, self.bucket, reset=self.reset)
+        if self.waiting or (self.cond is not None and self.cond.locked()):
+            # the holder's response is awaited, how long it takes isn't known
+            raise RateLimited(0.0, self.bucket, reset=self.reset)
+
+    async def acquire(self, wait: bool = True) -> None:
+        """Takes the bucket's lock and, if no requests remain, waits for the reset.
+
+        Nothing is done unless :attr:`prevent_429` is set.
+
+        Parameters
+        ----------
+        wait: :class:`bool`
+            Whether to wait for the lock and the reset. If ``False``, :exc:`RateLimited` is raised instead.
+
+        Raises
+        ------
+        RateLimited
+            ``wait`` is ``False`` and the lock is held, or no requests remain until the reset.
+        """
+
+        self.last_used = time.monotonic()
         if self.prevent_429 is True:
-            await self.cond.acquire()
-            if self.remaining is not None and self.remaining == 0:
-                now = datetime.utcnow()
-                to_wait = (self.reset - now).total_seconds() + 1
-                await asyncio.sleep(to_wait)
+            # only created when needed, a client sees a bucket per user
+            self.cond = self.cond or asyncio.Condition()
+            if wait is False:
+                self.check_capacity()
+            self.waiting += 1
+            try:
+                await self.cond.acquire()
+            finally:
+                self.waiting -= 1
+            self.held_since = time.monotonic()
+            self.holder = asyncio.current_task()
+            try:
+                if self.remaining is not None and self.remaining == 0 and self.reset_at is not None:
+                    to_wait = self.reset_at - time.monotonic() + self.padding.value
+                    if to_wait > 0:
+                        if wait is False:
+                            raise RateLimited(to_wait, self.bucket, reset=self.reset)
+                        await asyncio.sleep(to_wait)
+            except BaseException:
+                # __aexit__ isn't called when __aenter__ raises, a cancelled wait must not keep the bucket
+                self._release()
+                raise
+
+    def release(self) -> None:
+        """Releases the bucket's lock taken by :meth:`acquire`."""
+        if self.prevent_429 is True:
+            self._release()
+
+    async def __aenter__(self):
+        await self.acquire()
         return self
 
     async def __aexit__(self, *args: Any) -> None:
-        if self.prevent_429 is True:
-            self.cond.release()
+        self.release()
+
+    def _release(self) -> None:
+        self.held_since = None
+        self.holder = None
+        self.cond.release()
 
 class AsyncNonLimiter:
+    def has_capacity(self, amount: float = 1) -> bool:
+        return True
+
     async def __aenter__(self) -> None:
         pass
 
@@ -101,10 +356,173 @@ class AsyncNonLimiter:
         pass
 
 class ClientRateLimits:
-    buckets: Dict[str, BucketHandler] = dict()
+    """
+    The rate limit state of a :class:`UnbeliClient`.
 
-    def __init__(self, prevent_rate_limits: bool) -> None:
-        self.global_limiter = AsyncLimiter(20, 1) if prevent_rate_limits is True else AsyncNonLimiter()
+    The reset time of every rate limited bucket is kept in a min-heap, so that checking a single bucket
+    doesn't scan the others and expired limits are dropped in order.
+
+    Every user's balance is its own bucket, so the handlers of buckets unused for ``bucket_ttl`` seconds
+    are pruned once their reset has passed. Pruning runs when the number of buckets doubles, which keeps
+    it amortized constant per new bucket.
+
+    Parameters
+    ----------
+    prevent_rate_limits: :class:`bool`
+        Whether requests wait for the rate limits.
+    bucket_ttl: :class:`float`
+        The seconds a bucket's handler is kept after its last use. This defaults to 60.
+
+    Attributes
+    ----------
+    buckets: Dict[:class:`str`, :class:`BucketHandler`]
+        The handler of every bucket requested recently.
+    bucket_ttl: :class:`float`
+        The seconds a bucket's handler is kept after its last use.
+    clock: :class:`ServerClock`
+        The estimated offset of the API's clock, shared by every bucket.
+    padding: :class:`AdaptivePadding`
+        The margin added to every wait for a reset, shared by every bucket.
+    """
+
+    def __init__(self, prevent_rate_limits: bool, bucket_ttl: float = 60.0) -> None:
+        self.prevent_rate_limits: bool = prevent_rate_limits
+        self.buckets: Dict[str, BucketHandler] = {}
+        self.bucket_ttl: float = bucket_ttl
+        self._prune_at: int = _MIN_PRUNE_AT
+        self._global_limiter: Union[AsyncLimiter, AsyncNonLimiter, None] = None
+        self.clock: ServerClock = ServerClock()
+        self.padding: AdaptivePadding = AdaptivePadding()
+        self._limited: Dict[str, float] = {}
+        self._resets: List[Tuple[float, str]] = []
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    @property
+    def global_limiter(self) -> Union[AsyncLimiter, AsyncNonLimiter]:
+        """The limiter shared by every request to respect the API's global rate limit.
+
+        It's created on first use, so that aiolimiter is only imported once a request is made.
+        """
+
+        if self._global_limiter is None:
+            if self.prevent_rate_limits is True:
+                from aiolimiter import AsyncLimiter
+                self._global_limiter = AsyncLimiter(GLOBAL_RATE_LIMIT, GLOBAL_RATE_PERIOD)
+            else:
+                self._global_limiter = AsyncNonLimiter()
+        return self._global_limiter
+
+    def get_bucket(self, bucket: str) -> BucketHandler:
+        """Returns the handler of a bucket, creating it if needed.
+
+        Parameters
+        ----------
+        bucket: :class:`str`
+            The bucket's name.
+        """
+
+        bucket_handler = self.buckets.get(bucket)
+        if bucket_handler is None:
+            if len(self.buckets) >= self._prune_at:
+                self.prune()
+                self._prune_at = max(_MIN_PRUNE_AT, 2 * len(self.buckets))
+            bucket_handler = self.buckets[bucket] = BucketHandler(
+                bucket=bucket,
+                on_update=self._update,
+                clock=self.clock,
+                padding=self.padding
+            )
+        else:
+            bucket_handler.last_used = time.monotonic()
+        return bucket_handler
+
+    def held(self, longer_than: float = 0.0) -> Dict[str, float]:
+        """Returns the buckets whose lock is held, with the seconds it has been held.
+
+        Parameters
+        ----------
+        longer_than: :class:`float`
+            Only the buckets held for more than this many seconds are returned. This defaults to 0.
+
+        Returns
+        -------
+        Dict[:class:`str`, :class:`float`]
+            The seconds each bucket has been held, the longest first.
+        """
+
+        held = [
+            (bucket, held_for) for bucket, handler in self.buckets.items()
+            if (held_for := handler.held_for) is not None and held_for > longer_than
+        ]
+        return dict(sorted(held, key=lambda item: item[1], reverse=True))
+
+    def prune(self) -> int:
+        """Drops the handlers of the buckets which are idle, not rate limited and unused for ``bucket_ttl`` seconds.
+
+        Their state is only valid until their reset, which has passed, so a new handler is created if
+        the bucket is requested again.
+
+        Returns
+        -------
+        :class:`int`
+            The number of handlers dropped.
+        """
+
+        now = time.monotonic()
+        self._purge(now)
+        unused_since = now - self.bucket_ttl
+        stale = [
+            bucket for bucket, handler in self.buckets.items()
+            if handler.last_used <= unused_since and handler.idle
+            and (handler.reset_at is None or handler.reset_at <= now)
+            and bucket not in self._limited and bucket not in self._waiters
+        ]
+        for bucket in stale:
+            del self.buckets[bucket]
+        return len(stale)
+
+    def _update(self, bucket_handler: BucketHandler) -> None:
+        # called by the bucket handlers whenever new rate limit headers are received
+        self._purge(time.monotonic())
+        bucket = bucket_handler.bucket
+        if bucket_handler.remaining == 0 and bucket_handler.reset_at is not None:
+            if self._limited.get(bucket) != bucket_handler.reset_at:
+                self._limited[bucket] = bucket_handler.reset_at
+                heapq.heappush(self._resets, (bucket_handler.reset_at, bucket))
+                if bucket in self._waiters:
+                    self._schedule_wakeup(bucket)
+        elif self._limited.pop(bucket, None) is not None:
+            self._wake(bucket)
+
+    def _purge(self, now: float) -> None:
+        # drops the buckets whose reset has passed, heap entries replaced by a later reset are skipped
+        resets = self._resets
+        while resets and resets[0][0] <= now:
+            reset, bucket = heapq.heappop(resets)
+            if self._limited.get(bucket) == reset:
+                del self._limited[bucket]
+        if len(resets) > 2 * len(self._limited) + _MIN_HEAP_COMPACT:
+            # resets moved by the clock estimate or cleared early leave entries which aren't due yet
+            self._resets = [(reset, bucket) for bucket, reset in self._limited.items()]
+            heapq.heapify(self._resets)
+
+    def iter_limited(self) -> Iterator[str]:
+        """
+        Iterates over the buckets which are currently being rate limited, the soonest to reset first.
+
+        Returns
+        -------
+        Iterator[:class:`str`]
+            The rate limited buckets.
+        """
+
+        self._purge(time.monotonic())
+        resets = list(self._resets)
+        while resets:
+            reset, bucket = heapq.heappop(resets)
+            if self._limited.get(bucket) == reset:
+                yield bucket
 
     def currently_limited(self) -> List[str]:
         """
@@ -116,9 +534,8 @@ class ClientRateLimits:
             A list of the rate limited buckets.
         """
 
-        now = datetime.utcnow()
-        limited = [k for k, v in self.buckets.items() if v.reset is not None and v.reset > now and v.remaining == 0]
-        return limited
+        self._purge(time.monotonic())
+        return list(self._limited)
 
     def any_limited(self) -> bool:
         """
@@ -130,7 +547,184 @@ class ClientRateLimits:
             ...
         """
 
-        return any(self.currently_limited())
+        self._purge(time.monotonic())
+        return bool(self._limited)
 
     def is_limited(self, bucket: str) -> bool:
-        return bucket in self.currently_limited()
+        """
+        Returns ``True`` if ``bucket`` is currently being rate limited.
+
+        Parameters
+        ----------
+        bucket: :class:`str`
+            The bucket's name.
+        """
+
+        reset = self._limited.get(bucket)
+        return reset is not None and reset > time.monotonic()
+
+    def _schedule_wakeup(self, bucket: str) -> None:
+        timer = self._timers.pop(bucket, None)
+        if timer is not None:
+            timer.cancel()
+        loop = asyncio.get_running_loop()
+        delay = self._limited[bucket] - time.monotonic() + self.padding.value
+        self._timers[bucket] = loop.call_at(loop.time() + max(delay, 0), self._wake, bucket)
+
+    def _wake(self, bucket: str) -> None:
+        timer = self._timers.pop(bucket, None)
+        if timer is not None:
+            timer.cancel()
+        for future in self._waiters.pop(bucket, ()):
+            if not future.done():
+                future.set_result(None)
+
+    async def wait_until_available(self, bucket: str) -> None:
+        """
+        Waits until ``bucket`` is no longer rate limited, returning immediately if it isn't.
+
+        Every waiter of a bucket shares a single timer which fires at the bucket's reset.
+
+        Parameters
+        ----------
+        bucket: :class:`str`
+            The bucket's name.
+        """
+
+        while self.is_limited(bucket):
+            future = asyncio.get_running_loop().create_future()
+            first = bucket not in self._waiters
+            self._waiters.setdefault(bucket, []).append(future)
+            if first:
+                self._schedule_wakeup(bucket)
+            try:
+                await future
+            finally:
+                waiters = self._waiters.get(bucket)
+                if waiters is not None and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        self._wake(bucket)
+
+@dataclass
+class BucketStall:
+    """
+    Dataclass representing a bucket whose lock was held longer than a :class:`BucketWatchdog`'s threshold.
+
+    Attributes
+    ----------
+    bucket: :class:`str`
+        The bucket's name.
+    held_for: :class:`float`
+        The seconds the lock had been held when the stall was detected.
+    holder: Optional[:class:`asyncio.Task`]
+        The task holding the lock.
+    waiting: :class:`int`
+        The number of requests waiting for the lock.
+    detected_at: :class:`float`
+        The UNIX timestamp of the detection.
+    """
+
+    bucket: str
+    held_for: float
+    holder: Optional[asyncio.Task]
+    waiting: int
+    detected_at: float
+
+class BucketWatchdog:
+    """
+    Reports the buckets whose lock is held longer than ``threshold`` seconds.
+
+    A bucket's lock is held by one request at a time, for its request and while it waits for the bucket's
+    reset, so a lock held much longer than a request takes means a stuck request and every later request
+    to the bucket waiting behind it. :meth:`check` looks for them, logs a warning on the ``unbelipy``
+    logger with the holding task and keeps a :class:`BucketStall` in :attr:`stalls`, once per stall.
+
+    :class:`UnbeliClient` runs it in the background when created with ``stall_threshold``,
+    see :meth:`UnbeliClient.diagnostics`.
+
+    Parameters
+    ----------
+    rate_limits: :class:`ClientRateLimits`
+        The rate limits whose buckets are watched.
+    threshold: :class:`float`
+        The seconds a lock may be held before being reported. This defaults to 60.
+    interval: Optional[:class:`float`]
+        The seconds between two checks by :meth:`start`. This defaults to a quarter of ``threshold``.
+    max_stalls: :class:`int`
+        The number of stalls kept in :attr:`stalls`. This defaults to 100.
+
+    Attributes
+    ----------
+    stalls: Deque[:class:`BucketStall`]
+        The latest stalls, the most recent last.
+    """
+
+    def __init__(
+        self,
+        rate_limits: ClientRateLimits,
+        threshold: float = 60.0,
+        *,
+        interval: Optional[float] = None,
+        max_stalls: int = 100
+    ) -> None:
+        if threshold <= 0:
+            raise ValueError(f"threshold must be greater than 0 but was {threshold}")
+
+        self.rate_limits: ClientRateLimits = rate_limits
+        self.threshold: float = threshold
+        self.interval: float = interval if interval is not None else threshold / 4
+        self.stalls: Deque[BucketStall] = deque(maxlen=max_stalls)
+        self._reported: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __repr__(self) -> str:
+        return f"BucketWatchdog(threshold={self.threshold}, stalls={len(self.stalls)}, running={self.running})"
+
+    @property
+    def running(self) -> bool:
+        """:class:`bool`: Whether the background checks are running."""
+        return self._task is not None and not self._task.done()
+
+    def check(self) -> List[BucketStall]:
+        """Looks for buckets held longer than the threshold.
+
+        Returns
+        -------
+        List[:class:`BucketStall`]
+            The stalls detected by this check, a stall is only reported once.
+        """
+
+        held = self.rate_limits.held(self.threshold)
+        detected = []
+        reported = {}
+        for bucket, held_for in held.items():
+            handler = self.rate_limits.buckets[bucket]
+            reported[bucket] = handler.held_since
+            if self._reported.get(bucket) == handler.held_since:
+                continue
+            stall = BucketStall(bucket, held_for, handler.holder, handler.waiting, time.time())
+            _log.warning(
+                "Bucket %s has been held for %.1fs with %d requests waiting, holder: %r",
+                bucket, held_for, handler.waiting, handler.holder
+            )
+            self.stalls.append(stall)
+            detected.append(stall)
+        self._reported = reported
+        return detected
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+    def start(self) -> None:
+        """Starts checking every ``interval`` seconds in the background, if it isn't already."""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        """Stops the background checks."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
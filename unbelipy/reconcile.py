@@ -0,0 +1,328 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
+
+from .bulk import BalanceOperation
+
+if TYPE_CHECKING:
+    from .client import UnbeliClient
+
+__all__ = (
+    "BalanceMismatch",
+    "ReconcileReport",
+    "Reconciler"
+)
+
+_Amount = Union[int, float]
+_Row = Tuple[int, _Amount, _Amount]
+LocalSource = Union[Iterable[Tuple[int, Union[int, str], Union[int, str]]], AsyncIterable[Tuple[int, Union[int, str], Union[int, str]]]]
+
+def _to_number(value: Union[int, float, str]) -> _Amount:
+    if isinstance(value, str):
+        return float('inf') if value == 'Infinity' else float('-inf')
+    return value
+
+def _to_api(value: _Amount) -> Union[int, str]:
+    if value == float('inf'):
+        return 'Infinity'
+    elif value == float('-inf'):
+        return '-Infinity'
+    return value
+
+async def _iter_local(source: LocalSource) -> AsyncIterator[_Row]:
+    if hasattr(source, '__aiter__'):
+        async for user_id, cash, bank in source:
+            yield int(user_id), _to_number(cash), _to_number(bank)
+    else:
+        for user_id, cash, bank in source:
+            yield int(user_id), _to_number(cash), _to_number(bank)
+
+@dataclass
+class BalanceMismatch:
+    """
+    Dataclass representing a user whose local balance differs from the API's.
+
+    Attributes
+    ----------
+    user_id: :class:`int`
+        The user's ID.
+    kind: :class:`str`
+        "mismatch" if the balances differ, "missing" if the user is only in the local source
+        and "unexpected" if the user is only on the leaderboard.
+    expected_cash: Optional[Union[:class:`int`, :class:`float`]]
+        The local cash amount, ``None`` if the user is "unexpected".
+    expected_bank: Optional[Union[:class:`int`, :class:`float`]]
+        The local bank amount, ``None`` if the user is "unexpected".
+    actual_cash: Optional[Union[:class:`int`, :class:`float`]]
+        The API's cash amount, ``None`` if the user is "missing". It's updated if the balance was read again to correct it.
+    actual_bank: Optional[Union[:class:`int`, :class:`float`]]
+        The API's bank amount, ``None`` if the user is "missing". It's updated if the balance was read again to correct it.
+    corrected: :class:`bool`
+        Whether a corrective mutation was accepted by the API.
+    error: Optional[:class:`str`]
+        The error which made the correction fail, if any.
+    """
+
+    user_id: int
+    kind: str
+    expected_cash: Optional[_Amount]
+    expected_bank: Optional[_Amount]
+    actual_cash: Optional[_Amount]
+    actual_bank: Optional[_Amount]
+    corrected: bool = False
+    error: Optional[str] = None
+
+@dataclass
+class ReconcileReport:
+    """
+    Dataclass representing the outcome of a :class:`Reconciler` run.
+
+    Attributes
+    ----------
+    checked: :class:`int`
+        The number of users in the local source.
+    matched: :class:`int`
+        The number of local users whose balance matches the API's.
+    pages: :class:`int`
+        The number of leaderboard pages requested.
+    mismatches: List[:class:`BalanceMismatch`]
+        Every difference found, ordered by user ID.
+    corrected: :class:`int`
+        The number of corrective mutations accepted by the API.
+    stale: :class:`int`
+        The number of differences which had disappeared when the balance was read again to correct it.
+    failed: :class:`int`
+        The number of corrections which raised an error.
+    """
+
+    checked: int = 0
+    matched: int = 0
+    pages: int = 0
+    mismatches: List[BalanceMismatch] = field(default_factory=list)
+    corrected: int = 0
+    stale: int = 0
+    failed: int = 0
+
+class Reconciler:
+    """
+    Compares a local ledger of balances with a guild's leaderboard and optionally corrects the differences.
+
+    The leaderboard is swept with :meth:`UnbeliClient.iter_leaderboard_pages`, so a guild costs one request
+    per page rather than one per user. Its users are then sorted by ID and merge-joined with ``source``,
+    which is consumed as a stream and must be sorted by user ID, e.g. a database cursor over
+    ``SELECT user_id, cash, bank FROM ledger ORDER BY user_id``.
+
+    If ``correct`` is ``True``, every "mismatch" and "missing" user is read again with
+    :meth:`UnbeliClient.get_user_balance`, because the sweep is not a snapshot, and the difference with that
+    fresh balance is applied with :meth:`UnbeliClient.apply_balance_operations` as an "edit". Infinite amounts
+    can't be corrected with a difference and are applied as a "set" instead.
+    "unexpected" users are only reported.
+
+    Parameters
+    ----------
+    client: :class:`UnbeliClient`
+        The client to request with.
+    guild_id: :class:`int`
+        The guild to reconcile.
+    source: Union[Iterable, AsyncIterable]
+        ``(user_id, cash, bank)`` rows sorted by ascending user ID. Infinite amounts may be
+        "Infinity" strings or floats.
+    correct: :class:`bool`
+        Whether to send corrective mutations. This defaults to ``False``.
+    reason: Optional[:class:`str`]
+        The reason sent with corrective mutations.
+    concurrency: :class:`int`
+        The maximum number of corrections running at once. This defaults to 10.
+    page_size: :class:`int`
+        The number of users per leaderboard page. This defaults to 1000.
+    page_concurrency: :class:`int`
+        The maximum number of leaderboard pages requested at once. This defaults to 4.
+    """
+
+    def __init__(
+        self,
+        client: UnbeliClient,
+        guild_id: int,
+        source: LocalSource,
+        *,
+        correct: bool = False,
+        reason: Optional[str] = None,
+        concurrency: int = 10,
+        page_size: int = 1000,
+        page_concurrency: int = 4
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.client: UnbeliClient = client
+        self.guild_id: int = guild_id
+        self.source: LocalSource = source
+        self.correct: bool = correct
+        self.reason: Optional[str] = reason
+        self.concurrency: int = concurrency
+        self.page_size: int = page_size
+        self.page_concurrency: int = page_concurrency
+
+    def __repr__(self) -> str:
+        return f"Reconciler(guild_id={self.guild_id}, correct={self.correct}, concurrency={self.concurrency})"
+
+    async def _sweep(self, report: ReconcileReport) -> List[_Row]:
+        latest = {}
+        pages = self.client.iter_leaderboard_pages(
+            self.guild_id, page_size=self.page_size, concurrency=self.page_concurrency
+        )
+        async for users in pages:
+            report.pages += 1
+            for user in users:
+                # a user that moved between pages during the sweep is kept once
+                latest[user.user_id] = (user.user_id, user.cash, user.bank)
+        return sorted(latest.values())
+
+    async def _merge(self, remote: List[_Row], report: ReconcileReport) -> None:
+        index = 0
+        previous = None
+        async for user_id, cash, bank in _iter_local(self.source):
+            if previous is not None and user_id <= previous:
+                raise ValueError(f"source must be sorted by ascending user ID but {user_id} came after {previous}")
+            previous = user_id
+            report.checked += 1
+
+            while index < len(remote) and remote[index][0] < user_id:
+                _, actual_cash, actual_bank = remote[index]
+                report.mismatches.append(
+                    BalanceMismatch(remote[index][0], 'unexpected', None, None, actual_cash, actual_bank)
+                )
+                index += 1
+
+            if index < len(remote) and remote[index][0] == user_id:
+                _, actual_cash, actual_bank = remote[index]
+                index += 1
+                if actual_cash == cash and actual_bank == bank:
+                    report.matched += 1
+                else:
+                    report.mismatches.append(
+                        BalanceMismatch(user_id, 'mismatch', cash, bank, actual_cash, actual_bank)
+                    )
+            else:
+                report.mismatches.append(BalanceMismatch(user_id, 'missing', cash, bank, None, None))
+
+        for user_id, actual_cash, actual_bank in remote[index:]:
+            report.mismatches.append(BalanceMismatch(user_id, 'unexpected', None, None, actual_cash, actual_bank))
+
+    async def _correction(self, mismatch: BalanceMismatch, report: ReconcileReport) -> Optional[BalanceOperation]:
+        fresh = await self.client.get_user_balance(self.guild_id, mismatch.user_id)
+        mismatch.actual_cash, mismatch.actual_bank = fresh.cash, fresh.bank
+        if fresh.cash == mismatch.expected_cash and fresh.bank == mismatch.expected_bank:
+            report.stale += 1
+            return None
+
+        amounts = (mismatch.expected_cash, mismatch.expected_bank, fresh.cash, fresh.bank)
+        if any(amount in (float('inf'), float('-inf')) for amount in amounts):
+            return BalanceOperation(
+                mismatch.user_id,
+                _to_api(mismatch.expected_cash),
+                _to_api(mismatch.expected_bank),
+                self.reason,
+                mode='set'
+            )
+        return BalanceOperation(
+            mismatch.user_id,
+            mismatch.expected_cash - fresh.cash or None,
+            mismatch.expected_bank - fresh.bank or None,
+            self.reason
+        )
+
+    async def _correct(self, report: ReconcileReport) -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+        for mismatch in report.mismatches:
+            if mismatch.kind != 'unexpected':
+                queue.put_nowait(mismatch)
+
+        corrections: List[Tuple[BalanceOperation, BalanceMismatch]] = []
+
+        def failed(mismatch: BalanceMismatch, error: Exception) -> None:
+            mismatch.error = f"{type(error).__name__}: {error}"
+            report.failed += 1
+
+        async def worker() -> None:
+            while not queue.empty():
+                mismatch = queue.get_nowait()
+                try:
+                    operation = await self._correction(mismatch, report)
+                except Exception as error:
+                    failed(mismatch, error)
+                else:
+                    if operation is not None:
+                        corrections.append((operation, mismatch))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, queue.qsize()))))
+
+        batch = self.client.apply_balance_operations(
+            self.guild_id, [operation for operation, _ in corrections], concurrency=self.concurrency
+        )
+        async for result in batch:
+            mismatch = corrections[result.index][1]
+            if result.ok:
+                mismatch.corrected = True
+                report.corrected += 1
+            else:
+                failed(mismatch, result.error)
+
+    async def run(self) -> ReconcileReport:
+        """Sweeps the leaderboard, compares it with the local source and corrects the differences if enabled.
+
+        Raises
+        ------
+        ValueError
+            The local source is not sorted by ascending user ID.
+
+        Returns
+        -------
+        :class:`ReconcileReport`
+            The differences found and the corrections made.
+        """
+
+        report = ReconcileReport()
+        remote = await self._sweep(report)
+        await self._merge(remote, report)
+        del remote
+
+        if self.correct is True:
+            await self._correct(report)
+        return report
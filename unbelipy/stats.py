@@ -0,0 +1,290 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import (
+    Dict,
+    Iterable,
+    Optional,
+    Union
+)
+
+from .objects import UserBalance
+
+__all__ = (
+    "QuantileSketch",
+    "EconomyStats"
+)
+
+_INFINITIES = (float('inf'), float('-inf'))
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch with a relative error guarantee, in the style of DDSketch.
+
+    Values are counted in logarithmically sized buckets, so any quantile is estimated within
+    ``relative_accuracy`` of an actual value, and memory only grows with the logarithm of the range
+    of the values (about 1700 buckets for balances from 1 to 10^15 at 1% accuracy), not their number.
+
+    Parameters
+    ----------
+    relative_accuracy: :class:`float`
+        The maximum relative error of a quantile. This defaults to 0.01.
+
+    Attributes
+    ----------
+    count: :class:`int`
+        The number of values added.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+
+        self.relative_accuracy: float = relative_accuracy
+        self._gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma: float = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zeros: int = 0
+        self.count: int = 0
+
+    def __repr__(self) -> str:
+        return f"QuantileSketch(relative_accuracy={self.relative_accuracy}, count={self.count})"
+
+    def _key(self, value: Union[int, float]) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # the middle of the bucket (gamma^(key-1), gamma^key] in relative terms
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value: Union[int, float]) -> None:
+        """Adds a finite value to the sketch.
+
+        Raises
+        ------
+        ValueError
+            The value is infinite or NaN.
+        """
+
+        if value in _INFINITIES or value != value:
+            raise ValueError(f"only finite values can be added but {value} was received")
+
+        if value > 0:
+            key = self._key(value)
+            self._positive[key] = self._positive.get(key, 0) + 1
+        elif value < 0:
+            key = self._key(-value)
+            self._negative[key] = self._negative.get(key, 0) + 1
+        else:
+            self._zeros += 1
+        self.count += 1
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Adds every value of another sketch with the same ``relative_accuracy`` to this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("only sketches with the same relative_accuracy can be merged")
+        for key, count in other._positive.items():
+            self._positive[key] = self._positive.get(key, 0) + count
+        for key, count in other._negative.items():
+            self._negative[key] = self._negative.get(key, 0) + count
+        self._zeros += other._zeros
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the value below which a fraction ``q`` of the values fall.
+
+        Parameters
+        ----------
+        q: :class:`float`
+            The quantile, between 0 and 1. 0.5 is the median.
+
+        Returns
+        -------
+        Optional[:class:`float`]
+            The estimated value, or ``None`` if the sketch is empty.
+        """
+
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        # from the most negative value up to the largest one
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self._zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._positive):
+            seen += self._positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self._positive))
+
+@dataclass
+class EconomyStats:
+    """
+    Dataclass representing the aggregate statistics of a guild's economy, see :meth:`UnbeliClient.guild_economy_stats`.
+
+    Users with an infinite cash, bank or total are counted in ``infinite`` or ``negative_infinite``
+    and left out of every other statistic.
+
+    Attributes
+    ----------
+    users: :class:`int`
+        The number of users read from the leaderboard.
+    pages: :class:`int`
+        The number of leaderboard pages read.
+    complete: :class:`bool`
+        Whether the whole leaderboard was read, ``False`` if it was stopped after ``max_pages``.
+    infinite: :class:`int`
+        The number of users with an infinite positive total.
+    negative_infinite: :class:`int`
+        The number of users with an infinite negative total, or a finite total and an infinite cash or bank.
+    cash_supply: :class:`int`
+        The sum of the users' cash.
+    bank_supply: :class:`int`
+        The sum of the users' bank.
+    money_supply: :class:`int`
+        The sum of the users' total.
+    min: Optional[:class:`int`]
+        The lowest total.
+    max: Optional[:class:`int`]
+        The highest total.
+    gini: Optional[:class:`float`]
+        The Gini coefficient of the totals, 0 when everyone has the same and close to 1 when one user has
+        everything. It's only meaningful if no total is negative.
+    top_percent: :class:`float`
+        The percentage of richest users ``top_share`` is computed for.
+    top_share: Optional[:class:`float`]
+        The fraction of ``money_supply`` held by the richest ``top_percent`` of the users,
+        or ``None`` if it couldn't be computed exactly.
+    sketch: :class:`QuantileSketch`
+        The distribution of the totals, see :meth:`quantile`.
+    """
+
+    users: int = 0
+    pages: int = 0
+    complete: bool = True
+    infinite: int = 0
+    negative_infinite: int = 0
+    cash_supply: int = 0
+    bank_supply: int = 0
+    money_supply: int = 0
+    min: Optional[int] = None
+    max: Optional[int] = None
+    gini: Optional[float] = None
+    top_percent: float = 1.0
+    top_share: Optional[float] = None
+    sketch: QuantileSketch = field(default_factory=QuantileSketch, repr=False)
+
+    @property
+    def finite_users(self) -> int:
+        """The number of users the statistics are computed over."""
+        return self.users - self.infinite - self.negative_infinite
+
+    @property
+    def mean(self) -> Optional[float]:
+        """The average total."""
+        return self.money_supply / self.finite_users if self.finite_users else None
+
+    @property
+    def median(self) -> Optional[float]:
+        """The approximate median total."""
+        return self.sketch.quantile(0.5)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the approximate total below which a fraction ``q`` of the users fall, e.g. 0.9 for the 90th percentile."""
+        return self.sketch.quantile(q)
+
+class _EconomyAccumulator:
+    """Computes :class:`EconomyStats` in one pass over users sorted by descending total.
+
+    With the users ranked j = 1..n from the richest, the Gini coefficient is
+    ``(n + 1 - 2 * sum(j * x_j) / sum(x_j)) / n``, so only two sums are kept.
+    The top share needs the sum of the top ``ceil(n * top_percent / 100)`` totals before ``n`` is known,
+    so prefix sums are kept only for the ranks that the bounds on ``n`` allow.
+    """
+
+    def __init__(self, top_percent: float, relative_accuracy: float) -> None:
+        if not 0 < top_percent <= 100:
+            raise ValueError("top_percent must be between 0 and 100")
+        self.stats: EconomyStats = EconomyStats(top_percent=top_percent, sketch=QuantileSketch(relative_accuracy))
+        self._weighted: int = 0
+        self._rank: int = 0
+        self._top_low: int = 1
+        self._top_high: Optional[int] = None
+        self._prefixes: Dict[int, int] = {}
+
+    def expect(self, min_users: int, max_users: int) -> None:
+        """Bounds the number of users still to come, including the ones already added."""
+        fraction = self.stats.top_percent / 100
+        self._top_low = max(math.ceil((min_users - self.stats.infinite) * fraction), 1)
+        self._top_high = math.ceil(max_users * fraction)
+
+    def add_many(self, users: Iterable[UserBalance]) -> None:
+        stats = self.stats
+        for user in users:
+            stats.users += 1
+            if user.cash in _INFINITIES or user.bank in _INFINITIES or user.total in _INFINITIES:
+                if user.total == float('inf'):
+                    stats.infinite += 1
+                else:
+                    stats.negative_infinite += 1
+                continue
+
+            total = user.total
+            self._rank += 1
+            stats.cash_supply += user.cash
+            stats.bank_supply += user.bank
+            stats.money_supply += total
+            self._weighted += self._rank * total
+            stats.sketch.add(total)
+            if stats.max is None or total > stats.max:
+                stats.max = total
+            if stats.min is None or total < stats.min:
+                stats.min = total
+            if self._top_high is None or self._top_low <= self._rank <= self._top_high:
+                self._prefixes[self._rank] = stats.money_supply
+
+    def result(self) -> EconomyStats:
+        stats = self.stats
+        n = self._rank
+        if n and stats.money_supply:
+            stats.gini = (n + 1 - 2 * self._weighted / stats.money_supply) / n
+            top = math.ceil(n * stats.top_percent / 100)
+            prefix = self._prefixes.get(top)
+            stats.top_share = prefix / stats.money_supply if prefix is not None else None
+        self._prefixes.clear()
+        return stats
@@ -0,0 +1,174 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional
+)
+
+__all__ = (
+    "LeaderboardStreamDecoder",
+)
+
+_WHITESPACE = ' \t\n\r'
+
+class LeaderboardStreamDecoder:
+    """
+    Incrementally decodes a leaderboard response body, one user at a time.
+
+    Both shapes returned by the API are supported: a bare list of users, and an object holding
+    the list of users under ``users`` (for paginated requests). Any other key of that object
+    is kept in :attr:`meta`.
+
+    Only the current chunk and at most one incomplete user record are held in memory.
+
+    Attributes
+    ----------
+    meta: Dict[:class:`str`, :class:`Any`]
+        The keys of a paginated response other than ``users``, e.g. ``page`` and ``total_pages``.
+    """
+
+    def __init__(self) -> None:
+        self.meta: Dict[str, Any] = {}
+        self._buffer: str = ''
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        # one of: start, key, colon, value, items, done
+        self._state: str = 'start'
+        self._key: Optional[str] = None
+        self._in_object: bool = False
+
+    def _skip(self, pos: int) -> int:
+        buffer = self._buffer
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """Feeds a chunk of the body to the decoder.
+
+        Parameters
+        ----------
+        chunk: :class:`bytes`
+            The next chunk of the response body.
+
+        Returns
+        -------
+        List[Dict[:class:`str`, :class:`Any`]]
+            The user records completed by this chunk, in order.
+        """
+
+        self._buffer += self._text.decode(chunk)
+        buffer = self._buffer
+        rows: List[Dict[str, Any]] = []
+        pos = 0
+
+        while True:
+            pos = self._skip(pos)
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+
+            if self._state == 'start':
+                if char == '[':
+                    self._state = 'items'
+                elif char == '{':
+                    self._in_object = True
+                    self._state = 'key'
+                else:
+                    raise ValueError(f"unexpected {char!r} at the start of a leaderboard")
+                pos += 1
+
+            elif self._state == 'key':
+                if char == ',':
+                    pos += 1
+                elif char == '}':
+                    self._state = 'done'
+                    pos += 1
+                else:
+                    try:
+                        self._key, pos = self._json.raw_decode(buffer, pos)
+                    except ValueError:
+                        break
+                    self._state = 'colon'
+
+            elif self._state == 'colon':
+                if char != ':':
+                    raise ValueError(f"expected ':' after {self._key!r} but got {char!r}")
+                self._state = 'value'
+                pos += 1
+
+            elif self._state == 'value':
+                if self._key == 'users' and char == '[':
+                    self._state = 'items'
+                    pos += 1
+                    continue
+                try:
+                    value, end = self._json.raw_decode(buffer, pos)
+                except ValueError:
+                    break
+                # a number at the end of the buffer may still be missing digits
+                if self._skip(end) >= len(buffer):
+                    break
+                self.meta[self._key] = value
+                self._state = 'key'
+                pos = end
+
+            elif self._state == 'items':
+                if char == ',':
+                    pos += 1
+                elif char == ']':
+                    self._state = 'key' if self._in_object else 'done'
+                    pos += 1
+                else:
+                    try:
+                        row, pos = self._json.raw_decode(buffer, pos)
+                    except ValueError:
+                        break
+                    rows.append(row)
+
+            else:
+                raise ValueError(f"unexpected {char!r} after the end of the leaderboard")
+
+        self._buffer = buffer[pos:]
+        return rows
+
+    def close(self) -> None:
+        """Checks that the whole body was decoded.
+
+        Raises
+        ------
+        ValueError
+            The body ended in the middle of the leaderboard.
+        """
+
+        self._buffer += self._text.decode(b'', final=True)
+        if self._state != 'done' or self._buffer.strip(_WHITESPACE):
+            raise ValueError("the leaderboard response ended unexpectedly")
@@ -0,0 +1,151 @@
+"""
+MIT License
+
+Copyright (c) 2021 ChrisDewa
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Optional,
+    Tuple,
+    Type
+)
+
+try:
+    import httpx
+except ImportError as error:  # pragma: no cover
+    raise ImportError(
+        "the HTTP/2 transport needs httpx with HTTP/2 support, install it with: pip install unbelipy[http2]"
+    ) from error
+
+__all__ = (
+    "HTTP2Session",
+)
+
+class _Content:
+    def __init__(self, response: httpx.Response) -> None:
+        self._response = response
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        async for chunk in self._response.aiter_bytes(size):
+            yield chunk
+
+class HTTP2Response:
+    """
+    The subset of :class:`aiohttp.ClientResponse` used by :class:`UnbeliClient`, over an :class:`httpx.Response`.
+    """
+
+    def __init__(self, response: httpx.Response) -> None:
+        self._response: httpx.Response = response
+        self.content: _Content = _Content(response)
+
+    def __repr__(self) -> str:
+        return f"<HTTP2Response [{self.status} {self.reason}] {self.http_version}>"
+
+    @property
+    def status(self) -> int:
+        return self._response.status_code
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason_phrase
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self._response.headers
+
+    @property
+    def http_version(self) -> str:
+        """The protocol the response was received with, "HTTP/2" unless the server doesn't support it."""
+        return self._response.http_version
+
+    async def read(self) -> bytes:
+        # the body is kept once read, so this can be called again after the response is closed
+        return await self._response.aread()
+
+    async def text(self) -> str:
+        await self.read()
+        return self._response.text
+
+    async def json(self) -> Any:
+        return json.loads(await self.read())
+
+class HTTP2Session:
+    """
+    A session which sends the client's requests over HTTP/2 with httpx, used with ``UnbeliClient(http2=True)``.
+
+    Concurrent requests are multiplexed as streams of a single connection per host, instead of opening
+    one connection per request in flight like aiohttp's HTTP/1.1 connection pool.
+    It exposes the subset of :class:`aiohttp.ClientSession` the client uses, so rate limits, hedging and
+    circuit breakers work the same with either session.
+
+    This needs the ``http2`` extra: ``pip install unbelipy[http2]``.
+
+    Parameters
+    ----------
+    client: Optional[:class:`httpx.AsyncClient`]
+        The httpx client to send requests with. If this is ``None``, a new HTTP/2 client is created
+        with ``options``, e.g. ``http1=False`` to talk HTTP/2 to a server without TLS.
+    """
+
+    #: The errors raised when a request fails without a response, counted as failures by circuit breakers.
+    transport_errors: Tuple[Type[BaseException], ...] = (httpx.TransportError,)
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, **options: Any) -> None:
+        options.setdefault('http2', True)
+        # aiohttp's default total timeout, httpx's own default is 5 seconds
+        options.setdefault('timeout', 300)
+        self._client: httpx.AsyncClient = client or httpx.AsyncClient(**options)
+
+    def __repr__(self) -> str:
+        return f"HTTP2Session(closed={self.closed})"
+
+    @property
+    def closed(self) -> bool:
+        """Whether the session was closed."""
+        return self._client.is_closed
+
+    @asynccontextmanager
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        data: Optional[str] = None
+    ) -> AsyncIterator[HTTP2Response]:
+        """Sends a request, yielding the response before its body is read."""
+        request = self._client.build_request(method, url, headers=headers, content=data)
+        response = await self._client.send(request, stream=True)
+        try:
+            yield HTTP2Response(response)
+        finally:
+            await response.aclose()
+
+    async def close(self) -> None:
+        """Closes the session and its connections."""
+        await self._client.aclose()